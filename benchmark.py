@@ -0,0 +1,1036 @@
+"""Offline benchmarks for the signup bot; nothing here talks to Discord. Run with ``python benchmark.py``."""
+import asyncio
+import contextlib
+import datetime
+import functools
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+import types
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+from aiohttp import web
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+from new import (
+    AdminCommands, ClickThrottle, DEFAULT_AVA_ROLES, DatabaseConfig, DatabaseRouter, DiscordBot, GameDatabase, GameRow,
+    InteractionQueue, Metrics, OutboundQueue, PostgresGameDatabase, Priority, RenderCache, RoleSlot, SignupResult,
+    StorageBackend, TIME_FORMAT, find_role, format_table_stats,
+)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def sample_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.001):
+    """Record how late the loop wakes us up; that delay is what heartbeats see."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def run_clicks(click: Callable[[int], Awaitable[None]], clicks: int) -> dict:
+    lag: List[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_loop_lag(lag, stop))
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(click(n) for n in range(clicks)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await sampler
+    return {
+        "elapsed": elapsed,
+        "lag_p50": percentile(lag, 50),
+        "lag_p99": percentile(lag, 99),
+        "lag_max": max(lag, default=0.0),
+        "lag_mean": statistics.fmean(lag) if lag else 0.0,
+    }
+
+
+@contextlib.asynccontextmanager
+async def scratch_database(backups: bool = False, **config) -> AsyncIterator[GameDatabase]:
+    """A GameDatabase on a throwaway file, closed and deleted on exit."""
+    with tempfile.TemporaryDirectory() as tmp:
+        if backups:
+            config['backup_dir'] = os.path.join(tmp, "backups")
+        db = GameDatabase(DatabaseConfig(path=os.path.join(tmp, "bench.db"), **config))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+async def bench_event_loop_lag(clicks: int = 500):
+    """Compare loop lag for concurrent signups: inline sqlite vs the worker thread."""
+    async with scratch_database() as db:
+        game_id = await db.add_ava_game("0", "Bench", "4x", "2099-01-01 12:00", "2099-01-02 12:00", "")
+        await db.set_role_limits(game_id, "ava", ground=clicks * 2, air=0, navy=0, support=0)
+
+        signup = GameDatabase.signup_user.__wrapped__
+        get_game = GameDatabase._load_game.__wrapped__
+
+        async def blocking_click(n: int):
+            # What the bot did before: sqlite calls straight on the loop.
+            get_game(db, game_id, "ava")
+            signup(db, game_id, "ava", f"b{n}", f"user{n}", "ground")
+            get_game(db, game_id, "ava")
+
+        async def offloaded_click(n: int):
+            await db.get_game(game_id, "ava")
+            await db.signup_user(game_id, "ava", f"o{n}", f"user{n}", "ground")
+            await db.get_game(game_id, "ava")
+
+        results = {
+            "blocking": await run_clicks(blocking_click, clicks),
+            "offloaded": await run_clicks(offloaded_click, clicks),
+        }
+
+    print(f"event loop lag, {clicks} concurrent signups")
+    for name, r in results.items():
+        print(
+            f"  {name:<10} total {r['elapsed'] * 1000:8.1f} ms   "
+            f"lag p50 {r['lag_p50'] * 1000:7.2f} ms   p99 {r['lag_p99'] * 1000:7.2f} ms   "
+            f"max {r['lag_max'] * 1000:7.2f} ms"
+        )
+
+
+async def bench_signup_contention(clicks: int = 400, slots: int = 3):
+    """Fire simultaneous signups from two connections at one role and check it never overbooks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shards = [GameDatabase(DatabaseConfig(path=path)), GameDatabase(DatabaseConfig(path=path))]
+        await contend(shards, "sqlite", clicks, slots)
+
+
+async def bench_postgres_contention(url: str, clicks: int = 400, slots: int = 3):
+    """The same race against a PostgreSQL server, e.g. BENCH_POSTGRES_URL=postgresql://localhost/samebot."""
+    shards = [PostgresGameDatabase(DatabaseConfig(url=url)), PostgresGameDatabase(DatabaseConfig(url=url))]
+    for db in shards:
+        await db.connect()
+    await contend(shards, "postgres", clicks, slots)
+
+
+async def contend(shards: List[StorageBackend], name: str, clicks: int, slots: int):
+    """Two backends stand in for two shard processes sharing one store."""
+    game_id = await shards[0].add_ava_game("0", "Bench", "4x", "2099-01-01 12:00", "2099-01-02 12:00", "")
+    await shards[0].set_role_limits(game_id, "ava", ground=slots, air=0, navy=0, support=0)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        shards[n % 2].signup_user(game_id, "ava", str(n), f"user{n}", "ground")
+        for n in range(clicks)
+    ))
+    elapsed = time.perf_counter() - started
+
+    # Each connection caches its own rows; read the committed state
+    shards[0].cache.discard("ava", game_id)
+    game = await shards[0].get_game(game_id, "ava")
+    rows = len(await shards[0].get_signups(game_id, "ava"))
+    accepted = sum(1 for result, _ in results if result is SignupResult.OK)
+    for db in shards:
+        await db.close()
+
+    taken = find_role(game, "ground").taken
+    assert accepted == slots, f"accepted {accepted} signups for {slots} slots"
+    assert taken == rows == slots, (taken, rows)
+    print(f"signup contention ({name}), {clicks} clicks for {slots} slots across 2 connections")
+    print(f"  accepted {accepted}, taken {taken}, rows {rows}, {elapsed * 1000:.1f} ms")
+
+
+async def bench_waitlist(waiters: int = 50, slots: int = 10, window: float = 1.0, interval: float = 0.05):
+    """Players waiting on a full role: clicking until it works versus one click onto the waitlist."""
+    print(f"waitlist, {waiters} players waiting while {slots} players leave over {window:.1f} s")
+    for retry in (True, False):
+        async with scratch_database() as db:
+            game_id = await db.add_ava_game("0", "Bench", "4x", "2099-01-01 12:00", "2099-01-02 12:00", "")
+            await db.set_role_limits(game_id, "ava", ground=slots, air=0, navy=0, support=0)
+            for n in range(slots):
+                await db.signup_user(game_id, "ava", f"p{n}", f"player{n}", "ground")
+            clicks = 0
+            promoted = 0
+            done = asyncio.Event()
+
+            async def waiter(n: int):
+                nonlocal clicks
+                while not done.is_set():
+                    clicks += 1
+                    result, _ = await db.signup_user(game_id, "ava", f"w{n}", f"waiter{n}", "ground")
+                    # Without the queue nobody knows they'll be let in, so they keep clicking
+                    if not retry or result in (SignupResult.OK, SignupResult.ALREADY_SIGNED_UP):
+                        return
+                    await asyncio.sleep(interval)
+
+            async def leave():
+                nonlocal promoted
+                for n in range(slots):
+                    await asyncio.sleep(window / slots)
+                    promoted += len((await db.remove_signup(game_id, "ava", f"p{n}"))[1])
+                done.set()
+
+            await asyncio.gather(leave(), *(waiter(n) for n in range(waiters)))
+            label = "click until it works" if retry else "waitlist"
+            print(f"  {label:<20} {clicks:5d} signup clicks, {promoted} promoted on leave")
+
+
+class FakeResponse:
+    """Stands in for discord.InteractionResponse and records when the click was acknowledged."""
+    def __init__(self):
+        self.acked_at: Optional[float] = None
+
+    def is_done(self) -> bool:
+        return self.acked_at is not None
+
+    async def defer(self, **kwargs):
+        self.acked_at = time.perf_counter()
+
+    async def send_message(self, content=None, **kwargs):
+        self.acked_at = time.perf_counter()
+
+
+class FakeInteraction:
+    def __init__(self, user_id: int, message):
+        self.id = user_id
+        self.user = types.SimpleNamespace(id=user_id, display_name=f"user{user_id}")
+        self.guild_id = None
+        self.message = message
+        self.response = FakeResponse()
+        self.followup = types.SimpleNamespace(send=self._followup)
+        self.created_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    async def _followup(self, content=None, **kwargs):
+        self.finished_at = time.perf_counter()
+
+
+@contextlib.asynccontextmanager
+async def busy_click_bot(slots: int, queue_size: int, write_delay: float,
+                         throttle: Optional[ClickThrottle] = None):
+    """A cog and game on a throwaway database whose writer is busy ``write_delay`` per signup."""
+    async def noop_edit(**kwargs):
+        bench.edits += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = DatabaseRouter(DatabaseConfig(path=os.path.join(tmp, "bench.db")))
+        db = databases.default
+        signup = db.signup_user
+        bot = types.SimpleNamespace(
+            metrics=Metrics(), databases=databases,
+            interactions=InteractionQueue(workers=8, maxsize=queue_size), outbound=OutboundQueue(),
+            throttle=throttle or ClickThrottle(),
+        )
+        bench = types.SimpleNamespace(bot=bot, cog=AdminCommands(bot), calls=0, edits=0)
+
+        async def busy_signup(*args, **kwargs):
+            # Something else holds the writer for a few ms per click
+            bench.calls += 1
+            await asyncio.get_running_loop().run_in_executor(db.executor, time.sleep, write_delay)
+            return await signup(*args, **kwargs)
+
+        db.signup_user = busy_signup
+        bench.game_id = await db.add_ava_game("0", "Bench", "4x", "2099-01-01 12:00", "2099-01-02 12:00", "")
+        await db.set_role_limits(bench.game_id, "ava", ground=slots)
+        bench.message = types.SimpleNamespace(id=1, channel=types.SimpleNamespace(id=1), edit=noop_edit)
+        bot.interactions.start()
+        try:
+            yield bench
+            await bot.interactions._queue.join()
+            await asyncio.gather(*bench.cog.renders)
+        finally:
+            bot.interactions.stop()
+            await databases.close()
+
+
+async def bench_interaction_ack(clicks: int = 500, write_delay: float = 0.008):
+    """Acknowledgement latency for a burst of clicks on a busy database: reply-after-work vs ack-first."""
+    async def run(mode: str, queue_size: int) -> dict:
+        async with busy_click_bot(clicks, queue_size, write_delay) as bench:
+            cog, game_id = bench.cog, bench.game_id
+            interactions = [FakeInteraction(n, bench.message) for n in range(clicks)]
+            if mode == "inline":
+                await asyncio.gather(*(cog.handle_signup(i, game_id, "ground") for i in interactions))
+            else:
+                await asyncio.gather(*(
+                    cog.acknowledge(i, "signup", functools.partial(cog.handle_signup, i, game_id, "ground"))
+                    for i in interactions
+                ))
+
+        acks = [i.response.acked_at - i.created_at for i in interactions]
+        return {
+            "ack_p50": percentile(acks, 50),
+            "ack_p99": percentile(acks, 99),
+            "late": sum(1 for ack in acks if ack > 3.0),
+            "processed": bench.bot.interactions.processed,
+            "rejected": bench.bot.interactions.rejected,
+        }
+
+    results = {
+        "reply after work": await run("inline", clicks),
+        "ack first": await run("ack", clicks),
+        "ack first, queue 64": await run("ack", 64),
+    }
+    print(f"interaction acknowledgement, {clicks} clicks, writer busy {write_delay * 1000:.0f} ms per click")
+    for name, r in results.items():
+        print(
+            f"  {name:<20} ack p50 {r['ack_p50'] * 1000:8.1f} ms   p99 {r['ack_p99'] * 1000:8.1f} ms   "
+            f"over 3 s {r['late']:4}   turned away {r['rejected']}"
+        )
+
+    # Acking first keeps every click inside the deadline; the bound turns away exactly what it didn't queue
+    unbounded, bounded = results["ack first"], results["ack first, queue 64"]
+    assert unbounded['late'] == bounded['late'] == 0, (unbounded['late'], bounded['late'])
+    assert unbounded['rejected'] == 0 and unbounded['processed'] == clicks, unbounded
+    assert bounded['processed'] + bounded['rejected'] == clicks, bounded
+    assert bounded['processed'] >= 64 and bounded['rejected'] > 0, bounded
+
+
+async def bench_click_throttle(users: int = 300, repeats: int = 3, gap: float = 0.15, write_delay: float = 0.008):
+    """Users triple-clicking a role button: every click processed vs the per-user throttle and in-flight set."""
+    async def run(throttled: bool) -> dict:
+        async with busy_click_bot(users, users * repeats, write_delay) as bench:
+            cog, game_id = bench.cog, bench.game_id
+            rng = random.Random(7)
+
+            async def user(user_id: int):
+                await asyncio.sleep(rng.random())
+                for _ in range(repeats):
+                    interaction = FakeInteraction(user_id, bench.message)
+                    key = (user_id, None, "ava", game_id) if throttled else None
+                    await cog.acknowledge(interaction, "signup", functools.partial(
+                        cog.handle_signup, interaction, game_id, "ground"
+                    ), key)
+                    await asyncio.sleep(gap)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user(n) for n in range(users)))
+            await bench.bot.interactions._queue.join()
+            elapsed = time.perf_counter() - started
+            await asyncio.gather(*cog.renders)
+        return {
+            "elapsed": elapsed, "calls": bench.calls, "edits": bench.edits,
+            **bench.bot.throttle.stats(),
+        }
+
+    results = {"every click": await run(False), "throttled": await run(True)}
+    print(f"{users} users clicking a role {repeats} times {gap * 1000:.0f} ms apart")
+    for name, r in results.items():
+        print(f"  {name:<12} signup_user calls {r['calls']:5}   edits {r['edits']:5}   "
+              f"shed {r['duplicates']} in flight + {r['throttled']} throttled   {r['elapsed']:.2f} s")
+
+    # Every user still gets in once; the repeats never reach the database
+    every, throttled = results["every click"], results["throttled"]
+    assert every['calls'] == users * repeats, every
+    assert users <= throttled['calls'] < every['calls'], (throttled['calls'], every['calls'])
+    assert throttled['calls'] + throttled['duplicates'] + throttled['throttled'] == users * repeats, throttled
+    assert throttled['elapsed'] < every['elapsed'], (throttled['elapsed'], every['elapsed'])
+
+
+class FakeDiscord(AsyncWebhookAdapter):
+    """A local websocket gateway and in-memory REST API; every REST call sleeps ``latency``."""
+    APPLICATION_ID = "1000"
+    USER = {"id": "1000", "username": "samebot", "discriminator": "0", "avatar": None, "bot": True}
+    APPLICATION = {
+        "id": APPLICATION_ID, "name": "samebot", "description": "", "icon": None, "bot_public": False,
+        "bot_require_code_grant": False, "owner": USER, "verify_key": "", "flags": 0,
+    }
+    ROUTE = re.compile(r'/channels/([0-9]+)/messages(?:/([0-9]+))?$')
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.messages: Dict[str, dict] = {}
+        self.dispatched: Dict[str, float] = {}
+        self.acked: Dict[str, float] = {}
+        self.finished: Dict[str, float] = {}
+        self._ids = itertools.count(10 ** 17)
+        self._seq = itertools.count(1)
+        self._socket: Optional[web.WebSocketResponse] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._connection: Optional[asyncio.Task] = None
+
+    async def start(self, bot: DiscordBot):
+        """Log ``bot`` in and connect it to the fake gateway, returning once it's ready."""
+        async_context.set(self)
+        bot.http.request = self.http_request
+        # Re-wrap so discord_api timings cover the fake calls too
+        bot._instrument_http()
+        app = web.Application()
+        app.router.add_get("/", self._gateway)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        await bot.login("fake-token")
+        self._connection = asyncio.create_task(bot.connect(reconnect=False))
+        await bot.wait_until_ready()
+
+    async def stop(self, bot: DiscordBot):
+        await bot.close()
+        await self._connection
+        await self._runner.cleanup()
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        socket = self._socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        await socket.send_json({"op": 10, "d": {"heartbeat_interval": 45_000}})
+        async for message in socket:
+            payload = json.loads(message.data)
+            if payload["op"] == 1:
+                await socket.send_json({"op": 11})
+            elif payload["op"] == 2:
+                await self._dispatch("READY", {
+                    "v": 10, "user": self.USER, "guilds": [], "session_id": "bench",
+                    "resume_gateway_url": str(request.url), "shard": payload["d"].get("shard", [0, 1]),
+                    "application": {"id": self.APPLICATION_ID, "flags": 0},
+                })
+        return socket
+
+    async def acknowledged(self):
+        """Wait until every click sent so far has been acknowledged."""
+        while len(self.acked) < len(self.dispatched):
+            await asyncio.sleep(0.001)
+
+    async def _dispatch(self, event: str, data: dict):
+        await self._socket.send_json({"op": 0, "t": event, "s": next(self._seq), "d": data})
+
+    async def click(self, custom_id: str, message_id: str, user_id: int, guild_id: int) -> str:
+        """Deliver a button click over the gateway; returns the interaction token."""
+        interaction_id = str(next(self._ids))
+        token = f"token{interaction_id}"
+        message = self.messages[message_id]
+        user = {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None}
+        self.dispatched[token] = time.perf_counter()
+        await self._dispatch("INTERACTION_CREATE", {
+            "id": interaction_id, "application_id": self.APPLICATION_ID, "type": 3, "token": token, "version": 1,
+            "data": {"custom_id": custom_id, "component_type": 2},
+            "guild_id": str(guild_id), "channel_id": message["channel_id"],
+            "channel": {"id": message["channel_id"], "type": 0, "guild_id": str(guild_id), "name": "games",
+                        "position": 0, "permission_overwrites": [], "nsfw": False, "parent_id": None},
+            "member": {"user": user, "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+                       "deaf": False, "mute": False, "permissions": "0", "flags": 0},
+            "message": message, "locale": "en-US", "app_permissions": "0",
+            "attachment_size_limit": 8 * 1024 * 1024, "entitlements": [],
+        })
+        return token
+
+    def _message(self, channel_id: str, message_id: str, body: Optional[dict]) -> dict:
+        body = body or {}
+        message = self.messages.get(message_id) or {
+            "id": message_id, "channel_id": channel_id, "author": self.USER, "content": "",
+            "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+            "embeds": [], "components": [], "pinned": False, "type": 0,
+        }
+        for key in ("content", "embeds", "components"):
+            if key in body:
+                message[key] = body[key] or ([] if key != "content" else "")
+        self.messages[message_id] = message
+        return message
+
+    async def request(self, route, session=None, *, payload=None, **kwargs):
+        return await self._handle(route, payload)
+
+    async def http_request(self, route, **kwargs):
+        return await self._handle(route, kwargs.get("json"))
+
+    async def _handle(self, route, body: Optional[dict]):
+        name = f"{route.method} {route.path}"
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now = time.perf_counter()
+
+        if route.path.endswith("/callback"):
+            self.acked[route.webhook_token] = now
+            return {"interaction": {"id": str(route.webhook_id), "type": 3}}
+        if route.path == "/webhooks/{webhook_id}/{webhook_token}":
+            self.finished[route.webhook_token] = now
+            return self._message("0", str(next(self._ids)), body)
+        if route.path == "/gateway/bot":
+            host, port = self._runner.addresses[0][:2]
+            return {"url": f"ws://{host}:{port}/", "shards": 1,
+                    "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}}
+        if route.path == "/users/@me":
+            return self.USER
+        if route.path == "/oauth2/applications/@me":
+            return self.APPLICATION
+        if route.path == "/users/@me/channels":
+            return {"id": str(next(self._ids)), "type": 1, "recipients": [self.USER]}
+        if route.path == "/users/{user_id}":
+            return {"id": route.url.rsplit("/", 1)[-1], "username": "user", "discriminator": "0", "avatar": None}
+        match = self.ROUTE.search(route.url)
+        if match:
+            channel_id, message_id = match.groups()
+            return self._message(channel_id, message_id or str(next(self._ids)), body)
+        return {}
+
+
+class FakeContext:
+    """The parts of a slash-command Context the admin commands use, sending through the fake REST API."""
+    ids = itertools.count(1)
+
+    def __init__(self, bot: DiscordBot, guild_id: int, channel_id: int, author_id: int = 1):
+        self.bot = bot
+        self.guild = types.SimpleNamespace(id=guild_id)
+        self.author = types.SimpleNamespace(id=author_id)
+        self.channel = bot.get_partial_messageable(channel_id, guild_id=guild_id)
+        self.interaction = types.SimpleNamespace(id=next(self.ids))
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+async def bench_load(events: int = 3_000, games: int = 60, guilds: int = 6, rate: float = 300.0,
+                     latency: float = 0.02, seed: int = 1):
+    """Drive the real bot through the fake gateway with a mixed stream of signups, leaves and edits."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = os.environ.get("GAMES_DB_PATH")
+        os.environ["GAMES_DB_PATH"] = os.path.join(tmp, "load.db")
+        try:
+            bot = DiscordBot()
+        finally:
+            if previous is None:
+                del os.environ["GAMES_DB_PATH"]
+            else:
+                os.environ["GAMES_DB_PATH"] = previous
+        fake = FakeDiscord(latency)
+        await fake.start(bot)
+        cog = bot.get_cog("AdminCommands")
+
+        # (guild, message id, game id) for every posted game
+        posted = []
+        start = datetime.datetime.now() + datetime.timedelta(days=1)
+        for n in range(games):
+            guild = 1 + n % guilds
+            ctx = FakeContext(bot, guild, 100 + guild)
+            when = start + datetime.timedelta(hours=n)
+            await cog.schedule_ava.callback(
+                cog, ctx, f"Map {n}", "4x", when.strftime(TIME_FORMAT),
+                (when + datetime.timedelta(days=1)).strftime(TIME_FORMAT), "", 20, 10, 10, 0,
+            )
+        for db in bot.databases.all():
+            for guild in range(1, guilds + 1):
+                for game in await db.get_upcoming_games("ava", str(guild)):
+                    posted.append((guild, game['message_id'], game['id']))
+
+        kinds: Dict[str, str] = {}
+        signed_up: List[Tuple[int, str, int, int]] = []
+        edits = []
+        edit_times: List[float] = []
+
+        async def edit(ctx: FakeContext, game_id: int, notes: str):
+            edit_started = time.perf_counter()
+            await cog.edit_game.callback(cog, ctx, game_id, "notes", notes)
+            edit_times.append(time.perf_counter() - edit_started)
+
+        started = time.perf_counter()
+        for n in range(events):
+            # Pace arrivals at ``rate`` per second, the way a busy gateway delivers them
+            delay = started + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            guild, message_id, game_id = rng.choice(posted)
+            roll = rng.random()
+            if roll < 0.7 or not signed_up:
+                user = rng.randrange(1, events)
+                role = rng.choice(("ground", "air", "support"))
+                kinds[await fake.click(f"role_{game_id}_{role}", message_id, user, guild)] = "signup"
+                signed_up.append((guild, message_id, game_id, user))
+            elif roll < 0.92:
+                guild, message_id, game_id, user = signed_up.pop(rng.randrange(len(signed_up)))
+                kinds[await fake.click(f"leave_{game_id}", message_id, user, guild)] = "leave"
+            else:
+                ctx = FakeContext(bot, guild, 100 + guild)
+                edits.append(asyncio.create_task(edit(ctx, game_id, f"edit {n}")))
+
+        await asyncio.gather(*edits)
+        await fake.acknowledged()
+        await bot.interactions._queue.join()
+        elapsed = time.perf_counter() - started
+        # Let queued message edits land before counting them
+        await asyncio.gather(*cog.renders)
+
+        metrics = bot.metrics
+        rejected = bot.interactions.rejected
+        await fake.stop(bot)
+
+    print(f"load test, {events} events across {games} games in {guilds} guilds, "
+          f"{rate:.0f} events/s offered, {latency * 1000:.0f} ms fake API latency")
+    print(f"  throughput {events / elapsed:8.0f} events/s   turned away busy {rejected}")
+    for kind in ("signup", "leave"):
+        tokens = [token for token, k in kinds.items() if k == kind and token in fake.finished]
+        acks = [fake.acked[token] - fake.dispatched[token] for token in tokens]
+        done = [fake.finished[token] - fake.dispatched[token] for token in tokens]
+        print(f"  {kind:<7} n={len(tokens):<5} ack p50 {percentile(acks, 50) * 1000:7.1f} ms  "
+              f"p99 {percentile(acks, 99) * 1000:7.1f} ms   reply p50 {percentile(done, 50) * 1000:7.1f} ms  "
+              f"p99 {percentile(done, 99) * 1000:7.1f} ms")
+    print(f"  edit    n={len(edit_times):<5} {'':28}reply p50 {percentile(edit_times, 50) * 1000:7.1f} ms  "
+          f"p99 {percentile(edit_times, 99) * 1000:7.1f} ms")
+    edits = sum(count for name, count in fake.calls.items() if name.startswith("PATCH "))
+    print(f"  message edits sent {edits}, {bot.outbound.superseded} superseded while queued")
+    for name in ("signup_user", "remove_signup", "update_game"):
+        timer = metrics.timers.get(("db_query", name))
+        if timer:
+            # Measured from the event loop, so time queued behind the writer is included
+            print(f"  sqlite  {name:<14} p50 {timer.quantile(0.5) * 1000:7.2f} ms  "
+                  f"p99 {timer.quantile(0.99) * 1000:7.2f} ms  n={timer.count}")
+    for name, count in sorted(fake.calls.items()):
+        print(f"  api     {name:<45} {count}")
+
+
+class FakeRateLimits:
+    """Discord's REST limits: ``rate`` per ``per`` seconds on each route and ``global_rate`` overall."""
+    def __init__(self, rate: int, global_rate: int, per: float, latency: float):
+        self.rate = rate
+        self.global_rate = global_rate
+        self.per = per
+        self.latency = latency
+        self.routes: Dict[object, List[float]] = {}
+        self.everything: List[float] = []
+        self.sent = 0
+        self.rate_limited = 0
+
+    async def request(self, route):
+        # Retries after the advertised delay, like discord.py does
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            hits = self.routes[route] = [hit for hit in self.routes.get(route, []) if hit > now - self.per]
+            self.everything = [hit for hit in self.everything if hit > now - self.per]
+            if len(hits) < self.rate and len(self.everything) < self.global_rate:
+                hits.append(now)
+                self.everything.append(now)
+                break
+            self.rate_limited += 1
+            full = [window[0] for window, limit in ((hits, self.rate), (self.everything, self.global_rate))
+                    if len(window) >= limit]
+            await asyncio.sleep(max(full) + self.per - now)
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+
+async def bench_outbound(posts: int = 200, routes: int = 40, clicks: int = 300, channels: int = 2,
+                         messages: int = 10, window: float = 3.0, rate: int = 5, global_rate: int = 20,
+                         per: float = 0.25, latency: float = 0.02):
+    """Message refreshes while posts fan out: direct requests vs a FIFO queue vs the priority queue."""
+    async def run(mode: str) -> dict:
+        api = FakeRateLimits(rate, global_rate, per, latency)
+        queue = OutboundQueue(rate=rate, per=per, global_rate=global_rate, global_per=per)
+        refreshes: List[float] = []
+        loop = asyncio.get_running_loop()
+
+        async def send(route, priority: Priority, key=None):
+            call = functools.partial(api.request, route)
+            if mode == "ad hoc":
+                await call()
+            elif mode == "fifo queue":
+                await queue.submit(route, call)
+            else:
+                await queue.submit(route, call, priority, key)
+
+        async def click(n: int):
+            await asyncio.sleep(window * n / clicks)
+            started = loop.time()
+            await send((n % channels, "edit"), Priority.REFRESH, ("edit", n % messages))
+            refreshes.append(loop.time() - started)
+
+        started = loop.time()
+        await asyncio.gather(
+            *(send(("dm", n % routes), Priority.MESSAGE) for n in range(posts)),
+            *(click(n) for n in range(clicks)),
+        )
+        return {
+            "refresh_p50": percentile(refreshes, 50),
+            "refresh_p95": percentile(refreshes, 95),
+            "sent": api.sent,
+            "rate_limited": api.rate_limited,
+            "superseded": queue.superseded,
+            "elapsed": loop.time() - started,
+        }
+
+    print(f"outbound queue, {posts} posts over {routes} routes + {clicks} clicks on {messages} messages, "
+          f"limit {rate} per route and {global_rate} overall per {per * 1000:.0f} ms")
+    for mode in ("ad hoc", "fifo queue", "priority queue"):
+        r = await run(mode)
+        print(
+            f"  {mode:<15} refresh p50 {r['refresh_p50'] * 1000:7.0f} ms   p95 {r['refresh_p95'] * 1000:7.0f} ms   "
+            f"requests {r['sent']:4}   429s {r['rate_limited']:5}   superseded {r['superseded']:4}   "
+            f"done in {r['elapsed']:.2f} s"
+        )
+
+
+async def bench_upcoming_games(history: int = 100_000, upcoming: int = 50, repeat: int = 20):
+    """Time get_upcoming_games against years of finished games, old query vs epoch index."""
+    async with scratch_database() as db:
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+        rows = []
+        for n in range(history + upcoming):
+            offset = datetime.timedelta(hours=n - history + 1)
+            start = now + offset
+            war = start + datetime.timedelta(days=1)
+            rows.append((
+                "0", "ava", f"Map{n % 7}", "4x", start.strftime(TIME_FORMAT), war.strftime(TIME_FORMAT),
+                int(start.replace(tzinfo=datetime.timezone.utc).timestamp()),
+                int(war.replace(tzinfo=datetime.timezone.utc).timestamp()),
+            ))
+        db.conn.executemany('''
+            INSERT INTO ava_games (creator_id, game_type, map_name, game_speed,
+                                   start_time, war_time, start_ts, war_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        db.conn.commit()
+
+        def legacy_query():
+            # The pre-epoch query: a full scan with datetime() on every row
+            return db.conn.execute('''
+                SELECT * FROM ava_games
+                WHERE datetime(start_time) > datetime('now')
+                ORDER BY datetime(start_time) ASC
+            ''').fetchall()
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            legacy = legacy_query()
+        legacy_ms = (time.perf_counter() - started) * 1000 / repeat
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            indexed = await db.get_upcoming_games("ava")
+        indexed_ms = (time.perf_counter() - started) * 1000 / repeat
+
+    print(f"get_upcoming_games with {history} finished games, {upcoming} upcoming")
+    print(f"  datetime() scan {legacy_ms:8.2f} ms/query ({len(legacy)} rows)")
+    print(f"  start_ts index  {indexed_ms:8.2f} ms/query ({len(indexed)} rows)")
+
+
+async def bench_roster(games: int = 50, players: int = 20, repeat: int = 20):
+    """Load a page of pub games with their rosters: one signup query per game vs the batched roster query."""
+    async with scratch_database() as db:
+        for n in range(games):
+            game_id = await db.add_pub_game("0", f"Pub {n}", "2099-01-01 12:00", guild_id="1")
+            await db.set_role_limits(game_id, "pub", player=players)
+        db.conn.executemany('''
+            INSERT INTO game_signups (game_id, game_type, user_id, username, role)
+            VALUES (?, 'pub', ?, ?, 'player')
+        ''', [(game_id, str(user), f"user{user}") for game_id in range(1, games + 1) for user in range(players)])
+        db.conn.commit()
+
+        async def per_game():
+            listed = await db.get_upcoming_games("pub", "1")
+            return [await db.get_signups(game['id'], "pub") for game in listed]
+
+        async def batched():
+            return await db.get_upcoming_games("pub", "1")
+
+        results = {}
+        for name, load in (("query per game", per_game), ("batched roster", batched)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                db.cache.clear()
+                await load()
+            results[name] = (time.perf_counter() - started) * 1000 / repeat
+
+    print(f"roster load, {games} pub games x {players} players")
+    for name, ms in results.items():
+        print(f"  {name:<15} {ms:8.2f} ms/page")
+
+
+async def bench_player_reports(games: int = 100_000, per_game: int = 10, users: int = 20_000, repeat: int = 20):
+    """Player and map reports over a million archived signups: aggregate on demand vs index and summary tables."""
+    async with scratch_database() as db:
+        roles = ("ground", "air", "support", "navy")
+        db.conn.executemany('''
+            INSERT INTO archived_games (game_id, game_type, ended_ts, archived_ts, data)
+            VALUES (?, 'ava', 0, 0, ?)
+        ''', [
+            (n, json.dumps({"guild_id": str(n % 10), "map_name": f"Map{n % 25}",
+                            "roles": [[role, 3, 2 + n % 2] for role in roles]}))
+            for n in range(games)
+        ])
+        db.conn.executemany('''
+            INSERT INTO archived_signups (game_id, game_type, user_id, username, role)
+            VALUES (?, 'ava', ?, 'player', ?)
+        ''', (
+            (n, str((n * per_game + p) % users), roles[p % len(roles)])
+            for n in range(games) for p in range(per_game)
+        ))
+        # Fill the summary tables the way the v2 migration does for an existing file
+        db.conn.execute('DELETE FROM player_stats')
+        db.conn.execute('DELETE FROM map_stats')
+        db._migrate_v2(db.conn.cursor())
+        db.conn.commit()
+        user = "1234"
+
+        def player_totals():
+            return db.conn.execute('''
+                SELECT s.role, COUNT(*) FROM archived_signups s
+                JOIN archived_games a ON a.game_type = s.game_type AND a.game_id = s.game_id
+                WHERE s.user_id = ? AND json_extract(a.data, '$.guild_id') = ?
+                GROUP BY s.role
+            ''', (user, "4")).fetchall()
+
+        def map_totals():
+            return db.conn.execute('''
+                SELECT json_extract(data, '$.map_name'), COUNT(*),
+                       SUM((SELECT SUM(json_extract(r.value, '$[2]')) FROM json_each(data, '$.roles') r))
+                FROM archived_games WHERE json_extract(data, '$.guild_id') = ?
+                GROUP BY 1
+            ''', ("4",)).fetchall()
+
+        def timed(report) -> float:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                report()
+            return (time.perf_counter() - started) * 1000 / repeat
+
+        results = {}
+        db.conn.execute('DROP INDEX idx_archived_signups_user')
+        results["player, full scan"] = timed(player_totals)
+        db.conn.execute('CREATE INDEX idx_archived_signups_user ON archived_signups (user_id, game_type, role, game_id)')
+        results["player, user index"] = timed(player_totals)
+        results["player, summary"] = timed(lambda: db.get_player_stats.__wrapped__(db, "4", user))
+        results["map, full scan"] = timed(map_totals)
+        results["map, summary"] = timed(lambda: db.get_map_stats.__wrapped__(db, "4"))
+
+    print(f"player/map reports over {games * per_game} archived signups")
+    for name, ms in results.items():
+        print(f"  {name:<19} {ms:9.3f} ms/report")
+
+
+async def bench_backup(history: int = 400_000, clicks: int = 200, interval: float = 0.002):
+    """Join-and-leave latency while a large file is backed up: one blocking copy on the writer vs paged snapshot."""
+    async with scratch_database(backups=True) as db:
+        db.conn.executemany('''
+            INSERT INTO archived_signups (game_id, game_type, user_id, username, role)
+            VALUES (?, 'ava', ?, ?, 'ground')
+        ''', [(n, str(n % 5000), f"user{n}" * 4) for n in range(history)])
+        db.conn.commit()
+        game_id = await db.add_ava_game("0", "Map", "4x", "2099-01-01 12:00", "2099-01-02 12:00", "", guild_id="1")
+        await db.set_role_limits(game_id, "ava", ground=clicks * 2)
+        size_mib = os.path.getsize(db.config.path) / 2**20
+
+        def blocking_copy(self):
+            with sqlite3.connect(os.path.join(os.path.dirname(db.config.path), "blocking.db")) as target:
+                self.conn.backup(target)
+
+        async def signups(prefix: str) -> List[float]:
+            latencies = []
+            for n in range(clicks):
+                started = time.perf_counter()
+                await db.signup_user(game_id, "ava", f"{prefix}{n}", "user", "ground")
+                await db.remove_signup(game_id, "ava", f"{prefix}{n}")
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(interval)
+            return latencies
+
+        results = {}
+        for name, copy in (
+            ("writer, one step", lambda: db._run(db.executor, blocking_copy, (), {})),
+            ("reader, paged", db.snapshot),
+        ):
+            started = time.perf_counter()
+            latencies, _ = await asyncio.gather(signups(name[0]), copy())
+            results[name] = (time.perf_counter() - started, latencies)
+
+    print(f"signups during a backup of a {size_mib:.0f} MiB file")
+    for name, (elapsed, latencies) in results.items():
+        print(f"  {name:<17} click p50 {percentile(latencies, 50) * 1000:6.2f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  max {max(latencies) * 1000:7.2f} ms")
+
+
+async def bench_guild_partition(guilds: int = 500, per_guild: int = 40, repeat: int = 20):
+    """list_games for one guild when many guilds share the file: every guild's rows vs its own slice."""
+    async with scratch_database() as db:
+        start = int(time.time()) + 86400
+        db.conn.executemany('''
+            INSERT INTO ava_games (guild_id, creator_id, game_type, map_name, game_speed,
+                                   start_time, war_time, start_ts, war_ts)
+            VALUES (?, '0', 'ava', 'Map', '4x', '2099-01-01 12:00', '2099-01-02 12:00', ?, ?)
+        ''', [(str(n % guilds), start + n, start + n + 86400) for n in range(guilds * per_guild)])
+        db.conn.commit()
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            # The unpartitioned query: every guild's upcoming games
+            shared = db._fetch_games(db.conn.cursor(), "ava", 'g.start_ts > ?', (int(time.time()),))
+        shared_ms = (time.perf_counter() - started) * 1000 / repeat
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            scoped = await db.get_upcoming_games("ava", "7")
+        scoped_ms = (time.perf_counter() - started) * 1000 / repeat
+
+    print(f"list_games with {guilds} guilds x {per_guild} upcoming games in one file")
+    print(f"  every guild    {shared_ms:8.2f} ms/query ({len(shared)} rows)")
+    print(f"  guild slice    {scoped_ms:8.2f} ms/query ({len(scoped)} rows)")
+
+
+async def bench_cold_start(guilds: int = 200, per_guild: int = 20):
+    """Reopen a per-guild deployment: schema DDL on every file vs the versioned fast path, then preload."""
+    with tempfile.TemporaryDirectory() as tmp:
+        config = DatabaseConfig(path=os.path.join(tmp, "bench.db"), per_guild_dir=os.path.join(tmp, "guilds"))
+        router = DatabaseRouter(config)
+        start = int(time.time()) + 86400
+        for guild in range(guilds):
+            db = await router.for_guild(str(guild))
+            db.conn.executemany('''
+                INSERT INTO ava_games (guild_id, creator_id, game_type, map_name, game_speed,
+                                       start_time, war_time, start_ts, war_ts)
+                VALUES (?, '0', 'ava', 'Map', '4x', '2099-01-01 12:00', '2099-01-02 12:00', ?, ?)
+            ''', [(str(guild), start + n, start + n + 86400) for n in range(per_guild)])
+            db.conn.commit()
+        await router.close()
+
+        results = {}
+        for label, reset in (("every file", True), ("versioned", False)):
+            if reset:
+                # What every open did before: forget the version, so all the DDL runs
+                router = DatabaseRouter(config)
+                for db in router.all():
+                    db.conn.execute('PRAGMA user_version = 0')
+                await router.close()
+            started = time.perf_counter()
+            router = DatabaseRouter(config)
+            opened = time.perf_counter() - started
+            preloaded = await router.preload()
+            results[label] = (opened, time.perf_counter() - started - opened, preloaded)
+            await router.close()
+
+    print(f"cold start, {guilds} guild files x {per_guild} upcoming games")
+    for label, (opened, preload, preloaded) in results.items():
+        print(f"  {label:<12} open {opened * 1000:8.1f} ms   preload {preload * 1000:7.1f} ms ({preloaded} games)")
+
+
+async def bench_bulk_import(games: int = 200):
+    """Insert a season of games: schedule_ava's per-game statements vs one executemany transaction."""
+    season = [{
+        'map_name': f"Map{n % 7}", 'game_speed': "4x", 'notes': "",
+        'start_time': f"2099-01-{n % 28 + 1:02d} 12:00", 'war_time': f"2099-02-{n % 28 + 1:02d} 12:00",
+        'image_url': None, 'roles': list(DEFAULT_AVA_ROLES),
+    } for n in range(games)]
+
+    async with scratch_database() as db:
+
+        started = time.perf_counter()
+        for game in season:
+            # schedule_ava: INSERT, role UPSERT, SELECT, then UPDATE with the message ids
+            game_id = await db.add_ava_game("0", game['map_name'], game['game_speed'], game['start_time'],
+                                            game['war_time'], game['notes'])
+            await db.set_role_limits(game_id, "ava", **dict(game['roles']))
+            await db.get_game(game_id, "ava")
+            await db.update_game(game_id, "ava", channel_id="1", message_id=str(game_id))
+        single_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        created = await db.add_ava_games_bulk("0", season)
+        await db.set_game_messages("ava", [(game['id'], "1", str(game['id'])) for game in created])
+        bulk_ms = (time.perf_counter() - started) * 1000
+
+    assert len(created) == games
+    print(f"bulk import, {games} games")
+    print(f"  one at a time  {single_ms:8.1f} ms")
+    print(f"  executemany    {bulk_ms:8.1f} ms")
+
+
+async def bench_retention(finished: int = 50_000, signups_per_game: int = 6):
+    """Archive a backlog of finished games and show table sizes before and after."""
+    async with scratch_database(archive_batch=500) as db:
+        ended = int(time.time()) - 30 * 86400
+        db.conn.executemany('''
+            INSERT INTO ava_games (id, creator_id, game_type, map_name, game_speed,
+                                   start_time, war_time, start_ts, war_ts, notes)
+            VALUES (?, '0', 'ava', 'Old', '4x', '2000-01-01 12:00', '2000-01-02 12:00', ?, ?, 'notes')
+        ''', [(n, ended - 86400, ended) for n in range(1, finished + 1)])
+        db.conn.executemany('''
+            INSERT INTO game_signups (game_id, game_type, user_id, username, role)
+            VALUES (?, 'ava', ?, ?, 'ground')
+        ''', [(n, str(u), f"user{u}") for n in range(1, finished + 1) for u in range(signups_per_game)])
+        db.conn.commit()
+
+        before = await db.table_stats()
+        started = time.perf_counter()
+        moved = await db.run_retention()
+        elapsed = time.perf_counter() - started
+        after = await db.table_stats()
+
+    assert moved['ava'] == finished
+    print(f"retention pass over {finished} finished games: {elapsed * 1000:.0f} ms, "
+          f"{moved['vacuumed_pages']} pages released")
+    print("  before\n    " + format_table_stats(before).replace("\n", "\n    "))
+    print("  after\n    " + format_table_stats(after).replace("\n", "\n    "))
+
+
+def bench_render_cost(clicks: int = 2_000):
+    """Per-click cost of the signup embed and a list_games page: fresh build vs render cache."""
+    cog = AdminCommands(types.SimpleNamespace(db=None, metrics=Metrics()))
+    columns = ('id', 'map_name', 'game_speed', 'start_time', 'war_time', 'start_ts', 'war_ts', 'notes', 'image_url',
+               'version', 'roles')
+    roles = (RoleSlot('ground', 3, 1), RoleSlot('air', 2, 0), RoleSlot('support', 2, 0), RoleSlot('navy', 1, 0))
+    game = GameRow(columns, (1, "Bench", "4x", "2099-01-01 12:00", "2099-01-02 12:00", 4070944800, 4071031200,
+                             "notes", None, 0, roles))
+    games = [GameRow(columns, (n,) + tuple(game.values())[1:]) for n in range(200)]
+
+    def per_click(render) -> float:
+        started = time.perf_counter()
+        for _ in range(clicks):
+            render()
+        return (time.perf_counter() - started) / clicks * 1e6
+
+    fresh_embed = per_click(lambda: cog.build_ava_embed(game))
+    cached_embed = per_click(lambda: cog.create_embed("ava", game))
+
+    def fresh_pages():
+        cog.render_cache = RenderCache()
+        return cog.render_game_pages("ava", games)
+
+    fresh_list = per_click(fresh_pages)
+    pages = len(cog.render_game_pages("ava", games))
+    cached_list = per_click(lambda: cog.render_game_pages("ava", games))
+
+    print(f"render cost per click ({clicks} renders)")
+    print(f"  signup embed, fresh   {fresh_embed:8.2f} us")
+    print(f"  signup embed, cached  {cached_embed:8.2f} us")
+    print(f"  list_games, fresh     {fresh_list:8.2f} us ({len(games)} games, {pages} pages)")
+    print(f"  list_games, cached    {cached_list:8.2f} us")
+
+
+async def main():
+    await bench_event_loop_lag()
+    await bench_signup_contention()
+    if os.getenv("BENCH_POSTGRES_URL"):
+        await bench_postgres_contention(os.environ["BENCH_POSTGRES_URL"])
+    await bench_waitlist()
+    await bench_interaction_ack()
+    await bench_click_throttle()
+    await bench_outbound()
+    await bench_load()
+    await bench_upcoming_games()
+    await bench_roster()
+    await bench_player_reports()
+    await bench_guild_partition()
+    await bench_cold_start()
+    await bench_bulk_import()
+    await bench_retention()
+    await bench_backup()
+    bench_render_cost()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
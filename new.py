@@ -1,13 +1,38 @@
 import os
+import abc
+import argparse
 import asyncio
+import calendar
+import contextlib
+import csv
+import dataclasses
 import datetime
+import enum
+import functools
+import heapq
+import io
+import itertools
+import json
+import logging
+import re
 import sqlite3
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+import zoneinfo
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Taken before the heavy imports so time-to-ready includes them
+STARTED = time.perf_counter()
 
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 
+log = logging.getLogger(__name__)
+
 # Constants for image URLs
 RISING_TIDES = "https://wiki.conflictnations.com/images/thumb/c/c1/RisingTides_Frame_v2_%281%29.gif/380px-RisingTides_Frame_v2_%281%29.gif"
 WW3 = "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcS9LAA9pTsrubSazo9vOP8cGzv7sMdx2WYSKA&s"
@@ -16,48 +41,1322 @@ CON = "https://i.ytimg.com/vi/zewB_SSL9WA/hq720.jpg?sqp=-oaymwEhCK4FEIIDSFryq4qp
 FLASHPOINT = "https://steamcdn-a.akamaihd.net/steamcommunity/public/images/clans/31932263/83472e81d1f50bb516d7df4c41ce37cab04bb34b.png"
 ANTARCTICA = "https://preview.redd.it/the-making-of-antarctica-scenario-v0-2bwo8l15satd1.jpg?width=730&format=pjpg&auto=webp&s=5d50d4cbc5b3573bdba4323adc6587a589912d5a"
 
-class GameDatabase:
-    def __init__(self):
-        self.conn = sqlite3.connect('games.db')
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Roles (and capacities) used when a bulk-imported AvA game doesn't specify any
+DEFAULT_AVA_ROLES = (('ground', 3), ('air', 2), ('support', 2), ('navy', 0))
+# Role names RoleButton's custom_id template can route
+ROLE_NAME = re.compile(r'[a-z]{1,20}')
+# A view holds 25 buttons, one of them Leave
+MAX_ROLES = 24
+IMPORT_MAX_BYTES = 1024 * 1024
+
+# Discord embed limits
+EMBED_MAX_FIELDS = 25
+EMBED_MAX_CHARS = 6000
+EMBED_FIELD_MAX_CHARS = 1024
+
+class SignupResult(enum.Enum):
+    OK = "ok"
+    FULL = "full"
+    ALREADY_SIGNED_UP = "already_signed_up"
+    NOT_FOUND = "not_found"
+    UNKNOWN_ROLE = "unknown_role"
+    WAITLISTED = "waitlisted"
+    ALREADY_WAITLISTED = "already_waitlisted"
+
+class RoleSlot(NamedTuple):
+    role: str
+    max_slots: int
+    taken: int
+    waiting: int = 0
+    # Display names of everyone holding a slot
+    players: Tuple[str, ...] = ()
+    
+    @property
+    def full(self) -> bool:
+        return self.taken >= self.max_slots
+
+def find_role(game: "GameRow", role: str) -> Optional[RoleSlot]:
+    return next((slot for slot in game['roles'] if slot.role == role), None)
+
+def build_role_slots(role_rows, roster_rows) -> Dict[int, Tuple[RoleSlot, ...]]:
+    """Group ROLE_QUERY and ROSTER_QUERY rows into each game's role slots, players included."""
+    players: Dict[Tuple[int, str], List[str]] = {}
+    for game_id, role, username in roster_rows:
+        players.setdefault((game_id, role), []).append(username)
+    slots: Dict[int, List[RoleSlot]] = {}
+    for game_id, role, max_slots, taken, waiting in role_rows:
+        slots.setdefault(game_id, []).append(
+            RoleSlot(role, max_slots, taken, waiting, tuple(players.get((game_id, role), ())))
+        )
+    return {game_id: tuple(game_slots) for game_id, game_slots in slots.items()}
+
+def game_title(game: "GameRow") -> str:
+    """What players call a game: the map for AvA, the description for pub games."""
+    return game.get('map_name') or game.get('description') or f"game #{game['id']}"
+
+def game_table(game_type: str) -> str:
+    return 'ava_games' if game_type == "ava" else 'pub_games'
+
+def guild_key(guild_id: Optional[int]) -> Optional[str]:
+    """Guild IDs are stored as text, like every other snowflake in the schema."""
+    return str(guild_id) if guild_id is not None else None
+
+def parse_schedule_file(data: bytes, filename: str,
+                        timezone: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Parse a CSV or JSON schedule into games for add_ava_games_bulk, plus one error per rejected row."""
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        records = json.loads(text)
+        if isinstance(records, dict):
+            records = records.get('games', [])
+        if not isinstance(records, list):
+            raise ValueError("expected a JSON array of games")
+        first_row = 1
+    else:
+        records = list(csv.DictReader(io.StringIO(text)))
+        first_row = 2  # line 1 is the header
+        
+    games, errors = [], []
+    now = time.time()
+    for number, record in enumerate(records, start=first_row):
+        if not isinstance(record, dict):
+            errors.append(f"Row {number}: expected an object")
+            continue
+        record = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+        missing = [field for field in ('map_name', 'game_speed', 'start_time', 'war_time')
+                   if not str(record.get(field) or '').strip()]
+        if missing:
+            errors.append(f"Row {number}: missing {', '.join(missing)}")
+            continue
+            
+        try:
+            start_dt = datetime.datetime.strptime(str(record['start_time']).strip(), TIME_FORMAT)
+            war_dt = datetime.datetime.strptime(str(record['war_time']).strip(), TIME_FORMAT)
+        except ValueError:
+            errors.append(f"Row {number}: invalid time format, use YYYY-MM-DD HH:MM")
+            continue
+        start_ts = to_epoch(start_dt.strftime(TIME_FORMAT), timezone)
+        if start_ts < now:
+            errors.append(f"Row {number}: start time must be in the future")
+            continue
+        if to_epoch(war_dt.strftime(TIME_FORMAT), timezone) < start_ts:
+            errors.append(f"Row {number}: war time must be after start time")
+            continue
+            
+        roles = []
+        try:
+            for key, value in record.items():
+                if key.startswith('max_') and str(value).strip() != '':
+                    role, limit = key[4:], int(value)
+                    if limit < 0:
+                        raise ValueError(key)
+                    roles.append((role, limit))
+        except (TypeError, ValueError):
+            errors.append(f"Row {number}: role limits must be non-negative whole numbers")
+            continue
+        if not all(ROLE_NAME.fullmatch(role) for role, _ in roles):
+            errors.append(f"Row {number}: role names must be 1-20 letters a-z")
+            continue
+        if len(roles) > MAX_ROLES:
+            errors.append(f"Row {number}: at most {MAX_ROLES} roles per game")
+            continue
+            
+        games.append({
+            'map_name': str(record['map_name']).strip(),
+            'game_speed': str(record['game_speed']).strip(),
+            'start_time': start_dt.strftime(TIME_FORMAT),
+            'war_time': war_dt.strftime(TIME_FORMAT),
+            'notes': str(record.get('notes') or ''),
+            'image_url': str(record.get('image_url') or '').strip() or ANTARCTICA,
+            'roles': roles or list(DEFAULT_AVA_ROLES),
+        })
+    return games, errors
+
+def game_timezone(name: Optional[str]) -> datetime.tzinfo:
+    """The zone a game's times are written in; games from before zones existed are UTC."""
+    return zoneinfo.ZoneInfo(name) if name else datetime.timezone.utc
+
+def check_timezone(name: str) -> Optional[str]:
+    """Return ``name`` if it is an IANA zone such as ``Europe/Berlin``, otherwise None."""
+    try:
+        zoneinfo.ZoneInfo(name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return None
+    return name
+
+def to_epoch(value: str, timezone: Optional[str] = None) -> int:
+    """Epoch seconds for a stored ``YYYY-MM-DD HH:MM`` wall time in ``timezone`` (UTC when not given)."""
+    wall = datetime.datetime.strptime(value, TIME_FORMAT)
+    if not timezone:
+        return calendar.timegm(wall.timetuple())
+    return int(wall.replace(tzinfo=game_timezone(timezone)).timestamp())
+
+def game_time(game: Mapping, kind: str) -> str:
+    """A game's start or war time as Discord timestamps, shown to each viewer in their own zone."""
+    epoch = game.get(f'{kind}_ts')
+    if epoch is None:
+        return game[f'{kind}_time']
+    return discord_time(epoch)
+
+def discord_time(epoch: int) -> str:
+    """Full date and time plus a relative "in 3 hours", rendered by each client in its own zone."""
+    return f"<t:{epoch}:F> (<t:{epoch}:R>)"
+
+def start_datetime(game: Mapping) -> Optional[datetime.datetime]:
+    """When a game starts, for an embed's timestamp."""
+    epoch = game.get('start_ts')
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc) if epoch is not None else None
+
+def format_table_stats(stats: Dict[str, Any]) -> str:
+    """Render GameDatabase.table_stats() as an aligned text table."""
+    lines = [f"{'table':<18}{'rows':>10}{'KiB':>10}"]
+    for table, info in stats['tables'].items():
+        size = f"{info['bytes'] / 1024:.0f}" if 'bytes' in info else "-"
+        lines.append(f"{table:<18}{info['rows']:>10}{size:>10}")
+    lines.append(f"file {stats['file_bytes'] / 1024:.0f} KiB, {stats['free_bytes'] / 1024:.0f} KiB free")
+    return "\n".join(lines)
+
+def format_player_stats(stats: Dict[str, Any]) -> str:
+    """Render the per-role totals from StorageBackend.get_player_stats() as an aligned text table."""
+    lines = [f"{'role':<14}{'joined':>8}{'left':>6}{'no-show':>9}"]
+    played = no_shows = 0
+    favourite, most = None, 0
+    for game_type, role, joined, leaves, missed in stats['roles']:
+        lines.append(f"{game_type + ' ' + role:<14}{joined:>8}{leaves:>6}{missed:>9}")
+        played += joined - leaves
+        no_shows += missed
+        if joined - leaves > most:
+            favourite, most = f"{game_type} {role}", joined - leaves
+    lines.append(f"games {played}, favourite role {favourite or '-'}, "
+                 f"no-show rate {no_shows / played if played else 0:.0%}")
+    return "\n".join(lines)
+
+def format_upcoming_signups(stats: Dict[str, Any]) -> str:
+    """One line per upcoming signup; outside a code block, so the timestamps render."""
+    return "\n".join(
+        f"Signed up: {game_type} #{game_id} as {role}, {discord_time(start_ts)}"
+        for game_type, game_id, role, start_ts in stats['signups']
+    )
+
+def format_map_stats(rows: List[Tuple[str, str, int, int, int]]) -> str:
+    """Render StorageBackend.get_map_stats() as an aligned text table."""
+    lines = [f"{'map':<24}{'games':>7}{'slots':>7}{'filled':>8}"]
+    for game_type, map_name, games, slots, filled in rows:
+        name = f"{game_type} {map_name or '-'}"[:23]
+        lines.append(f"{name:<24}{games:>7}{slots:>7}{filled / slots if slots else 0:>8.0%}")
+    return "\n".join(lines)
+
+class GameRow(Mapping):
+    """Read-only game record sharing its table's column index; behaves like the dicts it replaces."""
+    __slots__ = ('_index', '_values')
+    _indexes: Dict[Tuple[str, ...], Dict[str, int]] = {}
+    
+    def __init__(self, columns: Tuple[str, ...], values: tuple):
+        index = self._indexes.get(columns)
+        if index is None:
+            index = self._indexes.setdefault(columns, {name: i for i, name in enumerate(columns)})
+        self._index = index
+        self._values = values
+        
+    def __getitem__(self, key: str):
+        return self._values[self._index[key]]
+    
+    def __iter__(self):
+        return iter(self._index)
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def __repr__(self) -> str:
+        return f"GameRow({dict(self)!r})"
+
+class GameCache:
+    """Thread-safe LRU of GameRow objects, written through by the database on every commit."""
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every write-through so readers can spot a stale row
+        self.write_seq = 0
+        self._rows: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def _key(game_type: str, game_id: int) -> Tuple[str, int]:
+        return ("ava" if game_type == "ava" else "pub", game_id)
+    
+    def get(self, game_type: str, game_id: int) -> Optional[GameRow]:
+        key = self._key(game_type, game_id)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(key)
+            self.hits += 1
+            return row
+        
+    def put(self, game_type: str, row: Optional[GameRow]):
+        """Store a row the writer just committed."""
+        if row is None:
+            return
+        with self._lock:
+            self.write_seq += 1
+            self._store(game_type, row)
+            
+    def fill(self, game_type: str, row: Optional[GameRow], seq: int):
+        """Store a row read on a reader connection unless a write happened since ``seq``."""
+        if row is None:
+            return
+        with self._lock:
+            if self.write_seq == seq:
+                self._store(game_type, row)
+                
+    def _store(self, game_type: str, row: GameRow):
+        key = self._key(game_type, row['id'])
+        self._rows[key] = row
+        self._rows.move_to_end(key)
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+            
+    def discard(self, game_type: str, game_id: int):
+        with self._lock:
+            self.write_seq += 1
+            self._rows.pop(self._key(game_type, game_id), None)
+            
+    def clear(self):
+        with self._lock:
+            self.write_seq += 1
+            self._rows.clear()
+            
+    def __len__(self) -> int:
+        return len(self._rows)
+        
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._rows), "hits": self.hits, "misses": self.misses}
+
+class RenderCache:
+    """LRU of rendered embeds and pages, reused only for the row version they were built from."""
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, key, version, value):
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class LatencySamples:
+    """Count, sum and a bounded window of recent samples for one timer."""
+    __slots__ = ('count', 'total', 'samples')
+    
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+        
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Metrics:
+    """In-process latency timers, counters and gauges, exported as Prometheus text or a log summary."""
+    QUANTILES = (0.5, 0.95, 0.99)
+    
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self.timers: Dict[Tuple[str, str], LatencySamples] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self.gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+        
+    def observe(self, family: str, name: str, seconds: float):
+        timer = self.timers.get((family, name))
+        if timer is None:
+            timer = self.timers[(family, name)] = LatencySamples(self.window)
+        timer.add(seconds)
+        
+    @contextlib.contextmanager
+    def timer(self, family: str, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(family, name, time.perf_counter() - started)
+            
+    def increment(self, family: str, name: str, amount: int = 1):
+        self.counters[(family, name)] = self.counters.get((family, name), 0) + amount
+        
+    def register_gauges(self, family: str, source: Callable[[], Dict[str, float]]):
+        """Sample ``source()`` at export time, e.g. a cache's ``stats`` method."""
+        self.gauges[family] = source
+        
+    def summary(self) -> str:
+        lines = []
+        for (family, name), timer in sorted(self.timers.items()):
+            p50, p95, p99 = (timer.quantile(q) * 1000 for q in self.QUANTILES)
+            lines.append(
+                f"{family:<18} {name:<40} n={timer.count:<7} "
+                f"p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms"
+            )
+        for (family, name), value in sorted(self.counters.items()):
+            lines.append(f"{family:<18} {name:<40} total={value}")
+        for family, source in sorted(self.gauges.items()):
+            values = " ".join(f"{key}={value}" for key, value in source().items())
+            lines.append(f"{family:<18} {values}")
+        return "\n".join(lines)
+    
+    def render_prometheus(self) -> str:
+        def label(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('"', '\\"')
+        
+        lines = []
+        for (family, name), timer in sorted(self.timers.items()):
+            metric = f"samebot_{family}_seconds"
+            for q in self.QUANTILES:
+                lines.append(f'{metric}{{name="{label(name)}",quantile="{q}"}} {timer.quantile(q):.6f}')
+            lines.append(f'{metric}_count{{name="{label(name)}"}} {timer.count}')
+            lines.append(f'{metric}_sum{{name="{label(name)}"}} {timer.total:.6f}')
+        for (family, name), value in sorted(self.counters.items()):
+            lines.append(f'samebot_{family}_total{{name="{label(name)}"}} {value}')
+        for family, source in sorted(self.gauges.items()):
+            for key, value in source().items():
+                lines.append(f'samebot_{family}{{name="{label(key)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+class InteractionQueue:
+    """Bounded queue of acknowledged interactions, drained by a fixed set of workers."""
+    def __init__(self, workers: int = 8, maxsize: int = 256, metrics: Optional[Metrics] = None):
+        self.workers = workers
+        self.metrics = metrics
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._tasks: List[asyncio.Task] = []
+        
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+            
+    def admit(self) -> bool:
+        """Whether there's room for another job; counts a rejection when there isn't."""
+        if self._queue.full():
+            self.rejected += 1
+            return False
+        return True
+    
+    def submit(self, name: str, job: Callable[[], Awaitable[None]]) -> bool:
+        """Queue ``job``; False (and nothing queued) when the queue is full."""
+        try:
+            self._queue.put_nowait((time.perf_counter(), name, job))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+    
+    async def _work(self):
+        while True:
+            queued_at, name, job = await self._queue.get()
+            if self.metrics:
+                self.metrics.observe("interaction_queue", name, time.perf_counter() - queued_at)
+            try:
+                await job()
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                log.exception("Queued %s interaction failed", name)
+            finally:
+                self._queue.task_done()
+                
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": self._queue.qsize(),
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+class ClickThrottle:
+    """Token bucket per player and game, plus the clicks still being processed."""
+    IN_FLIGHT = "in_flight"
+    THROTTLED = "throttled"
+    
+    def __init__(self, rate: float = 0.5, burst: int = 3, maxsize: int = 50_000):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.idle = burst / rate
+        self.admitted = 0
+        self.duplicates = 0
+        self.throttled = 0
+        self.expired = 0
+        # key -> (tokens, last update), least recently touched first
+        self._buckets: OrderedDict = OrderedDict()
+        self._in_flight: set = set()
+        
+    def admit(self, key: tuple) -> Optional[str]:
+        """Take a token for ``key``; returns why the click is refused, or None to go ahead."""
+        now = time.monotonic()
+        self._expire(now)
+        if key in self._in_flight:
+            self.duplicates += 1
+            return self.IN_FLIGHT
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self.throttled += 1
+            return self.THROTTLED
+        self._buckets[key] = (tokens - 1, now)
+        self._in_flight.add(key)
+        self.admitted += 1
+        return None
+    
+    def release(self, key: tuple):
+        """Mark an admitted click as finished, so the next one for its game is let through."""
+        self._in_flight.discard(key)
+        
+    def _expire(self, now: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.idle and len(self._buckets) <= self.maxsize:
+                break
+            del self._buckets[key]
+            self.expired += 1
+            
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buckets": len(self._buckets),
+            "in_flight": len(self._in_flight),
+            "admitted": self.admitted,
+            "duplicates": self.duplicates,
+            "throttled": self.throttled,
+            "expired": self.expired,
+        }
+
+class Priority(enum.IntEnum):
+    """Outbound request classes, most urgent first."""
+    INTERACTION = 0  # replies a user is waiting on
+    REFRESH = 1      # signup message re-renders
+    MESSAGE = 2      # confirmations, reminders, DMs, bulk posts
+
+class RateLimitLog(logging.Filter):
+    """Counts the 429s discord.py retries internally; it only reports them through its log."""
+    def __init__(self, metrics: Metrics):
+        super().__init__()
+        self.metrics = metrics
+        
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = str(record.msg)
+        if message.startswith("We are being rate limited"):
+            self.metrics.increment("discord_429", "route")
+        elif message.startswith("Global rate limit has been hit"):
+            self.metrics.increment("discord_429", "global")
+        return True
+
+@dataclasses.dataclass(eq=False)
+class OutboundRequest:
+    call: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    priority: Priority
+    key: Any
+    queued_at: float
+
+class OutboundQueue:
+    """Per-route and global rate limiting for outbound Discord requests, sent by priority."""
+    def __init__(self, rate: int = 5, per: float = 5.0, global_rate: int = 50, global_per: float = 1.0,
+                 metrics: Optional[Metrics] = None):
+        self.rate = rate
+        self.per = per
+        self.global_rate = global_rate
+        self.global_per = global_per
+        self.metrics = metrics
+        self.sent = 0
+        self.superseded = 0
+        self.rate_limited = 0
+        self._seq = itertools.count()
+        self._queues: Dict[Any, List[Tuple[int, int, OutboundRequest]]] = {}
+        self._workers: Dict[Any, asyncio.Task] = {}
+        self._keyed: Dict[Any, OutboundRequest] = {}
+        # Send times still inside each window; a route's outlives its worker
+        self._windows: Dict[Any, deque] = {}
+        self._global_window: deque = deque(maxlen=global_rate)
+        self._global_waiters: List[list] = []
+        
+    async def submit(self, route: Any, call: Callable[[], Awaitable[Any]],
+                     priority: Priority = Priority.MESSAGE, key: Any = None) -> Any:
+        """Queue ``call`` on ``route`` and wait for its result; a queued request with the same ``key`` is replaced."""
+        if key is not None:
+            queued = self._keyed.get(key)
+            if queued is not None:
+                queued.call = call
+                self.superseded += 1
+                return await asyncio.shield(queued.future)
+                
+        loop = asyncio.get_running_loop()
+        request = OutboundRequest(call, loop.create_future(), priority, key, loop.time())
+        if key is not None:
+            self._keyed[key] = request
+        heapq.heappush(self._queues.setdefault(route, []), (priority, next(self._seq), request))
+        if route not in self._workers:
+            if len(self._windows) > 1024:
+                self._prune_windows(loop.time())
+            self._workers[route] = asyncio.create_task(self._drain(route))
+        return await asyncio.shield(request.future)
+    
+    def _prune_windows(self, now: float):
+        for route in [route for route, window in self._windows.items()
+                      if route not in self._workers and window[-1] <= now - self.per]:
+            del self._windows[route]
+            
+    async def _drain(self, route: Any):
+        loop = asyncio.get_running_loop()
+        queue = self._queues[route]
+        window = self._windows.setdefault(route, deque(maxlen=self.rate))
+        try:
+            while queue:
+                if len(window) == self.rate:
+                    delay = window[0] + self.per - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                        
+                # Pick after the wait, so anything more urgent that arrived meanwhile goes first
+                priority, seq, request = queue[0]
+                # Interaction endpoints aren't counted against the global limit
+                if priority is not Priority.INTERACTION:
+                    await self._take_global(priority)
+                    priority, seq, request = queue[0]
+                heapq.heappop(queue)
+                if request.key is not None:
+                    # Edits submitted from here on queue behind this one instead of replacing it
+                    self._keyed.pop(request.key, None)
+                window.append(loop.time())
+                
+                if self.metrics:
+                    self.metrics.observe("outbound_wait", priority.name.lower(), loop.time() - request.queued_at)
+                try:
+                    result = await request.call()
+                except discord.RateLimited as e:
+                    # Only raised when a wait exceeds max_ratelimit_timeout; retry it ourselves
+                    self.rate_limited += 1
+                    heapq.heappush(queue, (priority, seq, request))
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    if isinstance(e, discord.HTTPException) and e.status == 429:
+                        self.rate_limited += 1
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                else:
+                    self.sent += 1
+                    if not request.future.done():
+                        request.future.set_result(result)
+        finally:
+            self._workers.pop(route, None)
+            self._queues.pop(route, None)
+            if not window:
+                self._windows.pop(route, None)
+                
+    async def _take_global(self, priority: Priority):
+        """Wait for room in the window shared by all routes; the most urgent waiter is served first."""
+        loop = asyncio.get_running_loop()
+        waiter = [priority, next(self._seq), loop.create_future()]
+        heapq.heappush(self._global_waiters, waiter)
+        try:
+            while True:
+                if self._global_waiters[0] is not waiter:
+                    await waiter[2]
+                    waiter[2] = loop.create_future()
+                    continue
+                now = loop.time()
+                window = self._global_window
+                if len(window) < self.global_rate or window[0] <= now - self.global_per:
+                    window.append(now)
+                    return
+                await asyncio.sleep(window[0] + self.global_per - now)
+        finally:
+            self._global_waiters.remove(waiter)
+            heapq.heapify(self._global_waiters)
+            if self._global_waiters and not self._global_waiters[0][2].done():
+                self._global_waiters[0][2].set_result(None)
+                
+    def stats(self) -> Dict[str, int]:
+        depth = {priority: 0 for priority in Priority}
+        for queue in self._queues.values():
+            for priority, _, _ in queue:
+                depth[priority] += 1
+        stats = {
+            "sent": self.sent,
+            "depth": sum(depth.values()),
+            "superseded": self.superseded,
+            "rate_limited": self.rate_limited,
+        }
+        stats.update((f"depth_{priority.name.lower()}", count) for priority, count in depth.items())
+        return stats
+
+class ReminderScheduler:
+    """Fires start/war reminders from an in-memory heap covering a rolling horizon."""
+    def __init__(self, databases: "DatabaseRouter", fire: Callable[[Optional[str], str, int, str], Awaitable[None]],
+                 lead: int = 15 * 60, horizon: int = 6 * 3600,
+                 owns: Callable[[Optional[str]], bool] = lambda guild_id: True):
+        self.databases = databases
+        self.fire = fire
+        # Whether this process sends a guild's reminders
+        self.owns = owns
+        self.lead = lead
+        self.horizon = horizon
+        self.fired = 0
+        self._heap: List[Tuple[int, int, tuple, int]] = []
+        # (guild_id, game_type, game_id, kind) -> event time
+        self._due: Dict[tuple, int] = {}
+        self._seq = itertools.count()
+        self._loaded_until = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Reminders being sent; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+        for task in self._tasks:
+            task.cancel()
+            
+    def schedule(self, guild_id: Optional[str], game_type: str, game_id: int, kind: str,
+                 event_ts: Optional[int], reminded_ts: Optional[int] = None):
+        key = (guild_id, game_type, game_id, kind)
+        if not self.owns(guild_id):
+            return
+        if event_ts is None or event_ts == reminded_ts or event_ts <= time.time() or event_ts > self._loaded_until:
+            # Past, already reminded, or beyond the horizon (a later top-up loads it)
+            self._due.pop(key, None)
+            return
+        if self._due.get(key) == event_ts:
+            return
+        self._due[key] = event_ts
+        heapq.heappush(self._heap, (event_ts - self.lead, next(self._seq), key, event_ts))
+        self._wakeup.set()
+        
+    def schedule_game(self, game_type: str, game: GameRow):
+        guild_id = game.get('guild_id')
+        self.schedule(guild_id, game_type, game['id'], 'start', game['start_ts'], game.get('start_reminded_ts'))
+        if game_type == "ava":
+            self.schedule(guild_id, game_type, game['id'], 'war', game['war_ts'], game.get('war_reminded_ts'))
+            
+    def cancel_game(self, guild_id: Optional[str], game_type: str, game_id: int):
+        for kind in ('start', 'war'):
+            self._due.pop((guild_id, game_type, game_id, kind), None)
+            
+    def reload(self):
+        """Drop everything in memory; the next wakeup reloads the horizon from the database."""
+        self._heap.clear()
+        self._due.clear()
+        self._loaded_until = 0
+        self._wakeup.set()
+            
+    def stats(self) -> Dict[str, int]:
+        return {"scheduled": len(self._due), "heap": len(self._heap), "fired": self.fired}
+    
+    async def _top_up(self, now: int):
+        until = now + self.lead + self.horizon
+        after = max(self._loaded_until, now)
+        batches = await asyncio.gather(*(db.get_reminder_events(after, until) for db in self.databases.all()))
+        self._loaded_until = until
+        for events in batches:
+            for guild_id, game_type, game_id, kind, event_ts in events:
+                self.schedule(guild_id, game_type, game_id, kind, event_ts)
+            
+    async def _run(self):
+        while True:
+            now = int(time.time())
+            if now + self.lead + self.horizon // 2 >= self._loaded_until:
+                await self._top_up(now)
+                
+            while self._heap and self._heap[0][0] <= now:
+                _, _, key, event_ts = heapq.heappop(self._heap)
+                if self._due.get(key) != event_ts:
+                    continue
+                del self._due[key]
+                task = asyncio.create_task(self._fire(key, event_ts))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                
+            if len(self._heap) > 2 * len(self._due) + 64:
+                self._heap = [entry for entry in self._heap if self._due.get(entry[2]) == entry[3]]
+                heapq.heapify(self._heap)
+                
+            next_top_up = self._loaded_until - self.lead - self.horizon // 2
+            next_at = min(self._heap[0][0], next_top_up) if self._heap else next_top_up
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_at - time.time()))
+            except asyncio.TimeoutError:
+                pass
+            
+    async def _fire(self, key: tuple, event_ts: int):
+        guild_id, game_type, game_id, kind = key
+        try:
+            # Mark first, so a crash skips a reminder rather than sending it twice
+            db = await self.databases.for_guild(guild_id)
+            if not await db.mark_reminded(game_id, game_type, kind, event_ts):
+                return
+            self.fired += 1
+            await self.fire(guild_id, game_type, game_id, kind)
+        except Exception:
+            log.exception("Failed to send %s reminder for %s game #%s", kind, game_type, game_id)
+
+@dataclasses.dataclass
+class DatabaseConfig:
+    """Settings for the shared database connections."""
+    path: str = 'games.db'
+    # A postgresql:// URL moves every shard process onto one shared server
+    url: str = ''
+    pool_size: int = 10
+    readers: int = 2
+    synchronous: str = 'NORMAL'
+    cache_size_kib: int = 16384
+    busy_timeout_ms: int = 5000
+    game_cache_size: int = 1024
+    archive_after_days: int = 7
+    archive_batch: int = 200
+    # When set, each guild's games live in their own file in this directory
+    per_guild_dir: str = ''
+    # When set, snapshots of every SQLite file are written here
+    backup_dir: str = ''
+    backup_pages: int = 256
+    backup_keep: int = 24
+    
+    @classmethod
+    def from_env(cls) -> "DatabaseConfig":
+        return cls(
+            path=os.getenv("GAMES_DB_PATH", cls.path),
+            url=os.getenv("GAMES_DB_URL", cls.url),
+            pool_size=int(os.getenv("GAMES_DB_POOL_SIZE", cls.pool_size)),
+            readers=int(os.getenv("GAMES_DB_READERS", cls.readers)),
+            synchronous=os.getenv("GAMES_DB_SYNCHRONOUS", cls.synchronous),
+            cache_size_kib=int(os.getenv("GAMES_DB_CACHE_KIB", cls.cache_size_kib)),
+            busy_timeout_ms=int(os.getenv("GAMES_DB_BUSY_TIMEOUT_MS", cls.busy_timeout_ms)),
+            game_cache_size=int(os.getenv("GAMES_CACHE_SIZE", cls.game_cache_size)),
+            archive_after_days=int(os.getenv("GAMES_ARCHIVE_AFTER_DAYS", cls.archive_after_days)),
+            archive_batch=int(os.getenv("GAMES_ARCHIVE_BATCH", cls.archive_batch)),
+            per_guild_dir=os.getenv("GAMES_DB_PER_GUILD_DIR", cls.per_guild_dir),
+            backup_dir=os.getenv("GAMES_DB_BACKUP_DIR", cls.backup_dir),
+            backup_pages=int(os.getenv("GAMES_DB_BACKUP_PAGES", cls.backup_pages)),
+            backup_keep=int(os.getenv("GAMES_DB_BACKUP_KEEP", cls.backup_keep)),
+        )
+
+class StorageBackend(abc.ABC):
+    """Where games, roles and signups are stored, behind a write-through GameCache."""
+    config: DatabaseConfig
+    metrics: Optional[Metrics]
+    cache: GameCache
+    
+    # Capacity plus signup and waitlist counts per role, from the role indexes
+    ROLE_QUERY = '''
+        SELECT r.game_id, r.role, r.max_slots, (
+            SELECT COUNT(*) FROM game_signups s
+            WHERE s.game_id = r.game_id AND s.game_type = r.game_type AND s.role = r.role
+        ), (
+            SELECT COUNT(*) FROM game_waitlist w
+            WHERE w.game_id = r.game_id AND w.game_type = r.game_type AND w.role = r.role
+        )
+        FROM game_roles r
+    '''
+    
+    # Who holds each slot, for the roster in signup messages
+    ROSTER_QUERY = '''
+        SELECT s.game_id, s.role, s.username FROM game_signups s
+    '''
+    
+    # Column holding the time a game is over, per game type
+    END_COLUMNS = {'ava': 'war_ts', 'pub': 'start_ts'}
+    
+    # Bookkeeping that means nothing once a game is over
+    ARCHIVE_SKIP = frozenset((
+        'id', 'game_type', 'version', 'start_ts', 'war_ts', 'start_reminded_ts', 'war_reminded_ts',
+    ))
+    
+    def _archive_data(self, game: GameRow) -> str:
+        data = {key: value for key, value in game.items()
+                if key not in self.ARCHIVE_SKIP and value not in (None, '')}
+        data['roles'] = [[slot.role, slot.max_slots, slot.taken] for slot in game['roles']]
+        return json.dumps(data, separators=(',', ':'))
+    
+    def _map_totals(self, game_type: str, game: GameRow) -> Tuple[str, str, str, int, int]:
+        """``(guild_id, game_type, map_name, slots, filled)`` a finished game adds to map_stats."""
+        return (
+            game['guild_id'] or '', game_type, game['map_name'] or '',
+            sum(slot.max_slots for slot in game['roles']), sum(slot.taken for slot in game['roles']),
+        )
+    
+    # Rows keyed by (game_type, game_id) that go when their game is archived
+    GAME_CHILDREN = ('game_signups', 'game_waitlist', 'game_roles', 'game_no_shows')
+    
+    STATS_TABLES = (
+        'ava_games', 'pub_games', 'game_signups', 'game_waitlist', 'game_roles', 'archived_games', 'archived_signups',
+        'player_stats', 'map_stats', 'game_no_shows',
+    )
+    
+    async def connect(self):
+        """Open network connections; local backends are ready on construction."""
+        
+    @abc.abstractmethod
+    async def close(self):
+        raise NotImplementedError
+    
+    async def check_external_writes(self) -> bool:
+        """Drop cached rows another process may have changed; True if any were dropped."""
+        return False
+    
+    async def get_game(self, game_id: int, game_type: str) -> Optional[GameRow]:
+        # Cache hits are answered on the event loop without a thread hop
+        game = self.cache.get(game_type, game_id)
+        if game is None:
+            game = await self._load_game(game_id, game_type)
+        return game
+    
+    @abc.abstractmethod
+    async def _load_game(self, game_id: int, game_type: str) -> Optional[GameRow]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def get_upcoming_games(self, game_type: str = "ava", guild_id: Optional[str] = None) -> List[GameRow]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def preload_upcoming(self) -> int:
+        """Fill the cache with the soonest upcoming games of every guild; returns how many."""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def add_ava_game(self, creator_id: str, map_name: str, game_speed: str, start_time: str,
+                           war_time: str, notes: str, image_url: str = ANTARCTICA,
+                           guild_id: Optional[str] = None, timezone: Optional[str] = None) -> int:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def add_pub_game(self, creator_id: str, description: str, start_time: str, map_name: str = "",
+                           notes: str = "", image_url: str = CON, guild_id: Optional[str] = None,
+                           timezone: Optional[str] = None) -> int:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def add_ava_games_bulk(self, creator_id: str, games: List[Dict[str, Any]],
+                                 guild_id: Optional[str] = None, timezone: Optional[str] = None) -> List[GameRow]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_game_messages(self, game_type: str, messages: List[Tuple[int, str, str]]) -> int:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def signup_user(self, game_id: int, game_type: str, user_id: str, username: str,
+                          role: str) -> Tuple[SignupResult, Optional[GameRow]]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def remove_signup(self, game_id: int, game_type: str,
+                            user_id: str) -> Tuple[Optional[GameRow], List[Tuple[str, str]]]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def promote_waitlist(self, game_id: int,
+                               game_type: str) -> Tuple[Optional[GameRow], List[Tuple[str, str]]]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_role_limits(self, game_id: int, game_type: str, **limits) -> bool:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def update_game(self, game_id: int, game_type: str, **updates) -> bool:
+        """Change a game's fields; new start and war times are read in the zone the game was created in."""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def get_user_timezone(self, user_id: str) -> Optional[str]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_user_timezone(self, user_id: str, timezone: Optional[str]) -> None:
+        """Save the zone a user schedules games in; None forgets it."""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def get_reminder_events(self, after: int, until: int) -> List[Tuple[Optional[str], str, int, str, int]]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def mark_reminded(self, game_id: int, game_type: str, kind: str, event_ts: int) -> bool:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def get_signups(self, game_id: int, game_type: str) -> List[Tuple[str, str, str]]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def mark_no_show(self, game_id: int, game_type: str, user_id: str) -> bool:
+        """Record that a signed-up player didn't turn up; False if they aren't signed up or already marked."""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def get_player_stats(self, guild_id: Optional[str], user_id: str) -> Dict[str, Any]:
+        """A player's totals per role and their upcoming signups in one guild."""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def get_map_stats(self, guild_id: Optional[str]) -> List[Tuple[str, str, int, int, int]]:
+        """``(game_type, map_name, games, slots, filled)`` for every map a finished game in the guild used."""
+        raise NotImplementedError
+    
+    def _merge_map_stats(self, rows) -> List[Tuple[str, str, int, int, int]]:
+        # Archived totals plus finished games retention hasn't reached yet
+        totals: Dict[Tuple[str, str], List[int]] = {}
+        for game_type, map_name, games, slots, filled in rows:
+            total = totals.setdefault((game_type, map_name), [0, 0, 0])
+            total[0] += games
+            total[1] += slots
+            total[2] += filled
+        merged = [key + tuple(total) for key, total in totals.items()]
+        merged.sort(key=lambda row: (-row[2], row[0], row[1]))
+        return merged
+    
+    @abc.abstractmethod
+    async def get_unassigned_channels(self) -> List[str]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def assign_guilds(self, channel_guilds: List[Tuple[str, str]]) -> int:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def archive_finished_games(self, game_type: str, ended_before: int) -> int:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def incremental_vacuum(self, pages: int = 0) -> int:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def table_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    async def run_retention(self) -> Dict[str, int]:
+        """Archive everything past the retention window, then give the freed space back."""
+        ended_before = int(time.time()) - self.config.archive_after_days * 86400
+        moved = {}
+        for game_type in self.END_COLUMNS:
+            moved[game_type] = 0
+            while True:
+                count = await self.archive_finished_games(game_type, ended_before)
+                moved[game_type] += count
+                if count < self.config.archive_batch:
+                    break
+        moved['vacuumed_pages'] = await self.incremental_vacuum()
+        return moved
+    
+    # Rows of a child table whose game is gone, on alias ``c``
+    ORPHANED = '''
+        NOT EXISTS (SELECT 1 FROM ava_games g WHERE c.game_type = 'ava' AND g.id = c.game_id)
+        AND NOT EXISTS (SELECT 1 FROM pub_games g WHERE c.game_type = 'pub' AND g.id = c.game_id)
+    '''
+    
+    # Waitlist places held by someone who already has a slot in that game
+    DOUBLE_LISTED = '''
+        EXISTS (
+            SELECT 1 FROM game_signups s
+            WHERE s.game_id = c.game_id AND s.game_type = c.game_type AND s.user_id = c.user_id
+        )
+    '''
+    
+    # Games whose waitlist holds someone already signed up
+    DOUBLE_LISTED_GAMES = f'SELECT DISTINCT c.game_id, c.game_type FROM game_waitlist c WHERE {DOUBLE_LISTED}'
+    
+    # Roles with a free slot and someone still queued for it
+    STRANDED_QUERY = '''
+        SELECT DISTINCT r.game_id, r.game_type FROM game_roles r
+        WHERE EXISTS (
+            SELECT 1 FROM game_waitlist w
+            WHERE w.game_id = r.game_id AND w.game_type = r.game_type AND w.role = r.role
+        ) AND (
+            SELECT COUNT(*) FROM game_signups s
+            WHERE s.game_id = r.game_id AND s.game_type = r.game_type AND s.role = r.role
+        ) < r.max_slots
+    '''
+    
+    # What joined - leaves must be per player and role, from live and archived signups
+    SIGNUP_COUNTS = '''
+        SELECT guild_id, user_id, game_type, role, COUNT(*) AS signups FROM (
+            SELECT COALESCE(g.guild_id, '') AS guild_id, s.user_id, s.game_type, s.role
+            FROM game_signups s JOIN ava_games g ON g.id = s.game_id
+            WHERE s.game_type = 'ava'
+            UNION ALL
+            SELECT COALESCE(g.guild_id, ''), s.user_id, s.game_type, s.role
+            FROM game_signups s JOIN pub_games g ON g.id = s.game_id
+            WHERE s.game_type = 'pub'
+            UNION ALL
+            SELECT COALESCE({guild}, ''), s.user_id, s.game_type, s.role
+            FROM archived_signups s JOIN archived_games a
+            ON a.game_type = s.game_type AND a.game_id = s.game_id
+        ) counted
+        GROUP BY guild_id, user_id, game_type, role
+    '''
+    
+    def _consistency_checks(self, guild_json: str) -> Dict[str, Tuple[str, Tuple[str, ...]]]:
+        """``name -> (count query, repair statements)`` for every set-based check."""
+        checks = {}
+        for child in self.GAME_CHILDREN:
+            checks[f'orphaned_{child}'] = (
+                f'SELECT COUNT(*) FROM {child} c WHERE {self.ORPHANED}',
+                (f'DELETE FROM {child} AS c WHERE {self.ORPHANED}',),
+            )
+        checks['double_listed'] = (
+            f'SELECT COUNT(*) FROM game_waitlist c WHERE {self.DOUBLE_LISTED}',
+            (f'DELETE FROM game_waitlist AS c WHERE {self.DOUBLE_LISTED}',),
+        )
+        counts = self.SIGNUP_COUNTS.format(guild=guild_json)
+        checks['player_stats'] = (f'''
+            WITH counts AS ({counts})
+            SELECT (
+                SELECT COUNT(*) FROM counts c WHERE NOT EXISTS (
+                    SELECT 1 FROM player_stats p
+                    WHERE p.guild_id = c.guild_id AND p.user_id = c.user_id AND p.game_type = c.game_type
+                    AND p.role = c.role AND p.joined - p.leaves = c.signups
+                )
+            ) + (
+                SELECT COUNT(*) FROM player_stats p WHERE p.joined <> p.leaves AND NOT EXISTS (
+                    SELECT 1 FROM counts c
+                    WHERE p.guild_id = c.guild_id AND p.user_id = c.user_id AND p.game_type = c.game_type
+                    AND p.role = c.role
+                )
+            )
+        ''', (
+            # Leaves and no-shows can't be rebuilt, so joined is set to agree with them
+            'UPDATE player_stats SET joined = leaves',
+            f'''
+                INSERT INTO player_stats (guild_id, user_id, game_type, role, joined)
+                SELECT guild_id, user_id, game_type, role, signups FROM ({counts}) c WHERE true
+                ON CONFLICT (guild_id, user_id, game_type, role)
+                DO UPDATE SET joined = player_stats.leaves + excluded.joined
+            ''',
+        ))
+        return checks
+    
+    @abc.abstractmethod
+    async def check_consistency(
+        self, repair: bool = False
+    ) -> Tuple[Dict[str, int], List[Tuple[str, GameRow, List[Tuple[str, str]]]]]:
+        """Count contradicting rows, repairing them with ``repair``; also returns the games it changed."""
+        raise NotImplementedError
+    
+    async def snapshot(self) -> Optional[str]:
+        """Write a backup if this backend keeps its own file; returns its path."""
+        return None
+
+def offloaded(func):
+    """Run a blocking GameDatabase method on the writer thread; the original stays as ``__wrapped__``."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        return await self._run(self.executor, func, args, kwargs)
+    return wrapper
+
+def offloaded_read(func):
+    """Like ``offloaded``, but run on the reader pool so reads never queue behind writes."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        return await self._run(self.read_executor, func, args, kwargs)
+    return wrapper
+
+def timed_query(func):
+    """Record an async backend method's latency the way ``offloaded`` does for SQLite."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            if self.metrics:
+                self.metrics.observe("db_query", func.__name__, time.perf_counter() - started)
+    return wrapper
+
+class GameDatabase(StorageBackend):
+    def __init__(self, config: Optional[DatabaseConfig] = None, metrics: Optional[Metrics] = None,
+                 executors: Optional[Tuple[ThreadPoolExecutor, ThreadPoolExecutor]] = None):
+        self.config = config or DatabaseConfig()
+        self.metrics = metrics
+        # One writer thread keeps commits off the event loop; WAL lets the reader pool run alongside
+        self._owns_executors = executors is None
+        self.executor, self.read_executor = executors or (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="gamedb-writer"),
+            ThreadPoolExecutor(max_workers=self.config.readers, thread_name_prefix="gamedb-reader"),
+        )
+        self.conn = self._connect()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self.cache = GameCache(self.config.game_cache_size)
         self.create_tables()
+        self._data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        
+    async def _run(self, executor: ThreadPoolExecutor, func, args: tuple, kwargs: dict):
+        # Timed from the loop, so queueing behind other statements counts
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, functools.partial(func, self, *args, **kwargs)
+            )
+        finally:
+            if self.metrics:
+                self.metrics.observe("db_query", func.__name__, time.perf_counter() - started)
+                
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.config.path,
+            timeout=self.config.busy_timeout_ms / 1000,
+            check_same_thread=False
+        )
+        conn.execute(f'PRAGMA synchronous={self.config.synchronous}')
+        conn.execute(f'PRAGMA cache_size=-{self.config.cache_size_kib}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
+    def _reader(self) -> sqlite3.Connection:
+        """Return this reader thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.execute('PRAGMA query_only=ON')
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+    
+    async def close(self):
+        """Flush and close every connection and stop the worker threads."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._close_writer)
+        if self._owns_executors:
+            self.read_executor.shutdown(wait=True)
+            self.executor.shutdown(wait=True)
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            
+    async def check_external_writes(self) -> bool:
+        # Nothing cached, nothing to drop; spares idle per-guild files a pragma on the writer
+        if not len(self.cache):
+            return False
+        return await self._check_data_version()
+        
+    @offloaded
+    def _check_data_version(self) -> bool:
+        # data_version only moves when another process commits to this file
+        version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        self.cache.clear()
+        return True
+    
+    def _close_writer(self):
+        self.conn.execute('PRAGMA optimize')
+        self.conn.close()
         
     def create_tables(self):
+        """Bring the file up to the latest schema version, tracked in ``PRAGMA user_version``."""
         cursor = self.conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] >= len(self.MIGRATIONS):
+            return
+            
+        # Existing files only switch modes after a full VACUUM, outside the migration transaction
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:
+            cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            cursor.execute('VACUUM')
+            
+        # Other processes opening the same file wait here
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            for migration in self.MIGRATIONS[version:]:
+                migration(self, cursor)
+            cursor.execute(f'PRAGMA user_version = {max(version, len(self.MIGRATIONS))}')
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+            
+    def _migrate_v1(self, cursor: sqlite3.Cursor):
+        """The original tables; also upgrades any file from before versioning."""
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ava_games (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id TEXT,
                 creator_id TEXT NOT NULL,
                 game_type TEXT NOT NULL,
                 map_name TEXT NOT NULL,
                 game_speed TEXT NOT NULL,
                 start_time TEXT NOT NULL,
                 war_time TEXT NOT NULL,
+                start_ts INTEGER,
+                war_ts INTEGER,
+                start_reminded_ts INTEGER,
+                war_reminded_ts INTEGER,
                 notes TEXT,
-                max_ground INTEGER DEFAULT 0,
-                max_air INTEGER DEFAULT 0,
-                max_navy INTEGER DEFAULT 0,
-                max_support INTEGER DEFAULT 0,
-                current_ground INTEGER DEFAULT 0,
-                current_air INTEGER DEFAULT 0,
-                current_navy INTEGER DEFAULT 0,
-                current_support INTEGER DEFAULT 0,
                 channel_id TEXT,
                 message_id TEXT,
-                image_url TEXT
+                image_url TEXT,
+                version INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS pub_games (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id TEXT,
                 creator_id TEXT NOT NULL,
                 description TEXT NOT NULL,
                 start_time TEXT NOT NULL,
+                start_ts INTEGER,
+                start_reminded_ts INTEGER,
                 map_name TEXT,
                 notes TEXT,
                 channel_id TEXT,
                 message_id TEXT,
-                image_url TEXT
+                image_url TEXT,
+                version INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
@@ -72,171 +1371,2152 @@ class GameDatabase:
             )
         ''')
         
-        self.conn.commit()
-    
-    def add_ava_game(self, creator_id: str, map_name: str, game_speed: str, 
-                    start_time: str, war_time: str, notes: str, image_url: str = ANTARCTICA) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO ava_games (
-                creator_id, game_type, map_name, game_speed, 
-                start_time, war_time, notes, image_url
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (creator_id, "ava", map_name, game_speed, start_time, war_time, notes, image_url))
-        self.conn.commit()
-        return cursor.lastrowid
-    
-    def add_pub_game(self, creator_id: str, description: str, start_time: str, 
-                    map_name: str = "", notes: str = "", image_url: str = CON) -> int:
-        cursor = self.conn.cursor()
+        # Users waiting on a full role; seq orders each role's queue
         cursor.execute('''
-            INSERT INTO pub_games (
-                creator_id, description, start_time, map_name, notes, image_url
-            ) VALUES (?, ?, ?, ?, ?, ?)
-        ''', (creator_id, description, start_time, map_name, notes, image_url))
-        self.conn.commit()
-        return cursor.lastrowid
-    
-    def get_game(self, game_id: int, game_type: str) -> Optional[Dict]:
-        cursor = self.conn.cursor()
-        if game_type == "ava":
-            cursor.execute('SELECT * FROM ava_games WHERE id = ?', (game_id,))
-        else:
-            cursor.execute('SELECT * FROM pub_games WHERE id = ?', (game_id,))
-        
-        row = cursor.fetchone()
-        if not row:
-            return None
-            
-        columns = [desc[0] for desc in cursor.description]
-        return dict(zip(columns, row))
-    
-    def get_upcoming_games(self, game_type: str = "ava") -> List[Dict]:
-        cursor = self.conn.cursor()
-        if game_type == "ava":
-            cursor.execute('''
-                SELECT * FROM ava_games 
-                WHERE datetime(start_time) > datetime('now')
-                ORDER BY datetime(start_time) ASC
-            ''')
-        else:
-            cursor.execute('''
-                SELECT * FROM pub_games 
-                WHERE datetime(start_time) > datetime('now')
-                ORDER BY datetime(start_time) ASC
-            ''')
+            CREATE TABLE IF NOT EXISTS game_waitlist (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_id INTEGER NOT NULL,
+                game_type TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                UNIQUE (game_id, game_type, user_id)
+            )
+        ''')
         
-        columns = [desc[0] for desc in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-    
-    def signup_user(self, game_id: int, game_type: str, user_id: str, username: str, role: str) -> bool:
-        # First check if user is already signed up
-        cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT 1 FROM game_signups 
-            WHERE game_id = ? AND game_type = ? AND user_id = ?
-        ''', (game_id, game_type, user_id))
+            CREATE TABLE IF NOT EXISTS game_roles (
+                game_id INTEGER NOT NULL,
+                game_type TEXT NOT NULL,
+                role TEXT NOT NULL,
+                max_slots INTEGER NOT NULL DEFAULT 0,
+                position INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (game_id, game_type, role)
+            )
+        ''')
         
-        if cursor.fetchone():
-            return False  # Already signed up
-            
-        # Add the signup
+        # Finished games as one JSON row each, so live schema changes never touch the archive
         cursor.execute('''
-            INSERT INTO game_signups (game_id, game_type, user_id, username, role)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (game_id, game_type, user_id, username, role))
-        
-        # Update the counts
-        if game_type == "ava":
+            CREATE TABLE IF NOT EXISTS archived_games (
+                game_id INTEGER NOT NULL,
+                game_type TEXT NOT NULL,
+                ended_ts INTEGER,
+                archived_ts INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (game_type, game_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archived_signups (
+                game_id INTEGER NOT NULL,
+                game_type TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                PRIMARY KEY (game_type, game_id, user_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        self.migrate_columns(cursor)
+        self.migrate_role_capacity(cursor)
+        # Role counts are derived from this index instead of stored counters
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_game_signups_role
+            ON game_signups (game_id, game_type, role)
+        ''')
+        # Serves both the waiting counts and popping the head of a role's queue
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_game_waitlist_role
+            ON game_waitlist (game_id, game_type, role, seq)
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ava_games_start_ts ON ava_games (start_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ava_games_war_ts ON ava_games (war_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pub_games_start_ts ON pub_games (start_ts)')
+        # Each guild's listings are a range scan over its own slice
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ava_games_guild_start ON ava_games (guild_id, start_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pub_games_guild_start ON pub_games (guild_id, start_ts)')
+        
+    
+    # Columns added after the first release: (name, declaration, backfill)
+    ADDED_COLUMNS = {
+        'ava_games': (
+            ('start_ts', 'INTEGER', "CAST(strftime('%s', start_time) AS INTEGER)"),
+            ('war_ts', 'INTEGER', "CAST(strftime('%s', war_time) AS INTEGER)"),
+            ('version', 'INTEGER NOT NULL DEFAULT 0', None),
+            ('start_reminded_ts', 'INTEGER', None),
+            ('war_reminded_ts', 'INTEGER', None),
+            ('guild_id', 'TEXT', None),
+        ),
+        'pub_games': (
+            ('start_ts', 'INTEGER', "CAST(strftime('%s', start_time) AS INTEGER)"),
+            ('version', 'INTEGER NOT NULL DEFAULT 0', None),
+            ('start_reminded_ts', 'INTEGER', None),
+            ('guild_id', 'TEXT', None),
+        ),
+    }
+    
+    def migrate_columns(self, cursor: sqlite3.Cursor, added: Optional[Dict[str, tuple]] = None):
+        """Add and backfill columns on databases created before they existed."""
+        for table, columns in (self.ADDED_COLUMNS if added is None else added).items():
+            cursor.execute(f'PRAGMA table_info({table})')
+            existing = {row[1] for row in cursor.fetchall()}
+            for name, declaration, backfill in columns:
+                if name in existing:
+                    continue
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {declaration}')
+                if backfill:
+                    cursor.execute(f'UPDATE {table} SET {name} = {backfill}')
+    
+    def migrate_role_capacity(self, cursor: sqlite3.Cursor):
+        """Move the old fixed max_*/current_* columns into game_roles."""
+        cursor.execute('PRAGMA table_info(ava_games)')
+        existing = {row[1] for row in cursor.fetchall()}
+        legacy_roles = ('ground', 'air', 'support', 'navy')
+        if 'max_ground' not in existing:
+            return
+        for position, role in enumerate(legacy_roles):
             cursor.execute(f'''
-                UPDATE ava_games 
-                SET current_{role} = current_{role} + 1
-                WHERE id = ?
-            ''', (game_id,))
+                INSERT OR IGNORE INTO game_roles (game_id, game_type, role, max_slots, position)
+                SELECT id, 'ava', ?, COALESCE(max_{role}, 0), ? FROM ava_games
+            ''', (role, position))
+        for role in legacy_roles:
+            cursor.execute(f'ALTER TABLE ava_games DROP COLUMN max_{role}')
+            cursor.execute(f'ALTER TABLE ava_games DROP COLUMN current_{role}')
+    
+    def _migrate_v2(self, cursor: sqlite3.Cursor):
+        """Per-player and per-map summary tables, backfilled from the live and archived signups."""
+        # A player's live or archived signups in one index range scan
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_game_signups_user
+            ON game_signups (user_id, game_type, role, game_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_archived_signups_user
+            ON archived_signups (user_id, game_type, role, game_id)
+        ''')
+        
+        # Running totals kept by every signup, leave and no-show; guild_id '' predates guilds
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS player_stats (
+                guild_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                game_type TEXT NOT NULL,
+                role TEXT NOT NULL,
+                joined INTEGER NOT NULL DEFAULT 0,
+                leaves INTEGER NOT NULL DEFAULT 0,
+                no_shows INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id, game_type, role)
+            ) WITHOUT ROWID
+        ''')
+        # Slots offered and filled by finished games, added as they are archived
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS map_stats (
+                guild_id TEXT NOT NULL,
+                game_type TEXT NOT NULL,
+                map_name TEXT NOT NULL,
+                games INTEGER NOT NULL DEFAULT 0,
+                slots INTEGER NOT NULL DEFAULT 0,
+                filled INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, game_type, map_name)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS game_no_shows (
+                game_type TEXT NOT NULL,
+                game_id INTEGER NOT NULL,
+                user_id TEXT NOT NULL,
+                PRIMARY KEY (game_type, game_id, user_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Existing rows are kept, so a re-run doesn't count anything twice
+        cursor.execute('''
+            INSERT OR IGNORE INTO player_stats (guild_id, user_id, game_type, role, joined)
+            SELECT guild_id, user_id, game_type, role, COUNT(*) FROM (
+                SELECT COALESCE(g.guild_id, '') AS guild_id, s.user_id, s.game_type, s.role
+                FROM game_signups s JOIN ava_games g ON g.id = s.game_id
+                WHERE s.game_type = 'ava'
+                UNION ALL
+                SELECT COALESCE(g.guild_id, ''), s.user_id, s.game_type, s.role
+                FROM game_signups s JOIN pub_games g ON g.id = s.game_id
+                WHERE s.game_type = 'pub'
+                UNION ALL
+                SELECT COALESCE(json_extract(a.data, '$.guild_id'), ''), s.user_id, s.game_type, s.role
+                FROM archived_signups s JOIN archived_games a
+                ON a.game_type = s.game_type AND a.game_id = s.game_id
+            )
+            GROUP BY guild_id, user_id, game_type, role
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO map_stats (guild_id, game_type, map_name, games, slots, filled)
+            SELECT COALESCE(json_extract(a.data, '$.guild_id'), ''), a.game_type,
+                   COALESCE(json_extract(a.data, '$.map_name'), ''), COUNT(*),
+                   SUM((SELECT COALESCE(SUM(json_extract(r.value, '$[1]')), 0)
+                        FROM json_each(a.data, '$.roles') r)),
+                   SUM((SELECT COALESCE(SUM(json_extract(r.value, '$[2]')), 0)
+                        FROM json_each(a.data, '$.roles') r))
+            FROM archived_games a
+            GROUP BY 1, 2, 3
+        ''')
+        
+    # The zone a game's times were entered in; NULL (UTC) for older games
+    TIMEZONE_COLUMNS = {
+        'ava_games': (('timezone', 'TEXT', None),),
+        'pub_games': (('timezone', 'TEXT', None),),
+    }
+    
+    def _migrate_v3(self, cursor: sqlite3.Cursor):
+        """The zone each game's times were entered in, and each user's preferred zone."""
+        self.migrate_columns(cursor, self.TIMEZONE_COLUMNS)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_timezones (
+                user_id TEXT PRIMARY KEY,
+                timezone TEXT NOT NULL
+            ) WITHOUT ROWID
+        ''')
         
+    # One step per schema version; append new steps, never edit a released one
+    MIGRATIONS = (_migrate_v1, _migrate_v2, _migrate_v3)
+    
+    @offloaded
+    def add_ava_game(self, creator_id: str, map_name: str, game_speed: str, 
+                    start_time: str, war_time: str, notes: str, image_url: str = ANTARCTICA,
+                    guild_id: Optional[str] = None, timezone: Optional[str] = None) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO ava_games (
+                guild_id, creator_id, game_type, map_name, game_speed, 
+                start_time, war_time, start_ts, war_ts, timezone, notes, image_url
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        ''', (guild_id, creator_id, "ava", map_name, game_speed, start_time, war_time,
+              to_epoch(start_time, timezone), to_epoch(war_time, timezone), timezone, notes, image_url))
+        game = self._make_row(cursor, cursor.fetchone(), "ava")
         self.conn.commit()
-        return True
+        self.cache.put("ava", game)
+        return game['id']
     
-    def remove_signup(self, game_id: int, game_type: str, user_id: str) -> bool:
-        # First get the role to decrement the count
+    @offloaded
+    def add_pub_game(self, creator_id: str, description: str, start_time: str, 
+                    map_name: str = "", notes: str = "", image_url: str = CON,
+                    guild_id: Optional[str] = None, timezone: Optional[str] = None) -> int:
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT role FROM game_signups 
-            WHERE game_id = ? AND game_type = ? AND user_id = ?
-        ''', (game_id, game_type, user_id))
-        
-        result = cursor.fetchone()
-        if not result:
-            return False
-            
-        role = result[0]
+            INSERT INTO pub_games (
+                guild_id, creator_id, description, start_time, start_ts, timezone, map_name, notes, image_url
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        ''', (guild_id, creator_id, description, start_time, to_epoch(start_time, timezone), timezone,
+              map_name, notes, image_url))
+        game = self._make_row(cursor, cursor.fetchone(), "pub")
+        self.conn.commit()
+        self.cache.put("pub", game)
+        return game['id']
+    
+    def _make_row(self, cursor: sqlite3.Cursor, row: Optional[tuple], game_type: str) -> Optional[GameRow]:
+        """Build a GameRow from the cursor's current result, attaching its role slots."""
+        if not row:
+            return None
+        columns = tuple(desc[0] for desc in cursor.description)
+        game_id = row[columns.index('id')]
+        role_type = "ava" if game_type == "ava" else "pub"
+        cursor.execute(self.ROLE_QUERY + '''
+            WHERE r.game_id = ? AND r.game_type = ?
+            ORDER BY r.position
+        ''', (game_id, role_type))
+        role_rows = cursor.fetchall()
+        cursor.execute(self.ROSTER_QUERY + '''
+            WHERE s.game_id = ? AND s.game_type = ?
+            ORDER BY lower(s.username)
+        ''', (game_id, role_type))
+        roles = build_role_slots(role_rows, cursor.fetchall()).get(game_id, ())
+        return GameRow(columns + ('roles',), row + (roles,))
+    
+    def _fetch_game(self, cursor: sqlite3.Cursor, game_id: int, game_type: str) -> Optional[GameRow]:
+        cursor.execute(f'SELECT * FROM {game_table(game_type)} WHERE id = ?', (game_id,))
+        return self._make_row(cursor, cursor.fetchone(), game_type)
+    
+    @offloaded_read
+    def _load_game(self, game_id: int, game_type: str) -> Optional[GameRow]:
+        seq = self.cache.write_seq
+        game = self._fetch_game(self._reader().cursor(), game_id, game_type)
+        self.cache.fill(game_type, game, seq)
+        return game
+    
+    def _fetch_games(self, cursor: sqlite3.Cursor, game_type: str, where: str, params: tuple) -> List[GameRow]:
+        """Load every game matching ``where`` (on alias ``g``) with its roles and rosters in three queries."""
+        table = game_table(game_type)
+        role_type = "ava" if game_type == "ava" else "pub"
+        cursor.execute(f'SELECT * FROM {table} g WHERE {where} ORDER BY g.start_ts ASC', params)
+        columns = tuple(desc[0] for desc in cursor.description) + ('roles',)
+        rows = cursor.fetchall()
         
-        # Remove the signup
-        cursor.execute('''
-            DELETE FROM game_signups 
-            WHERE game_id = ? AND game_type = ? AND user_id = ?
-        ''', (game_id, game_type, user_id))
+        # One query each for every listed game's roles and players rather than one per game
+        cursor.execute(self.ROLE_QUERY + f'''
+            JOIN {table} g ON g.id = r.game_id
+            WHERE r.game_type = ? AND {where}
+            ORDER BY r.game_id, r.position
+        ''', (role_type,) + params)
+        role_rows = cursor.fetchall()
+        cursor.execute(self.ROSTER_QUERY + f'''
+            JOIN {table} g ON g.id = s.game_id
+            WHERE s.game_type = ? AND {where}
+            ORDER BY s.game_id, lower(s.username)
+        ''', (role_type,) + params)
+        roles = build_role_slots(role_rows, cursor.fetchall())
         
-        # Update the counts
-        if game_type == "ava":
-            cursor.execute(f'''
-                UPDATE ava_games 
-                SET current_{role} = current_{role} - 1
+        return [GameRow(columns, row + (roles.get(row[0], ()),)) for row in rows]
+    
+    @offloaded_read
+    def get_upcoming_games(self, game_type: str = "ava", guild_id: Optional[str] = None) -> List[GameRow]:
+        seq = self.cache.write_seq
+        # Range scan on the (guild_id, start_ts) index
+        games = self._fetch_games(
+            self._reader().cursor(), game_type, 'g.guild_id IS ? AND g.start_ts > ?', (guild_id, int(time.time()))
+        )
+        for game in games:
+            self.cache.fill(game_type, game, seq)
+        return games
+    
+    @offloaded_read
+    def preload_upcoming(self) -> int:
+        loaded = 0
+        limit = self.cache.maxsize // len(self.END_COLUMNS)
+        for game_type in self.END_COLUMNS:
+            seq = self.cache.write_seq
+            games = self._fetch_games(self._reader().cursor(), game_type, f'''g.id IN (
+                SELECT id FROM {game_table(game_type)} WHERE start_ts > ? ORDER BY start_ts LIMIT ?
+            )''', (int(time.time()), limit))
+            for game in games:
+                self.cache.fill(game_type, game, seq)
+            loaded += len(games)
+        return loaded
+    
+    @offloaded
+    def add_ava_games_bulk(self, creator_id: str, games: List[Dict[str, Any]],
+                           guild_id: Optional[str] = None, timezone: Optional[str] = None) -> List[GameRow]:
+        """Insert many AvA games and their roles in a single transaction."""
+        if not games:
+            return []
+            
+        cursor = self.conn.cursor()
+        try:
+            # Take the write lock before reading the sequence
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT MAX(
+                    COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'ava_games'), 0),
+                    COALESCE((SELECT MAX(id) FROM ava_games), 0)
+                )
+            ''')
+            first_id = cursor.fetchone()[0] + 1
+            
+            cursor.executemany('''
+                INSERT INTO ava_games (
+                    id, guild_id, creator_id, game_type, map_name, game_speed,
+                    start_time, war_time, start_ts, war_ts, timezone, notes, image_url
+                ) VALUES (?, ?, ?, 'ava', ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (first_id + n, guild_id, creator_id, game['map_name'], game['game_speed'],
+                 game['start_time'], game['war_time'], to_epoch(game['start_time'], timezone),
+                 to_epoch(game['war_time'], timezone), timezone, game['notes'], game['image_url'])
+                for n, game in enumerate(games)
+            ])
+            cursor.executemany('''
+                INSERT INTO game_roles (game_id, game_type, role, max_slots, position)
+                VALUES (?, 'ava', ?, ?, ?)
+            ''', [
+                (first_id + n, role, max_slots, position)
+                for n, game in enumerate(games)
+                for position, (role, max_slots) in enumerate(game['roles'])
+            ])
+            
+            rows = self._fetch_games(cursor, "ava", 'g.id BETWEEN ? AND ?', (first_id, first_id + len(games) - 1))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+            
+        for game in rows:
+            self.cache.put("ava", game)
+        return rows
+    
+    @offloaded
+    def set_game_messages(self, game_type: str, messages: List[Tuple[int, str, str]]) -> int:
+        """Store (game_id, channel_id, message_id) for many games in one transaction."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(f'''
+                UPDATE {game_table(game_type)}
+                SET channel_id = ?, message_id = ?, version = version + 1
                 WHERE id = ?
-            ''', (game_id,))
+            ''', [(channel_id, message_id, game_id) for game_id, channel_id, message_id in messages])
+            updated = cursor.rowcount
+            ids = [game_id for game_id, _, _ in messages]
+            placeholders = ", ".join("?" * len(ids))
+            games = self._fetch_games(cursor, game_type, f'g.id IN ({placeholders})', tuple(ids)) if ids else []
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+            
+        for game in games:
+            self.cache.put(game_type, game)
+        return updated
+    
+    @offloaded
+    def signup_user(self, game_id: int, game_type: str, user_id: str, username: str,
+                    role: str) -> Tuple[SignupResult, Optional[GameRow]]:
+        """Sign a user up, or waitlist them on a full role, in one transaction."""
+        cursor = self.conn.cursor()
+        try:
+            # The primary key turns a second click into a no-op
+            cursor.execute('''
+                INSERT OR IGNORE INTO game_signups (game_id, game_type, user_id, username, role)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (game_id, game_type, user_id, username, role))
+            if cursor.rowcount == 0:
+                self.conn.rollback()
+                game = self._fetch_game(cursor, game_id, game_type)
+                self.cache.put(game_type, game)
+                return SignupResult.ALREADY_SIGNED_UP, game
+                
+            # Count includes the row just inserted, so more than max means full
+            cursor.execute('''
+                SELECT r.max_slots, (
+                    SELECT COUNT(*) FROM game_signups s
+                    WHERE s.game_id = r.game_id AND s.game_type = r.game_type AND s.role = r.role
+                )
+                FROM game_roles r
+                WHERE r.game_id = ? AND r.game_type = ? AND r.role = ?
+            ''', (game_id, game_type, role))
+            capacity = cursor.fetchone()
+            result = SignupResult.OK
+            if capacity and capacity[1] > capacity[0]:
+                # Swap the speculative signup for a place in the role's queue
+                cursor.execute('''
+                    DELETE FROM game_signups WHERE game_id = ? AND game_type = ? AND user_id = ?
+                ''', (game_id, game_type, user_id))
+                cursor.execute('''
+                    INSERT OR IGNORE INTO game_waitlist (game_id, game_type, user_id, username, role)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (game_id, game_type, user_id, username, role))
+                result = SignupResult.WAITLISTED if cursor.rowcount else SignupResult.ALREADY_WAITLISTED
+            elif capacity:
+                # A waiter who takes a free slot in another role leaves the queue
+                cursor.execute('''
+                    DELETE FROM game_waitlist WHERE game_id = ? AND game_type = ? AND user_id = ?
+                ''', (game_id, game_type, user_id))
+                
+            if not capacity or result is SignupResult.ALREADY_WAITLISTED:
+                self.conn.rollback()
+                game = self._fetch_game(cursor, game_id, game_type)
+                self.cache.put(game_type, game)
+                if not game:
+                    return SignupResult.NOT_FOUND, None
+                return (result if capacity else SignupResult.UNKNOWN_ROLE), game
+                
+            cursor.execute(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = ? RETURNING *',
+                (game_id,)
+            )
+            game = self._make_row(cursor, cursor.fetchone(), game_type)
+            if not game:
+                self.conn.rollback()
+                return SignupResult.NOT_FOUND, None
+            if result is SignupResult.OK:
+                self._count_players(cursor, game['guild_id'], game_type, 'joined', [(user_id, role)])
+                
+            self.conn.commit()
+            self.cache.put(game_type, game)
+            return result, game
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def _count_players(self, cursor: sqlite3.Cursor, guild_id: Optional[str], game_type: str, column: str,
+                       players: List[Tuple[str, str]]):
+        """Add one to a player_stats counter per ``(user_id, role)``, inside the caller's transaction."""
+        if not players:
+            return
+        cursor.executemany(f'''
+            INSERT INTO player_stats (guild_id, user_id, game_type, role, {column})
+            VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (guild_id, user_id, game_type, role) DO UPDATE SET {column} = {column} + 1
+        ''', [(guild_id or '', user_id, game_type, role) for user_id, role in players])
+    
+    def _promote_waiters(self, cursor: sqlite3.Cursor, game_id: int, game_type: str,
+                         role: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Move the oldest waiters into free slots; returns ``(user_id, role)`` for each."""
+        where = 'WHERE r.game_id = ? AND r.game_type = ?'
+        params: tuple = (game_id, game_type)
+        if role is not None:
+            where += ' AND r.role = ?'
+            params += (role,)
+        cursor.execute(self.ROLE_QUERY + where, params)
         
-        self.conn.commit()
-        return True
+        promoted = []
+        for _, slot_role, max_slots, taken, waiting in cursor.fetchall():
+            free = min(max_slots - taken, waiting)
+            if free <= 0:
+                continue
+            cursor.execute('''
+                DELETE FROM game_waitlist WHERE seq IN (
+                    SELECT seq FROM game_waitlist
+                    WHERE game_id = ? AND game_type = ? AND role = ?
+                    ORDER BY seq LIMIT ?
+                )
+                RETURNING user_id, username
+            ''', (game_id, game_type, slot_role, free))
+            waiters = cursor.fetchall()
+            cursor.executemany('''
+                INSERT INTO game_signups (game_id, game_type, user_id, username, role)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(game_id, game_type, user_id, username, slot_role) for user_id, username in waiters])
+            promoted.extend((user_id, slot_role) for user_id, _ in waiters)
+        return promoted
+    
+    @offloaded
+    def remove_signup(self, game_id: int, game_type: str,
+                      user_id: str) -> Tuple[Optional[GameRow], List[Tuple[str, str]]]:
+        """Remove a signup or waitlist place, promoting into any freed slot."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('''
+                DELETE FROM game_signups
+                WHERE game_id = ? AND game_type = ? AND user_id = ?
+                RETURNING role
+            ''', (game_id, game_type, user_id))
+            removed = cursor.fetchone()
+            promoted = []
+            if removed:
+                promoted = self._promote_waiters(cursor, game_id, game_type, removed[0])
+            else:
+                cursor.execute('''
+                    DELETE FROM game_waitlist WHERE game_id = ? AND game_type = ? AND user_id = ?
+                ''', (game_id, game_type, user_id))
+                if cursor.rowcount == 0:
+                    self.conn.rollback()
+                    return None, []
+                    
+            cursor.execute(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = ? RETURNING *',
+                (game_id,)
+            )
+            game = self._make_row(cursor, cursor.fetchone(), game_type)
+            if game and removed:
+                self._count_players(cursor, game['guild_id'], game_type, 'leaves', [(user_id, removed[0])])
+                self._count_players(cursor, game['guild_id'], game_type, 'joined', promoted)
+            self.conn.commit()
+            self.cache.put(game_type, game)
+            return game, promoted
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    @offloaded
+    def promote_waitlist(self, game_id: int, game_type: str) -> Tuple[Optional[GameRow], List[Tuple[str, str]]]:
+        """Fill free slots from the waitlists, e.g. after role limits were raised."""
+        cursor = self.conn.cursor()
+        try:
+            promoted = self._promote_waiters(cursor, game_id, game_type)
+            if not promoted:
+                self.conn.rollback()
+                return None, []
+                
+            cursor.execute(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = ? RETURNING *',
+                (game_id,)
+            )
+            game = self._make_row(cursor, cursor.fetchone(), game_type)
+            if game:
+                self._count_players(cursor, game['guild_id'], game_type, 'joined', promoted)
+            self.conn.commit()
+            self.cache.put(game_type, game)
+            return game, promoted
+        except BaseException:
+            self.conn.rollback()
+            raise
     
+    @offloaded
     def set_role_limits(self, game_id: int, game_type: str, **limits) -> bool:
-        if game_type != "ava":
+        """Create or resize roles; new roles are shown after existing ones in argument order."""
+        if not limits or not all(ROLE_NAME.fullmatch(role) for role in limits):
             return False
             
         cursor = self.conn.cursor()
-        updates = []
-        params = []
-        
-        for role, limit in limits.items():
-            if role in ['ground', 'air', 'navy', 'support']:
-                updates.append(f"max_{role} = ?")
-                params.append(limit)
-        
-        if not updates:
-            return False
+        try:
+            cursor.execute(
+                'SELECT role FROM game_roles WHERE game_id = ? AND game_type = ?', (game_id, game_type)
+            )
+            if len({row[0] for row in cursor.fetchall()} | set(limits)) > MAX_ROLES:
+                return False
+            cursor.execute(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = ?', (game_id,)
+            )
+            if cursor.rowcount == 0:
+                self.conn.rollback()
+                return False
+                
+            cursor.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM game_roles WHERE game_id = ? AND game_type = ?',
+                (game_id, game_type)
+            )
+            next_position = cursor.fetchone()[0]
+            cursor.executemany('''
+                INSERT INTO game_roles (game_id, game_type, role, max_slots, position)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (game_id, game_type, role) DO UPDATE SET max_slots = excluded.max_slots
+            ''', [
+                (game_id, game_type, role, limit, next_position + offset)
+                for offset, (role, limit) in enumerate(limits.items())
+            ])
             
-        params.append(game_id)
-        query = f"UPDATE ava_games SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        self.conn.commit()
-        return cursor.rowcount > 0
+            game = self._fetch_game(cursor, game_id, game_type)
+            self.conn.commit()
+            self.cache.put(game_type, game)
+            return True
+        except BaseException:
+            self.conn.rollback()
+            raise
     
+    @offloaded
     def update_game(self, game_id: int, game_type: str, **updates) -> bool:
         cursor = self.conn.cursor()
         valid_fields = []
         params = []
         
+        timezone = None
+        if 'start_time' in updates or 'war_time' in updates:
+            cursor.execute(f'SELECT timezone FROM {game_table(game_type)} WHERE id = ?', (game_id,))
+            row = cursor.fetchone()
+            timezone = row[0] if row else None
+            
         for field, value in updates.items():
-            if field in ['map_name', 'game_speed', 'start_time', 'war_time', 'notes', 'image_url']:
+            if field in ['map_name', 'game_speed', 'description', 'start_time', 'war_time', 'notes', 'image_url',
+                         'channel_id', 'message_id']:
                 valid_fields.append(f"{field} = ?")
                 params.append(value)
+                if field in ['start_time', 'war_time']:
+                    valid_fields.append(f"{field[:-5]}_ts = ?")
+                    params.append(to_epoch(value, timezone))
         
         if not valid_fields:
             return False
             
+        valid_fields.append("version = version + 1")
         params.append(game_id)
-        if game_type == "ava":
-            query = f"UPDATE ava_games SET {', '.join(valid_fields)} WHERE id = ?"
+        query = f"UPDATE {game_table(game_type)} SET {', '.join(valid_fields)} WHERE id = ? RETURNING *"
+        
+        cursor.execute(query, params)
+        game = self._make_row(cursor, cursor.fetchone(), game_type)
+        self.conn.commit()
+        self.cache.put(game_type, game)
+        return game is not None
+    
+    @offloaded_read
+    def get_user_timezone(self, user_id: str) -> Optional[str]:
+        cursor = self._reader().cursor()
+        cursor.execute('SELECT timezone FROM user_timezones WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    @offloaded
+    def set_user_timezone(self, user_id: str, timezone: Optional[str]) -> None:
+        cursor = self.conn.cursor()
+        if timezone is None:
+            cursor.execute('DELETE FROM user_timezones WHERE user_id = ?', (user_id,))
         else:
-            query = f"UPDATE pub_games SET {', '.join(valid_fields)} WHERE id = ?"
+            cursor.execute('''
+                INSERT INTO user_timezones (user_id, timezone) VALUES (?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET timezone = excluded.timezone
+            ''', (user_id, timezone))
+        self.conn.commit()
+
+    @offloaded_read
+    def get_reminder_events(self, after: int, until: int) -> List[Tuple[Optional[str], str, int, str, int]]:
+        """Return (guild_id, game_type, game_id, kind, event_ts) for un-reminded events in (after, until]."""
+        cursor = self._reader().cursor()
+        # Each branch is a range scan on its own start_ts/war_ts index
+        cursor.execute('''
+            SELECT guild_id, 'ava', id, 'start', start_ts FROM ava_games
+            WHERE start_ts > ? AND start_ts <= ? AND start_reminded_ts IS NOT start_ts
+            UNION ALL
+            SELECT guild_id, 'ava', id, 'war', war_ts FROM ava_games
+            WHERE war_ts > ? AND war_ts <= ? AND war_reminded_ts IS NOT war_ts
+            UNION ALL
+            SELECT guild_id, 'pub', id, 'start', start_ts FROM pub_games
+            WHERE start_ts > ? AND start_ts <= ? AND start_reminded_ts IS NOT start_ts
+        ''', (after, until) * 3)
+        return cursor.fetchall()
+    
+    @offloaded
+    def mark_reminded(self, game_id: int, game_type: str, kind: str, event_ts: int) -> bool:
+        """Record that a reminder went out; False if the event time changed in the meantime."""
+        if kind not in ('start', 'war'):
+            raise ValueError(f"Unknown reminder: {kind}")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            UPDATE {game_table(game_type)} SET {kind}_reminded_ts = {kind}_ts
+            WHERE id = ? AND {kind}_ts = ?
+            RETURNING *
+        ''', (game_id, event_ts))
+        game = self._make_row(cursor, cursor.fetchone(), game_type)
+        self.conn.commit()
+        self.cache.put(game_type, game)
+        return game is not None
+    
+    @offloaded_read
+    def get_signups(self, game_id: int, game_type: str) -> List[Tuple[str, str, str]]:
+        """Return (user_id, username, role) for everyone signed up to a game."""
+        cursor = self._reader().cursor()
+        cursor.execute('''
+            SELECT user_id, username, role FROM game_signups
+            WHERE game_id = ? AND game_type = ?
+        ''', (game_id, game_type))
+        return cursor.fetchall()
+
+    @offloaded
+    def mark_no_show(self, game_id: int, game_type: str, user_id: str) -> bool:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT g.guild_id, s.role FROM game_signups s JOIN {game_table(game_type)} g ON g.id = s.game_id
+                WHERE s.game_id = ? AND s.game_type = ? AND s.user_id = ?
+            ''', (game_id, game_type, user_id))
+            signup = cursor.fetchone()
+            if signup is None:
+                return False
+            cursor.execute('''
+                INSERT OR IGNORE INTO game_no_shows (game_type, game_id, user_id) VALUES (?, ?, ?)
+            ''', (game_type, game_id, user_id))
+            if cursor.rowcount == 0:
+                self.conn.rollback()
+                return False
+            self._count_players(cursor, signup[0], game_type, 'no_shows', [(user_id, signup[1])])
+            self.conn.commit()
+            return True
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    @offloaded_read
+    def get_player_stats(self, guild_id: Optional[str], user_id: str) -> Dict[str, Any]:
+        cursor = self._reader().cursor()
+        # Primary key prefix: one range scan however many players there are
+        cursor.execute('''
+            SELECT game_type, role, joined, leaves, no_shows FROM player_stats
+            WHERE guild_id = ? AND user_id = ?
+        ''', (guild_id or '', user_id))
+        roles = cursor.fetchall()
+        # idx_game_signups_user finds the player's signups; each game is then a key lookup
+        cursor.execute('''
+            SELECT 'ava', s.game_id, s.role, g.start_ts
+            FROM game_signups s JOIN ava_games g ON g.id = s.game_id
+            WHERE s.user_id = ? AND s.game_type = 'ava' AND g.guild_id IS ? AND g.start_ts > ?
+            UNION ALL
+            SELECT 'pub', s.game_id, s.role, g.start_ts
+            FROM game_signups s JOIN pub_games g ON g.id = s.game_id
+            WHERE s.user_id = ? AND s.game_type = 'pub' AND g.guild_id IS ? AND g.start_ts > ?
+            ORDER BY 4
+        ''', (user_id, guild_id, int(time.time())) * 2)
+        return {'roles': roles, 'signups': cursor.fetchall()}
+    
+    @offloaded_read
+    def get_map_stats(self, guild_id: Optional[str]) -> List[Tuple[str, str, int, int, int]]:
+        cursor = self._reader().cursor()
+        cursor.execute('''
+            SELECT game_type, map_name, games, slots, filled FROM map_stats WHERE guild_id = ?
+        ''', (guild_id or '',))
+        rows = cursor.fetchall()
+        now = int(time.time())
+        for game_type, end_column in self.END_COLUMNS.items():
+            cursor.execute(f'''
+                SELECT ?, COALESCE(g.map_name, ''), COUNT(*),
+                       SUM((SELECT COALESCE(SUM(r.max_slots), 0) FROM game_roles r
+                            WHERE r.game_id = g.id AND r.game_type = ?)),
+                       SUM((SELECT COUNT(*) FROM game_signups s
+                            WHERE s.game_id = g.id AND s.game_type = ?))
+                FROM {game_table(game_type)} g
+                WHERE g.guild_id IS ? AND g.start_ts <= ? AND g.{end_column} <= ?
+                GROUP BY 2
+            ''', (game_type, game_type, game_type, guild_id, now, now))
+            rows.extend(cursor.fetchall())
+        return self._merge_map_stats(rows)
+    
+    @offloaded_read
+    def get_unassigned_channels(self) -> List[str]:
+        """Channels of games stored before guild partitioning, which have no guild_id yet."""
+        cursor = self._reader().cursor()
+        cursor.execute('''
+            SELECT channel_id FROM ava_games WHERE guild_id IS NULL AND channel_id IS NOT NULL
+            UNION
+            SELECT channel_id FROM pub_games WHERE guild_id IS NULL AND channel_id IS NOT NULL
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+    
+    @offloaded
+    def assign_guilds(self, channel_guilds: List[Tuple[str, str]]) -> int:
+        """Set guild_id from (channel_id, guild_id) pairs on games that have none."""
+        cursor = self.conn.cursor()
+        updated = 0
+        for table in ('ava_games', 'pub_games'):
+            cursor.executemany(f'''
+                UPDATE {table} SET guild_id = ?, version = version + 1
+                WHERE channel_id = ? AND guild_id IS NULL
+            ''', [(guild_id, channel_id) for channel_id, guild_id in channel_guilds])
+            updated += cursor.rowcount
+        self.conn.commit()
+        self.cache.clear()
+        return updated
+    
+    @offloaded
+    def archive_finished_games(self, game_type: str, ended_before: int) -> int:
+        """Move one batch of games that ended before ``ended_before`` into the archive tables."""
+        table = game_table(game_type)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT id FROM {table}
+                WHERE {self.END_COLUMNS[game_type]} < ?
+                ORDER BY {self.END_COLUMNS[game_type]}
+                LIMIT ?
+            ''', (ended_before, self.config.archive_batch))
+            ids = tuple(row[0] for row in cursor.fetchall())
+            if not ids:
+                return 0
+                
+            placeholders = ", ".join("?" * len(ids))
+            games = self._fetch_games(cursor, game_type, f'g.id IN ({placeholders})', ids)
+            archived_ts = int(time.time())
+            cursor.executemany('''
+                INSERT OR REPLACE INTO archived_games (game_id, game_type, ended_ts, archived_ts, data)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (game['id'], game_type, game[self.END_COLUMNS[game_type]], archived_ts, self._archive_data(game))
+                for game in games
+            ])
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO archived_signups (game_id, game_type, user_id, username, role)
+                SELECT game_id, game_type, user_id, username, role FROM game_signups
+                WHERE game_type = ? AND game_id IN ({placeholders})
+            ''', (game_type,) + ids)
+            cursor.executemany('''
+                INSERT INTO map_stats (guild_id, game_type, map_name, games, slots, filled)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (guild_id, game_type, map_name) DO UPDATE SET
+                games = games + 1, slots = slots + excluded.slots, filled = filled + excluded.filled
+            ''', [self._map_totals(game_type, game) for game in games])
+            for child in self.GAME_CHILDREN:
+                cursor.execute(f'''
+                    DELETE FROM {child} WHERE game_type = ? AND game_id IN ({placeholders})
+                ''', (game_type,) + ids)
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+            
+        for game_id in ids:
+            self.cache.discard(game_type, game_id)
+        return len(ids)
+    
+    @offloaded
+    def incremental_vacuum(self, pages: int = 0) -> int:
+        """Release up to ``pages`` free pages (all of them when 0) and return how many were freed."""
+        before = self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # executescript steps the pragma to completion; execute() frees a single page
+        self.conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+        return before - self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+    
+    @offloaded_read
+    def table_stats(self) -> Dict[str, Any]:
+        """Row counts and, where SQLite has dbstat, on-disk bytes per table and its indexes."""
+        conn = self._reader()
+        tables = {table: {'rows': conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]}
+                  for table in self.STATS_TABLES}
+        try:
+            sizes = conn.execute('''
+                SELECT COALESCE(m.tbl_name, s.name), SUM(s.pgsize)
+                FROM dbstat s LEFT JOIN sqlite_master m ON m.name = s.name
+                GROUP BY 1
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            sizes = []
+        for table, size in sizes:
+            if table in tables:
+                tables[table]['bytes'] = size
+                
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return {
+            'tables': tables,
+            'file_bytes': conn.execute('PRAGMA page_count').fetchone()[0] * page_size,
+            'free_bytes': conn.execute('PRAGMA freelist_count').fetchone()[0] * page_size,
+        }
+    
+    @offloaded
+    def check_consistency(
+        self, repair: bool = False
+    ) -> Tuple[Dict[str, int], List[Tuple[str, GameRow, List[Tuple[str, str]]]]]:
+        cursor = self.conn.cursor()
+        # Damaged pages can't be repaired in place; restore_database() swaps in a backup
+        problems = {'integrity': sum(row[0] != 'ok' for row in cursor.execute('PRAGMA quick_check'))}
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            touched = dict.fromkeys(cursor.execute(self.DOUBLE_LISTED_GAMES).fetchall() if repair else (), ())
+            checks = list(self._consistency_checks("json_extract(a.data, '$.guild_id')").items())
+            # Promotions change the signup counts player_stats is checked against
+            for name, (count, fixes) in checks[:-1]:
+                problems[name] = cursor.execute(count).fetchone()[0]
+                if repair and problems[name]:
+                    for fix in fixes:
+                        cursor.execute(fix)
+                        
+            stranded = cursor.execute(self.STRANDED_QUERY).fetchall()
+            problems['stranded_waiters'] = len(stranded)
+            if repair:
+                for game_id, game_type in stranded:
+                    touched[game_id, game_type] = self._promote_waiters(cursor, game_id, game_type)
+                    
+            name, (count, fixes) = checks[-1]
+            problems[name] = cursor.execute(count).fetchone()[0]
+            if repair and problems[name]:
+                for fix in fixes:
+                    cursor.execute(fix)
+                    
+            repaired = []
+            for (game_id, game_type), promoted in touched.items():
+                cursor.execute(
+                    f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = ? RETURNING *',
+                    (game_id,)
+                )
+                game = self._make_row(cursor, cursor.fetchone(), game_type)
+                if game:
+                    repaired.append((game_type, game, list(promoted)))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+            
+        for game_id, game_type in touched:
+            self.cache.discard(game_type, game_id)
+        return problems, repaired
+    
+    @offloaded_read
+    def backup(self, path: str) -> int:
+        """Copy the database to ``path`` from a reader snapshot; returns the pages copied."""
+        conn = self._reader()
+        partial = path + '.partial'
+        target = sqlite3.connect(partial)
+        copied = 0
+        
+        def progress(status: int, remaining: int, total: int):
+            nonlocal copied
+            copied = total - remaining
+            
+        try:
+            conn.execute('BEGIN')
+            conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+            conn.backup(target, pages=self.config.backup_pages, progress=progress)
+        except BaseException:
+            target.close()
+            os.remove(partial)
+            raise
+        finally:
+            conn.rollback()
+        # A rollback-journal copy opens read-only without -wal and -shm files
+        target.execute('PRAGMA journal_mode=DELETE')
+        target.close()
+        os.replace(partial, path)
+        return copied
+    
+    async def snapshot(self) -> Optional[str]:
+        if not self.config.backup_dir:
+            return None
+        os.makedirs(self.config.backup_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(self.config.path))[0]
+        path = os.path.join(self.config.backup_dir, f"{stem}.{time.strftime('%Y%m%d%H%M%S', time.gmtime())}.db")
+        pages = await self.backup(path)
+        if self.metrics:
+            self.metrics.increment("db_backup_pages", stem, pages)
+        for stale in backup_files(self.config.backup_dir, self.config.path)[self.config.backup_keep:]:
+            os.remove(stale)
+        return path
+    
+def backup_files(backup_dir: str, path: str) -> List[str]:
+    """Snapshots of the database at ``path`` in ``backup_dir``, newest first."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pattern = re.compile(re.escape(stem) + r'\.[0-9]{14}\.db')
+    names = sorted((name for name in os.listdir(backup_dir) if pattern.fullmatch(name)), reverse=True)
+    return [os.path.join(backup_dir, name) for name in names]
+
+def check_integrity(path: str) -> List[str]:
+    """Run SQLite's integrity check on a file without opening it as a GameDatabase; empty means healthy."""
+    try:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as error:
+        return [str(error)]
+    return [] if problems == ['ok'] else problems
+
+def restore_database(path: str, backup_dir: str, source: Optional[str] = None) -> str:
+    """Replace a damaged database with the newest healthy backup, or ``source``; the bot must be stopped."""
+    candidates = [source] if source else backup_files(backup_dir, path)
+    for candidate in candidates:
+        if not check_integrity(candidate):
+            break
+    else:
+        raise RuntimeError(f"No healthy backup of {path} to restore")
+        
+    restored = path + '.restoring'
+    with contextlib.closing(sqlite3.connect(f'file:{candidate}?mode=ro', uri=True)) as backup, \
+            contextlib.closing(sqlite3.connect(restored)) as target:
+        backup.backup(target)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.replace(path + suffix, path + suffix + '.damaged')
+    os.replace(restored, path)
+    return candidate
+
+class PostgresGameDatabase(StorageBackend):
+    """StorageBackend on a PostgreSQL server shared by every shard process."""
+    CHANNEL = 'samebot_games'
+    # Advisory lock key that serializes migrations between processes
+    MIGRATION_LOCK = 0x73616d65
+    
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS ava_games (
+            id BIGSERIAL PRIMARY KEY,
+            guild_id TEXT,
+            creator_id TEXT NOT NULL,
+            game_type TEXT NOT NULL,
+            map_name TEXT NOT NULL,
+            game_speed TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            war_time TEXT NOT NULL,
+            start_ts BIGINT,
+            war_ts BIGINT,
+            start_reminded_ts BIGINT,
+            war_reminded_ts BIGINT,
+            notes TEXT,
+            channel_id TEXT,
+            message_id TEXT,
+            image_url TEXT,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS pub_games (
+            id BIGSERIAL PRIMARY KEY,
+            guild_id TEXT,
+            creator_id TEXT NOT NULL,
+            description TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            start_ts BIGINT,
+            start_reminded_ts BIGINT,
+            map_name TEXT,
+            notes TEXT,
+            channel_id TEXT,
+            message_id TEXT,
+            image_url TEXT,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS game_signups (
+            game_id BIGINT NOT NULL,
+            game_type TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            PRIMARY KEY (game_id, game_type, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS game_waitlist (
+            seq BIGSERIAL PRIMARY KEY,
+            game_id BIGINT NOT NULL,
+            game_type TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            UNIQUE (game_id, game_type, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS game_roles (
+            game_id BIGINT NOT NULL,
+            game_type TEXT NOT NULL,
+            role TEXT NOT NULL,
+            max_slots INTEGER NOT NULL DEFAULT 0,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (game_id, game_type, role)
+        );
+        CREATE TABLE IF NOT EXISTS archived_games (
+            game_id BIGINT NOT NULL,
+            game_type TEXT NOT NULL,
+            ended_ts BIGINT,
+            archived_ts BIGINT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (game_type, game_id)
+        );
+        CREATE TABLE IF NOT EXISTS archived_signups (
+            game_id BIGINT NOT NULL,
+            game_type TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            PRIMARY KEY (game_type, game_id, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_game_signups_role ON game_signups (game_id, game_type, role);
+        CREATE INDEX IF NOT EXISTS idx_game_waitlist_role ON game_waitlist (game_id, game_type, role, seq);
+        CREATE INDEX IF NOT EXISTS idx_ava_games_start_ts ON ava_games (start_ts);
+        CREATE INDEX IF NOT EXISTS idx_ava_games_war_ts ON ava_games (war_ts);
+        CREATE INDEX IF NOT EXISTS idx_pub_games_start_ts ON pub_games (start_ts);
+        CREATE INDEX IF NOT EXISTS idx_ava_games_guild_start ON ava_games (guild_id, start_ts);
+        CREATE INDEX IF NOT EXISTS idx_pub_games_guild_start ON pub_games (guild_id, start_ts);
+    '''
+    
+    # Summary tables for player and map reports, as in GameDatabase._migrate_v2
+    STATS_SCHEMA = '''
+        CREATE INDEX IF NOT EXISTS idx_game_signups_user ON game_signups (user_id, game_type, role, game_id);
+        CREATE INDEX IF NOT EXISTS idx_archived_signups_user ON archived_signups (user_id, game_type, role, game_id);
+        CREATE TABLE IF NOT EXISTS player_stats (
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            game_type TEXT NOT NULL,
+            role TEXT NOT NULL,
+            joined INTEGER NOT NULL DEFAULT 0,
+            leaves INTEGER NOT NULL DEFAULT 0,
+            no_shows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id, game_type, role)
+        );
+        CREATE TABLE IF NOT EXISTS map_stats (
+            guild_id TEXT NOT NULL,
+            game_type TEXT NOT NULL,
+            map_name TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            slots INTEGER NOT NULL DEFAULT 0,
+            filled INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, game_type, map_name)
+        );
+        CREATE TABLE IF NOT EXISTS game_no_shows (
+            game_type TEXT NOT NULL,
+            game_id BIGINT NOT NULL,
+            user_id TEXT NOT NULL,
+            PRIMARY KEY (game_type, game_id, user_id)
+        );
+        INSERT INTO player_stats (guild_id, user_id, game_type, role, joined)
+        SELECT guild_id, user_id, game_type, role, COUNT(*) FROM (
+            SELECT COALESCE(g.guild_id, '') AS guild_id, s.user_id, s.game_type, s.role
+            FROM game_signups s JOIN ava_games g ON g.id = s.game_id
+            WHERE s.game_type = 'ava'
+            UNION ALL
+            SELECT COALESCE(g.guild_id, ''), s.user_id, s.game_type, s.role
+            FROM game_signups s JOIN pub_games g ON g.id = s.game_id
+            WHERE s.game_type = 'pub'
+            UNION ALL
+            SELECT COALESCE(a.data::jsonb ->> 'guild_id', ''), s.user_id, s.game_type, s.role
+            FROM archived_signups s JOIN archived_games a
+            ON a.game_type = s.game_type AND a.game_id = s.game_id
+        ) signups
+        GROUP BY guild_id, user_id, game_type, role
+        ON CONFLICT DO NOTHING;
+        INSERT INTO map_stats (guild_id, game_type, map_name, games, slots, filled)
+        SELECT COALESCE(a.data::jsonb ->> 'guild_id', ''), a.game_type,
+               COALESCE(a.data::jsonb ->> 'map_name', ''), COUNT(*),
+               SUM((SELECT COALESCE(SUM((r ->> 1)::int), 0) FROM jsonb_array_elements(a.data::jsonb -> 'roles') r)),
+               SUM((SELECT COALESCE(SUM((r ->> 2)::int), 0) FROM jsonb_array_elements(a.data::jsonb -> 'roles') r))
+        FROM archived_games a
+        GROUP BY 1, 2, 3
+        ON CONFLICT DO NOTHING;
+    '''
+    
+    # Time zones for games and users, as in GameDatabase._migrate_v3
+    TIMEZONE_SCHEMA = '''
+        ALTER TABLE ava_games ADD COLUMN IF NOT EXISTS timezone TEXT;
+        ALTER TABLE pub_games ADD COLUMN IF NOT EXISTS timezone TEXT;
+        CREATE TABLE IF NOT EXISTS user_timezones (
+            user_id TEXT PRIMARY KEY,
+            timezone TEXT NOT NULL
+        );
+    '''
+    
+    # One script per schema version, as in GameDatabase.MIGRATIONS
+    MIGRATIONS = (SCHEMA, STATS_SCHEMA, TIMEZONE_SCHEMA)
+    
+    def __init__(self, config: DatabaseConfig, metrics: Optional[Metrics] = None):
+        # Imported here so SQLite deployments never load the driver
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("GAMES_DB_URL is set but the asyncpg package is not installed") from None
+        self.driver = asyncpg
+        self.config = config
+        self.metrics = metrics
+        self.cache = GameCache(config.game_cache_size)
+        # Tags our own notifications so they don't evict rows we just cached
+        self.instance = f"{os.getpid()}.{id(self):x}"
+        self.pool: Optional["asyncpg.Pool"] = None
+        self._listener: Optional["asyncpg.Connection"] = None
+    
+    async def connect(self):
+        self.pool = await self.driver.create_pool(self.config.url, min_size=1, max_size=self.config.pool_size)
+        async with self.pool.acquire() as conn:
+            await self._migrate(conn)
+        await self._listen()
+    
+    async def _migrate(self, conn: "asyncpg.Connection"):
+        """Apply the steps in MIGRATIONS that this server hasn't seen yet."""
+        async with conn.transaction():
+            await conn.execute('SELECT pg_advisory_xact_lock($1)', self.MIGRATION_LOCK)
+            await conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+            version = await conn.fetchval('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+            if version >= len(self.MIGRATIONS):
+                return
+            for migration in self.MIGRATIONS[version:]:
+                await conn.execute(migration)
+            await conn.execute('DELETE FROM schema_version')
+            await conn.execute('INSERT INTO schema_version (version) VALUES ($1)', len(self.MIGRATIONS))
+    
+    async def _listen(self):
+        self._listener = await self.driver.connect(self.config.url)
+        await self._listener.add_listener(self.CHANNEL, self._on_notify)
+    
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        instance, game_type, game_id = payload.split(':')
+        if instance == self.instance:
+            return
+        if game_type == '*':
+            self.cache.clear()
+        else:
+            self.cache.discard(game_type, int(game_id))
+    
+    async def check_external_writes(self) -> bool:
+        if self._listener is None or not self._listener.is_closed():
+            return False
+        # Notifications were missed while the listener was down
+        self.cache.clear()
+        await self._listen()
+        return True
+    
+    async def close(self):
+        if self._listener is not None:
+            await self._listener.close()
+        if self.pool is not None:
+            await self.pool.close()
+    
+    async def _notify(self, conn: "asyncpg.Connection", game_type: str, game_id: Optional[int]):
+        # Delivered on commit, so other processes never evict too early
+        await conn.execute(
+            'SELECT pg_notify($1, $2)', self.CHANNEL, f"{self.instance}:{game_type}:{game_id or 0}"
+        )
+    
+    async def _make_row(self, conn: "asyncpg.Connection", record, game_type: str) -> Optional[GameRow]:
+        if record is None:
+            return None
+        role_type = "ava" if game_type == "ava" else "pub"
+        roles = await conn.fetch(self.ROLE_QUERY + '''
+            WHERE r.game_id = $1 AND r.game_type = $2
+            ORDER BY r.position
+        ''', record['id'], role_type)
+        roster = await conn.fetch(self.ROSTER_QUERY + '''
+            WHERE s.game_id = $1 AND s.game_type = $2
+            ORDER BY lower(s.username)
+        ''', record['id'], role_type)
+        slots = build_role_slots(roles, roster).get(record['id'], ())
+        return GameRow(tuple(record.keys()) + ('roles',), tuple(record.values()) + (slots,))
+    
+    async def _fetch_game(self, conn: "asyncpg.Connection", game_id: int, game_type: str) -> Optional[GameRow]:
+        record = await conn.fetchrow(f'SELECT * FROM {game_table(game_type)} WHERE id = $1', game_id)
+        return await self._make_row(conn, record, game_type)
+    
+    async def _fetch_games(self, conn: "asyncpg.Connection", game_type: str, where: str,
+                           params: tuple) -> List[GameRow]:
+        """Load every game matching ``where`` (on alias ``g``) with its roles and rosters in three queries."""
+        table = game_table(game_type)
+        records = await conn.fetch(f'SELECT * FROM {table} g WHERE {where} ORDER BY g.start_ts ASC', *params)
+        
+        role_type = "ava" if game_type == "ava" else "pub"
+        role_rows = await conn.fetch(self.ROLE_QUERY + f'''
+            JOIN {table} g ON g.id = r.game_id
+            WHERE r.game_type = '{role_type}' AND {where}
+            ORDER BY r.game_id, r.position
+        ''', *params)
+        roster_rows = await conn.fetch(self.ROSTER_QUERY + f'''
+            JOIN {table} g ON g.id = s.game_id
+            WHERE s.game_type = '{role_type}' AND {where}
+            ORDER BY s.game_id, lower(s.username)
+        ''', *params)
+        roles = build_role_slots(role_rows, roster_rows)
+        
+        return [
+            GameRow(tuple(record.keys()) + ('roles',), tuple(record.values()) + (roles.get(record['id'], ()),))
+            for record in records
+        ]
+    
+    @timed_query
+    async def _load_game(self, game_id: int, game_type: str) -> Optional[GameRow]:
+        seq = self.cache.write_seq
+        async with self.pool.acquire() as conn:
+            game = await self._fetch_game(conn, game_id, game_type)
+        self.cache.fill(game_type, game, seq)
+        return game
+    
+    @timed_query
+    async def get_upcoming_games(self, game_type: str = "ava", guild_id: Optional[str] = None) -> List[GameRow]:
+        seq = self.cache.write_seq
+        async with self.pool.acquire() as conn:
+            games = await self._fetch_games(
+                conn, game_type, 'g.guild_id IS NOT DISTINCT FROM $1 AND g.start_ts > $2',
+                (guild_id, int(time.time()))
+            )
+        for game in games:
+            self.cache.fill(game_type, game, seq)
+        return games
+    
+    @timed_query
+    async def preload_upcoming(self) -> int:
+        loaded = 0
+        limit = self.cache.maxsize // len(self.END_COLUMNS)
+        async with self.pool.acquire() as conn:
+            for game_type in self.END_COLUMNS:
+                seq = self.cache.write_seq
+                games = await self._fetch_games(conn, game_type, f'''g.id IN (
+                    SELECT id FROM {game_table(game_type)} WHERE start_ts > $1 ORDER BY start_ts LIMIT $2
+                )''', (int(time.time()), limit))
+                for game in games:
+                    self.cache.fill(game_type, game, seq)
+                loaded += len(games)
+        return loaded
+    
+    @timed_query
+    async def add_ava_game(self, creator_id: str, map_name: str, game_speed: str, start_time: str,
+                           war_time: str, notes: str, image_url: str = ANTARCTICA,
+                           guild_id: Optional[str] = None, timezone: Optional[str] = None) -> int:
+        async with self.pool.acquire() as conn, conn.transaction():
+            record = await conn.fetchrow('''
+                INSERT INTO ava_games (
+                    guild_id, creator_id, game_type, map_name, game_speed,
+                    start_time, war_time, start_ts, war_ts, timezone, notes, image_url
+                ) VALUES ($1, $2, 'ava', $3, $4, $5, $6, $7, $8, $9, $10, $11)
+                RETURNING *
+            ''', guild_id, creator_id, map_name, game_speed, start_time, war_time,
+                to_epoch(start_time, timezone), to_epoch(war_time, timezone), timezone, notes, image_url)
+            game = await self._make_row(conn, record, "ava")
+        self.cache.put("ava", game)
+        return game['id']
+    
+    @timed_query
+    async def add_pub_game(self, creator_id: str, description: str, start_time: str, map_name: str = "",
+                           notes: str = "", image_url: str = CON, guild_id: Optional[str] = None,
+                           timezone: Optional[str] = None) -> int:
+        async with self.pool.acquire() as conn, conn.transaction():
+            record = await conn.fetchrow('''
+                INSERT INTO pub_games (
+                    guild_id, creator_id, description, start_time, start_ts, timezone, map_name, notes, image_url
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                RETURNING *
+            ''', guild_id, creator_id, description, start_time, to_epoch(start_time, timezone), timezone,
+                map_name, notes, image_url)
+            game = await self._make_row(conn, record, "pub")
+        self.cache.put("pub", game)
+        return game['id']
+    
+    @timed_query
+    async def add_ava_games_bulk(self, creator_id: str, games: List[Dict[str, Any]],
+                                 guild_id: Optional[str] = None, timezone: Optional[str] = None) -> List[GameRow]:
+        if not games:
+            return []
+        
+        async with self.pool.acquire() as conn, conn.transaction():
+            ids = [record[0] for record in await conn.fetch(
+                "SELECT nextval(pg_get_serial_sequence('ava_games', 'id')) FROM generate_series(1, $1)", len(games)
+            )]
+            await conn.executemany('''
+                INSERT INTO ava_games (
+                    id, guild_id, creator_id, game_type, map_name, game_speed,
+                    start_time, war_time, start_ts, war_ts, timezone, notes, image_url
+                ) VALUES ($1, $2, $3, 'ava', $4, $5, $6, $7, $8, $9, $10, $11, $12)
+            ''', [
+                (game_id, guild_id, creator_id, game['map_name'], game['game_speed'],
+                 game['start_time'], game['war_time'], to_epoch(game['start_time'], timezone),
+                 to_epoch(game['war_time'], timezone), timezone, game['notes'], game['image_url'])
+                for game_id, game in zip(ids, games)
+            ])
+            await conn.executemany('''
+                INSERT INTO game_roles (game_id, game_type, role, max_slots, position)
+                VALUES ($1, 'ava', $2, $3, $4)
+            ''', [
+                (game_id, role, max_slots, position)
+                for game_id, game in zip(ids, games)
+                for position, (role, max_slots) in enumerate(game['roles'])
+            ])
+            rows = await self._fetch_games(conn, "ava", 'g.id = ANY($1::bigint[])', (ids,))
+        
+        for game in rows:
+            self.cache.put("ava", game)
+        return rows
+    
+    @timed_query
+    async def set_game_messages(self, game_type: str, messages: List[Tuple[int, str, str]]) -> int:
+        ids = [game_id for game_id, _, _ in messages]
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.executemany(f'''
+                UPDATE {game_table(game_type)}
+                SET channel_id = $1, message_id = $2, version = version + 1
+                WHERE id = $3
+            ''', [(channel_id, message_id, game_id) for game_id, channel_id, message_id in messages])
+            games = await self._fetch_games(conn, game_type, 'g.id = ANY($1::bigint[])', (ids,))
+            for game in games:
+                await self._notify(conn, game_type, game['id'])
+        
+        for game in games:
+            self.cache.put(game_type, game)
+        return len(games)
+    
+    @timed_query
+    async def signup_user(self, game_id: int, game_type: str, user_id: str, username: str,
+                          role: str) -> Tuple[SignupResult, Optional[GameRow]]:
+        async with self.pool.acquire() as conn, conn.transaction():
+            # Concurrent signups for this role queue on the row lock until we commit
+            max_slots = await conn.fetchval('''
+                SELECT max_slots FROM game_roles
+                WHERE game_id = $1 AND game_type = $2 AND role = $3
+                FOR UPDATE
+            ''', game_id, game_type, role)
+            signed_up = await conn.fetchval('''
+                SELECT 1 FROM game_signups WHERE game_id = $1 AND game_type = $2 AND user_id = $3
+            ''', game_id, game_type, user_id)
+            taken = await conn.fetchval('''
+                SELECT COUNT(*) FROM game_signups WHERE game_id = $1 AND game_type = $2 AND role = $3
+            ''', game_id, game_type, role)
+            
+            if signed_up:
+                result = SignupResult.ALREADY_SIGNED_UP
+            elif max_slots is None:
+                result = SignupResult.UNKNOWN_ROLE
+            elif taken >= max_slots:
+                waitlisted = await conn.fetchval('''
+                    INSERT INTO game_waitlist (game_id, game_type, user_id, username, role)
+                    VALUES ($1, $2, $3, $4, $5)
+                    ON CONFLICT DO NOTHING
+                    RETURNING 1
+                ''', game_id, game_type, user_id, username, role)
+                result = SignupResult.WAITLISTED if waitlisted else SignupResult.ALREADY_WAITLISTED
+            # The primary key still catches the same user racing on another role
+            elif await conn.fetchval('''
+                INSERT INTO game_signups (game_id, game_type, user_id, username, role)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            ''', game_id, game_type, user_id, username, role):
+                result = SignupResult.OK
+                await conn.execute('''
+                    DELETE FROM game_waitlist WHERE game_id = $1 AND game_type = $2 AND user_id = $3
+                ''', game_id, game_type, user_id)
+            else:
+                result = SignupResult.ALREADY_SIGNED_UP
+                
+            if result in (SignupResult.OK, SignupResult.WAITLISTED):
+                record = await conn.fetchrow(
+                    f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = $1 RETURNING *', game_id
+                )
+                await self._notify(conn, game_type, game_id)
+                game = await self._make_row(conn, record, game_type)
+                if game and result is SignupResult.OK:
+                    await self._count_players(conn, game['guild_id'], game_type, 'joined', [(user_id, role)])
+            else:
+                game = await self._fetch_game(conn, game_id, game_type)
+        
+        self.cache.put(game_type, game)
+        if game is None:
+            return SignupResult.NOT_FOUND, None
+        return result, game
+    
+    async def _count_players(self, conn: "asyncpg.Connection", guild_id: Optional[str], game_type: str,
+                             column: str, players: List[Tuple[str, str]]):
+        """Add one to a player_stats counter per ``(user_id, role)``, inside the caller's transaction."""
+        if not players:
+            return
+        await conn.executemany(f'''
+            INSERT INTO player_stats (guild_id, user_id, game_type, role, {column})
+            VALUES ($1, $2, $3, $4, 1)
+            ON CONFLICT (guild_id, user_id, game_type, role) DO UPDATE SET {column} = player_stats.{column} + 1
+        ''', [(guild_id or '', user_id, game_type, role) for user_id, role in players])
+    
+    async def _promote_waiters(self, conn: "asyncpg.Connection", game_id: int, game_type: str,
+                               role: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Move the oldest waiters into free slots; the caller holds the role row locks."""
+        where = 'WHERE r.game_id = $1 AND r.game_type = $2'
+        params: tuple = (game_id, game_type)
+        if role is not None:
+            where += ' AND r.role = $3'
+            params += (role,)
+            
+        promoted = []
+        for _, slot_role, max_slots, taken, waiting in await conn.fetch(self.ROLE_QUERY + where, *params):
+            free = min(max_slots - taken, waiting)
+            if free <= 0:
+                continue
+            waiters = await conn.fetch('''
+                DELETE FROM game_waitlist WHERE seq IN (
+                    SELECT seq FROM game_waitlist
+                    WHERE game_id = $1 AND game_type = $2 AND role = $3
+                    ORDER BY seq LIMIT $4
+                )
+                RETURNING user_id, username
+            ''', game_id, game_type, slot_role, free)
+            await conn.executemany('''
+                INSERT INTO game_signups (game_id, game_type, user_id, username, role)
+                VALUES ($1, $2, $3, $4, $5)
+            ''', [(game_id, game_type, user_id, username, slot_role) for user_id, username in waiters])
+            promoted.extend((user_id, slot_role) for user_id, _ in waiters)
+        return promoted
+    
+    @timed_query
+    async def remove_signup(self, game_id: int, game_type: str,
+                            user_id: str) -> Tuple[Optional[GameRow], List[Tuple[str, str]]]:
+        async with self.pool.acquire() as conn, conn.transaction():
+            # Lock the role before the signup, in signup_user's order
+            role = await conn.fetchval('''
+                SELECT role FROM game_signups WHERE game_id = $1 AND game_type = $2 AND user_id = $3
+            ''', game_id, game_type, user_id)
+            promoted = []
+            if role is not None:
+                await conn.execute('''
+                    SELECT 1 FROM game_roles WHERE game_id = $1 AND game_type = $2 AND role = $3 FOR UPDATE
+                ''', game_id, game_type, role)
+            removed = role is not None and await conn.fetchval('''
+                DELETE FROM game_signups
+                WHERE game_id = $1 AND game_type = $2 AND user_id = $3
+                RETURNING 1
+            ''', game_id, game_type, user_id)
+            if removed:
+                promoted = await self._promote_waiters(conn, game_id, game_type, role)
+            elif not await conn.fetchval('''
+                DELETE FROM game_waitlist
+                WHERE game_id = $1 AND game_type = $2 AND user_id = $3
+                RETURNING 1
+            ''', game_id, game_type, user_id):
+                return None, []
+            record = await conn.fetchrow(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = $1 RETURNING *', game_id
+            )
+            await self._notify(conn, game_type, game_id)
+            game = await self._make_row(conn, record, game_type)
+            if game and removed:
+                await self._count_players(conn, game['guild_id'], game_type, 'leaves', [(user_id, role)])
+                await self._count_players(conn, game['guild_id'], game_type, 'joined', promoted)
+            
+        self.cache.put(game_type, game)
+        return game, promoted
+    
+    @timed_query
+    async def promote_waitlist(self, game_id: int,
+                               game_type: str) -> Tuple[Optional[GameRow], List[Tuple[str, str]]]:
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute('''
+                SELECT 1 FROM game_roles WHERE game_id = $1 AND game_type = $2 ORDER BY role FOR UPDATE
+            ''', game_id, game_type)
+            promoted = await self._promote_waiters(conn, game_id, game_type)
+            if not promoted:
+                return None, []
+            record = await conn.fetchrow(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = $1 RETURNING *', game_id
+            )
+            await self._notify(conn, game_type, game_id)
+            game = await self._make_row(conn, record, game_type)
+            if game:
+                await self._count_players(conn, game['guild_id'], game_type, 'joined', promoted)
+            
+        self.cache.put(game_type, game)
+        return game, promoted
+    
+    @timed_query
+    async def set_role_limits(self, game_id: int, game_type: str, **limits) -> bool:
+        if not limits or not all(ROLE_NAME.fullmatch(role) for role in limits):
+            return False
+        
+        async with self.pool.acquire() as conn, conn.transaction():
+            # Roles before the game row, the order signup_user locks in
+            roles = await conn.fetch('''
+                SELECT role FROM game_roles WHERE game_id = $1 AND game_type = $2 ORDER BY role FOR UPDATE
+            ''', game_id, game_type)
+            if len({record[0] for record in roles} | set(limits)) > MAX_ROLES:
+                return False
+            if not await conn.fetchval(
+                f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = $1 RETURNING id', game_id
+            ):
+                return False
+            next_position = await conn.fetchval(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM game_roles WHERE game_id = $1 AND game_type = $2',
+                game_id, game_type
+            )
+            await conn.executemany('''
+                INSERT INTO game_roles (game_id, game_type, role, max_slots, position)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (game_id, game_type, role) DO UPDATE SET max_slots = EXCLUDED.max_slots
+            ''', [
+                (game_id, game_type, role, limit, next_position + offset)
+                for offset, (role, limit) in enumerate(limits.items())
+            ])
+            await self._notify(conn, game_type, game_id)
+            game = await self._fetch_game(conn, game_id, game_type)
+        
+        self.cache.put(game_type, game)
+        return True
+    
+    @timed_query
+    async def update_game(self, game_id: int, game_type: str, **updates) -> bool:
+        fields = [field for field in updates if field in [
+            'map_name', 'game_speed', 'description', 'start_time', 'war_time', 'notes', 'image_url',
+            'channel_id', 'message_id',
+        ]]
+        if not fields:
+            return False
+        
+        async with self.pool.acquire() as conn, conn.transaction():
+            timezone = None
+            if 'start_time' in fields or 'war_time' in fields:
+                timezone = await conn.fetchval(
+                    f'SELECT timezone FROM {game_table(game_type)} WHERE id = $1 FOR UPDATE', game_id
+                )
+            
+            assignments = []
+            params = []
+            for field in fields:
+                params.append(updates[field])
+                assignments.append(f"{field} = ${len(params)}")
+                if field in ['start_time', 'war_time']:
+                    params.append(to_epoch(updates[field], timezone))
+                    assignments.append(f"{field[:-5]}_ts = ${len(params)}")
+            
+            assignments.append("version = version + 1")
+            params.append(game_id)
+            query = f"UPDATE {game_table(game_type)} SET {', '.join(assignments)} WHERE id = ${len(params)} RETURNING *"
+            record = await conn.fetchrow(query, *params)
+            if record is not None:
+                await self._notify(conn, game_type, game_id)
+            game = await self._make_row(conn, record, game_type)
+        
+        self.cache.put(game_type, game)
+        return game is not None
+    
+    @timed_query
+    async def get_user_timezone(self, user_id: str) -> Optional[str]:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval('SELECT timezone FROM user_timezones WHERE user_id = $1', user_id)
+    
+    @timed_query
+    async def set_user_timezone(self, user_id: str, timezone: Optional[str]) -> None:
+        async with self.pool.acquire() as conn:
+            if timezone is None:
+                await conn.execute('DELETE FROM user_timezones WHERE user_id = $1', user_id)
+            else:
+                await conn.execute('''
+                    INSERT INTO user_timezones (user_id, timezone) VALUES ($1, $2)
+                    ON CONFLICT (user_id) DO UPDATE SET timezone = EXCLUDED.timezone
+                ''', user_id, timezone)
+    
+    @timed_query
+    async def get_reminder_events(self, after: int, until: int) -> List[Tuple[Optional[str], str, int, str, int]]:
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch('''
+                SELECT guild_id, 'ava', id, 'start', start_ts FROM ava_games
+                WHERE start_ts > $1 AND start_ts <= $2 AND start_reminded_ts IS DISTINCT FROM start_ts
+                UNION ALL
+                SELECT guild_id, 'ava', id, 'war', war_ts FROM ava_games
+                WHERE war_ts > $1 AND war_ts <= $2 AND war_reminded_ts IS DISTINCT FROM war_ts
+                UNION ALL
+                SELECT guild_id, 'pub', id, 'start', start_ts FROM pub_games
+                WHERE start_ts > $1 AND start_ts <= $2 AND start_reminded_ts IS DISTINCT FROM start_ts
+            ''', after, until)
+        return [tuple(record) for record in records]
+    
+    @timed_query
+    async def mark_reminded(self, game_id: int, game_type: str, kind: str, event_ts: int) -> bool:
+        if kind not in ('start', 'war'):
+            raise ValueError(f"Unknown reminder: {kind}")
+        
+        # Only one process wins this UPDATE, so each reminder goes out once
+        async with self.pool.acquire() as conn, conn.transaction():
+            record = await conn.fetchrow(f'''
+                UPDATE {game_table(game_type)} SET {kind}_reminded_ts = {kind}_ts
+                WHERE id = $1 AND {kind}_ts = $2
+                RETURNING *
+            ''', game_id, event_ts)
+            if record is not None:
+                await self._notify(conn, game_type, game_id)
+            game = await self._make_row(conn, record, game_type)
+        
+        self.cache.put(game_type, game)
+        return game is not None
+    
+    @timed_query
+    async def get_signups(self, game_id: int, game_type: str) -> List[Tuple[str, str, str]]:
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch('''
+                SELECT user_id, username, role FROM game_signups
+                WHERE game_id = $1 AND game_type = $2
+            ''', game_id, game_type)
+        return [tuple(record) for record in records]
+    
+    @timed_query
+    async def mark_no_show(self, game_id: int, game_type: str, user_id: str) -> bool:
+        async with self.pool.acquire() as conn, conn.transaction():
+            signup = await conn.fetchrow(f'''
+                SELECT g.guild_id, s.role FROM game_signups s JOIN {game_table(game_type)} g ON g.id = s.game_id
+                WHERE s.game_id = $1 AND s.game_type = $2 AND s.user_id = $3
+            ''', game_id, game_type, user_id)
+            if signup is None or not await conn.fetchval('''
+                INSERT INTO game_no_shows (game_type, game_id, user_id) VALUES ($1, $2, $3)
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            ''', game_type, game_id, user_id):
+                return False
+            await self._count_players(conn, signup['guild_id'], game_type, 'no_shows', [(user_id, signup['role'])])
+        return True
+    
+    @timed_query
+    async def get_player_stats(self, guild_id: Optional[str], user_id: str) -> Dict[str, Any]:
+        async with self.pool.acquire() as conn:
+            roles = await conn.fetch('''
+                SELECT game_type, role, joined, leaves, no_shows FROM player_stats
+                WHERE guild_id = $1 AND user_id = $2
+            ''', guild_id or '', user_id)
+            signups = await conn.fetch('''
+                SELECT 'ava', s.game_id, s.role, g.start_ts
+                FROM game_signups s JOIN ava_games g ON g.id = s.game_id
+                WHERE s.user_id = $1 AND s.game_type = 'ava' AND g.guild_id IS NOT DISTINCT FROM $2 AND g.start_ts > $3
+                UNION ALL
+                SELECT 'pub', s.game_id, s.role, g.start_ts
+                FROM game_signups s JOIN pub_games g ON g.id = s.game_id
+                WHERE s.user_id = $1 AND s.game_type = 'pub' AND g.guild_id IS NOT DISTINCT FROM $2 AND g.start_ts > $3
+                ORDER BY 4
+            ''', user_id, guild_id, int(time.time()))
+        return {'roles': [tuple(record) for record in roles], 'signups': [tuple(record) for record in signups]}
+    
+    @timed_query
+    async def get_map_stats(self, guild_id: Optional[str]) -> List[Tuple[str, str, int, int, int]]:
+        now = int(time.time())
+        async with self.pool.acquire() as conn:
+            rows = [tuple(record) for record in await conn.fetch('''
+                SELECT game_type, map_name, games, slots, filled FROM map_stats WHERE guild_id = $1
+            ''', guild_id or '')]
+            for game_type, end_column in self.END_COLUMNS.items():
+                rows.extend(tuple(record) for record in await conn.fetch(f'''
+                    SELECT $1::text, COALESCE(g.map_name, ''), COUNT(*),
+                           SUM((SELECT COALESCE(SUM(r.max_slots), 0) FROM game_roles r
+                                WHERE r.game_id = g.id AND r.game_type = $1))::bigint,
+                           SUM((SELECT COUNT(*) FROM game_signups s
+                                WHERE s.game_id = g.id AND s.game_type = $1))::bigint
+                    FROM {game_table(game_type)} g
+                    WHERE g.guild_id IS NOT DISTINCT FROM $2 AND g.start_ts <= $3 AND g.{end_column} <= $3
+                    GROUP BY 2
+                ''', game_type, guild_id, now))
+        return self._merge_map_stats(rows)
+    
+    @timed_query
+    async def get_unassigned_channels(self) -> List[str]:
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch('''
+                SELECT channel_id FROM ava_games WHERE guild_id IS NULL AND channel_id IS NOT NULL
+                UNION
+                SELECT channel_id FROM pub_games WHERE guild_id IS NULL AND channel_id IS NOT NULL
+            ''')
+        return [record[0] for record in records]
+    
+    @timed_query
+    async def assign_guilds(self, channel_guilds: List[Tuple[str, str]]) -> int:
+        updated = 0
+        async with self.pool.acquire() as conn, conn.transaction():
+            for table in ('ava_games', 'pub_games'):
+                for channel_id, guild_id in channel_guilds:
+                    status = await conn.execute(f'''
+                        UPDATE {table} SET guild_id = $1, version = version + 1
+                        WHERE channel_id = $2 AND guild_id IS NULL
+                    ''', guild_id, channel_id)
+                    updated += int(status.split()[-1])
+            await self._notify(conn, '*', None)
+        
+        self.cache.clear()
+        return updated
+    
+    @timed_query
+    async def archive_finished_games(self, game_type: str, ended_before: int) -> int:
+        table = game_table(game_type)
+        end_column = self.END_COLUMNS[game_type]
+        async with self.pool.acquire() as conn, conn.transaction():
+            candidates = [record[0] for record in await conn.fetch(f'''
+                SELECT id FROM {table} WHERE {end_column} < $1 ORDER BY {end_column} LIMIT $2
+            ''', ended_before, self.config.archive_batch)]
+            if not candidates:
+                return 0
+            # Roles before the game rows, as signup_user locks; SKIP LOCKED lets processes share retention
+            await conn.execute('''
+                SELECT 1 FROM game_roles WHERE game_type = $1 AND game_id = ANY($2::bigint[])
+                ORDER BY game_id, role FOR UPDATE
+            ''', game_type, candidates)
+            ids = [record[0] for record in await conn.fetch(f'''
+                SELECT id FROM {table}
+                WHERE id = ANY($1::bigint[]) AND {end_column} < $2
+                FOR UPDATE SKIP LOCKED
+            ''', candidates, ended_before)]
+            if not ids:
+                return 0
+            
+            games = await self._fetch_games(conn, game_type, 'g.id = ANY($1::bigint[])', (ids,))
+            archived_ts = int(time.time())
+            await conn.executemany('''
+                INSERT INTO archived_games (game_id, game_type, ended_ts, archived_ts, data)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (game_type, game_id) DO UPDATE
+                SET ended_ts = EXCLUDED.ended_ts, archived_ts = EXCLUDED.archived_ts, data = EXCLUDED.data
+            ''', [
+                (game['id'], game_type, game[end_column], archived_ts, self._archive_data(game))
+                for game in games
+            ])
+            await conn.execute('''
+                INSERT INTO archived_signups (game_id, game_type, user_id, username, role)
+                SELECT game_id, game_type, user_id, username, role FROM game_signups
+                WHERE game_type = $1 AND game_id = ANY($2::bigint[])
+                ON CONFLICT DO NOTHING
+            ''', game_type, ids)
+            await conn.executemany('''
+                INSERT INTO map_stats (guild_id, game_type, map_name, games, slots, filled)
+                VALUES ($1, $2, $3, 1, $4, $5)
+                ON CONFLICT (guild_id, game_type, map_name) DO UPDATE SET
+                games = map_stats.games + 1, slots = map_stats.slots + EXCLUDED.slots,
+                filled = map_stats.filled + EXCLUDED.filled
+            ''', [self._map_totals(game_type, game) for game in games])
+            for child in self.GAME_CHILDREN:
+                await conn.execute(
+                    f'DELETE FROM {child} WHERE game_type = $1 AND game_id = ANY($2::bigint[])', game_type, ids
+                )
+            await conn.execute(f'DELETE FROM {table} WHERE id = ANY($1::bigint[])', ids)
+            for game_id in ids:
+                await self._notify(conn, game_type, game_id)
+        
+        for game_id in ids:
+            self.cache.discard(game_type, game_id)
+        return len(ids)
+    
+    async def incremental_vacuum(self, pages: int = 0) -> int:
+        # Autovacuum reclaims dead rows on PostgreSQL
+        return 0
+    
+    @timed_query
+    async def check_consistency(
+        self, repair: bool = False
+    ) -> Tuple[Dict[str, int], List[Tuple[str, GameRow, List[Tuple[str, str]]]]]:
+        problems = {}
+        async with self.pool.acquire() as conn, conn.transaction():
+            # Signups take their role lock first too, so none can land mid-check
+            await conn.execute('LOCK TABLE game_roles, game_signups, game_waitlist, player_stats IN EXCLUSIVE MODE')
+            touched = dict.fromkeys(
+                [tuple(record) for record in await conn.fetch(self.DOUBLE_LISTED_GAMES)] if repair else (), ()
+            )
+            checks = list(self._consistency_checks("a.data::jsonb ->> 'guild_id'").items())
+            # Promotions change the signup counts player_stats is checked against
+            for name, (count, fixes) in checks[:-1]:
+                problems[name] = await conn.fetchval(count)
+                if repair and problems[name]:
+                    for fix in fixes:
+                        await conn.execute(fix)
+                        
+            stranded = await conn.fetch(self.STRANDED_QUERY)
+            problems['stranded_waiters'] = len(stranded)
+            if repair:
+                for game_id, game_type in stranded:
+                    touched[game_id, game_type] = await self._promote_waiters(conn, game_id, game_type)
+                    
+            name, (count, fixes) = checks[-1]
+            problems[name] = await conn.fetchval(count)
+            if repair and problems[name]:
+                for fix in fixes:
+                    await conn.execute(fix)
+                    
+            repaired = []
+            for (game_id, game_type), promoted in touched.items():
+                record = await conn.fetchrow(
+                    f'UPDATE {game_table(game_type)} SET version = version + 1 WHERE id = $1 RETURNING *', game_id
+                )
+                await self._notify(conn, game_type, game_id)
+                game = await self._make_row(conn, record, game_type)
+                if game:
+                    repaired.append((game_type, game, list(promoted)))
+                    
+        for game_id, game_type in touched:
+            self.cache.discard(game_type, game_id)
+        return problems, repaired
+    
+    @timed_query
+    async def table_stats(self) -> Dict[str, Any]:
+        async with self.pool.acquire() as conn:
+            tables = {}
+            for table in self.STATS_TABLES:
+                tables[table] = {
+                    'rows': await conn.fetchval(f'SELECT COUNT(*) FROM {table}'),
+                    'bytes': await conn.fetchval('SELECT pg_total_relation_size($1::regclass)', table),
+                }
+            return {
+                'tables': tables,
+                'file_bytes': await conn.fetchval('SELECT pg_database_size(current_database())'),
+                'free_bytes': 0,
+            }
+
+class DatabaseRouter:
+    """Hands out a guild's storage backend: one shared file, a file per guild, or PostgreSQL."""
+    FILE_PATTERN = re.compile(r'guild_([0-9]+)\.db')
+    
+    def __init__(self, config: DatabaseConfig, metrics: Optional[Metrics] = None):
+        self.config = config
+        self.metrics = metrics
+        self._guilds: Dict[str, GameDatabase] = {}
+        # Files being opened, so concurrent first clicks share one open
+        self._opening: Dict[str, asyncio.Future] = {}
+        if config.url:
+            self.default: StorageBackend = PostgresGameDatabase(config, metrics)
+            return
+        self.default = GameDatabase(config, metrics)
+        if config.per_guild_dir:
+            os.makedirs(config.per_guild_dir, exist_ok=True)
+            # Open existing files up front so reminders and retention see them
+            for name in sorted(os.listdir(config.per_guild_dir)):
+                match = self.FILE_PATTERN.fullmatch(name)
+                if match:
+                    self._guilds[match.group(1)] = self._open(match.group(1))
+                    
+    async def connect(self):
+        for db in self.all():
+            await db.connect()
+    
+    async def preload(self) -> int:
+        """Warm every database's cache with its upcoming games."""
+        return sum(await asyncio.gather(*(db.preload_upcoming() for db in self.all())))
+    
+    def _open(self, guild_id: str) -> GameDatabase:
+        """Open and migrate a guild's file; blocking, so never called on the event loop once it runs."""
+        config = dataclasses.replace(
+            self.config, path=os.path.join(self.config.per_guild_dir, f'guild_{guild_id}.db')
+        )
+        return GameDatabase(config, self.metrics, (self.default.executor, self.default.read_executor))
+    
+    async def for_guild(self, guild_id: Optional[str]) -> StorageBackend:
+        if guild_id is None or self.config.url or not self.config.per_guild_dir:
+            return self.default
+        db = self._guilds.get(guild_id)
+        if db is not None:
+            return db
+            
+        # Connecting, migrating and maybe a VACUUM happen on the writer thread
+        opening = self._opening.get(guild_id)
+        if opening is None:
+            opening = self._opening[guild_id] = asyncio.get_running_loop().run_in_executor(
+                self.default.executor, self._open, guild_id
+            )
+            opening.add_done_callback(functools.partial(self._opened, guild_id))
+        # A cancelled caller mustn't abandon a file that is half open
+        return await asyncio.shield(opening)
+    
+    def _opened(self, guild_id: str, opening: asyncio.Future):
+        del self._opening[guild_id]
+        if not opening.cancelled() and opening.exception() is None:
+            self._guilds[guild_id] = opening.result()
+    
+    def all(self) -> List[StorageBackend]:
+        return [self.default, *self._guilds.values()]
+    
+    def cache_stats(self) -> Dict[str, int]:
+        totals = {"size": 0, "hits": 0, "misses": 0}
+        for db in self.all():
+            for name, value in db.cache.stats().items():
+                totals[name] += value
+        totals["databases"] = len(self._guilds) + 1
+        return totals
+    
+    async def close(self):
+        # The default database owns the shared threads, so it goes last
+        for db in reversed(self.all()):
+            await db.close()
+
+def custom_id_prefix(game_type: str) -> str:
+    # AvA buttons keep their original unprefixed IDs so older messages still work
+    return "" if game_type == "ava" else "pub_"
+
+def click_key(interaction: discord.Interaction, game_type: str, game_id: int) -> tuple:
+    # Game IDs are only unique per type and database, so the guild is part of the key
+    return (interaction.user.id, interaction.guild_id, game_type, game_id)
+
+class RoleButton(discord.ui.DynamicItem[discord.ui.Button],
+                 template=r'role_(?:(?P<game_type>pub)_)?(?P<game_id>[0-9]+)_(?P<role>[a-z]+)'):
+    def __init__(self, game_id: int, role: str, game_type: str = "ava"):
+        super().__init__(discord.ui.Button(
+            style=discord.ButtonStyle.primary,
+            label=role.capitalize(),
+            custom_id=f"role_{custom_id_prefix(game_type)}{game_id}_{role}"
+        ))
+        self.game_id = game_id
+        self.role = role
+        self.game_type = game_type
+        
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['game_id']), match['role'], match['game_type'] or "ava")
+    
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("AdminCommands")
+        await cog.acknowledge(interaction, "signup", functools.partial(
+            cog.handle_signup, interaction, self.game_id, self.role, self.game_type
+        ), click_key(interaction, self.game_type, self.game_id))
+
+class LeaveButton(discord.ui.DynamicItem[discord.ui.Button],
+                  template=r'leave_(?:(?P<game_type>pub)_)?(?P<game_id>[0-9]+)'):
+    def __init__(self, game_id: int, game_type: str = "ava"):
+        super().__init__(discord.ui.Button(
+            style=discord.ButtonStyle.danger,
+            label="Leave Game",
+            custom_id=f"leave_{custom_id_prefix(game_type)}{game_id}"
+        ))
+        self.game_id = game_id
+        self.game_type = game_type
+        
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['game_id']), match['game_type'] or "ava")
+    
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("AdminCommands")
+        await cog.acknowledge(interaction, "leave", functools.partial(
+            cog.handle_leave, interaction, self.game_id, self.game_type
+        ), click_key(interaction, self.game_type, self.game_id))
+
+class GamePages(discord.ui.View):
+    """Previous/next paging over pre-rendered list_games embeds."""
+    def __init__(self, pages: List[discord.Embed], author_id: int):
+        super().__init__(timeout=180)
+        self.pages = pages
+        self.author_id = author_id
+        self.index = 0
+        self._sync_buttons()
+        
+    def _sync_buttons(self):
+        self.previous.disabled = self.index == 0
+        self.next.disabled = self.index == len(self.pages) - 1
+        
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+    
+    async def _show(self, interaction: discord.Interaction, index: int):
+        self.index = index
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=self.pages[index], view=self)
+        
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.index - 1)
         
-        cursor.execute(query, params)
-        self.conn.commit()
-        return cursor.rowcount > 0
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.index + 1)
 
 class AdminCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = GameDatabase()
+        # Rendered embeds and list pages, reused until the game's row version changes
+        self.render_cache = RenderCache()
+        bot.metrics.register_gauges("render_cache", self.render_cache.stats)
+        # Message re-renders still on their way out; the loop only keeps weak references to tasks
+        self.renders: Set[asyncio.Task] = set()
+        
+    async def cog_before_invoke(self, ctx: commands.Context):
+        ctx.started_at = time.perf_counter()
+        
+    async def cog_after_invoke(self, ctx: commands.Context):
+        self.bot.metrics.observe("command", ctx.command.qualified_name, time.perf_counter() - ctx.started_at)
+        
+    async def cog_command_error(self, ctx: commands.Context, error: commands.CommandError):
+        if ctx.command:
+            self.bot.metrics.increment("command_errors", ctx.command.qualified_name)
+            
+    async def db_for(self, guild_id: Optional[int]) -> StorageBackend:
+        """The database holding this guild's games, shared with the bot for one coherent cache."""
+        return await self.bot.databases.for_guild(guild_key(guild_id))
+    
+    async def get_guild_game(self, guild_id: Optional[int], game_id: int, game_type: str) -> Optional[GameRow]:
+        """Load a game only if it belongs to ``guild_id``, so admins can't touch other guilds' games."""
+        db = await self.db_for(guild_id)
+        game = await db.get_game(game_id, game_type)
+        if game is None or game.get('guild_id') != guild_key(guild_id):
+            return None
+        return game
+    
+    async def respond(self, interaction: discord.Interaction, content: str):
+        """Send an ephemeral reply to a component interaction, as a follow-up once it's been deferred."""
+        # Interaction callbacks bypass bot.http, so they are timed here
+        if interaction.response.is_done():
+            async def followup():
+                with self.bot.metrics.timer("discord_api", "interaction.followup"):
+                    await interaction.followup.send(content, ephemeral=True)
+                    
+            await self.bot.outbound.submit(("interaction", interaction.id), followup, Priority.INTERACTION)
+        else:
+            with self.bot.metrics.timer("discord_api", "interaction.response"):
+                await interaction.response.send_message(content, ephemeral=True)
+                
+    async def send(self, ctx: commands.Context, *args, **kwargs) -> discord.Message:
+        """``ctx.send`` through the outbound queue."""
+        if ctx.interaction is not None:
+            route, priority = ("interaction", ctx.interaction.id), Priority.INTERACTION
+        else:
+            route, priority = ctx.channel.id, Priority.MESSAGE
+        return await self.bot.outbound.submit(route, functools.partial(ctx.send, *args, **kwargs), priority)
+    
+    # Replies to clicks the throttle turns away, by ClickThrottle reason
+    THROTTLE_REPLIES = {
+        ClickThrottle.IN_FLIGHT: "Still working on your last click for this game.",
+        ClickThrottle.THROTTLED: "You're clicking too fast, please wait a moment.",
+    }
+    
+    async def acknowledge(self, interaction: discord.Interaction, name: str, job: Callable[[], Awaitable[None]],
+                          key: Optional[tuple] = None):
+        """Acknowledge a click straight away, then hand the real work to the interaction queue."""
+        job = functools.partial(self.run_reported, interaction, job)
+        if key is not None:
+            refusal = self.bot.throttle.admit(key)
+            if refusal:
+                await self.respond(interaction, self.THROTTLE_REPLIES[refusal])
+                return
+            job = functools.partial(self.run_throttled, key, job)
+            
+        queued = False
+        try:
+            if not self.bot.interactions.admit():
+                await self.respond(interaction, "The bot is busy right now, please try again in a moment.")
+                return
+                
+            with self.bot.metrics.timer("interaction_ack", name):
+                await interaction.response.defer(ephemeral=True, thinking=True)
+            queued = self.bot.interactions.submit(name, job)
+            if not queued:
+                # Filled up while we were deferring
+                await self.respond(interaction, "The bot is busy right now, please try again in a moment.")
+        finally:
+            # A click that never reached the queue mustn't block the next one
+            if key is not None and not queued:
+                self.bot.throttle.release(key)
+            
+    async def run_reported(self, interaction: discord.Interaction, job: Callable[[], Awaitable[None]]):
+        try:
+            await job()
+        except Exception:
+            # The click was deferred, so without a reply it would spin until it expires
+            with contextlib.suppress(discord.HTTPException):
+                await self.respond(interaction, "Something went wrong, please try again.")
+            raise
+            
+    async def run_throttled(self, key: tuple, job: Callable[[], Awaitable[None]]):
+        try:
+            await job()
+        finally:
+            self.bot.throttle.release(key)
     
     @commands.hybrid_command(name='schedule_ava', description='Schedule a new AvA game (admin only)')
     @app_commands.describe(
@@ -248,7 +3528,8 @@ class AdminCommands(commands.Cog):
         max_ground="Maximum ground players",
         max_air="Maximum air players",
         max_support="Maximum support players",
-        max_navy="Maximum navy players"
+        max_navy="Maximum navy players",
+        timezone="Time zone the times are in, e.g. Europe/Berlin (defaults to your /timezone, then UTC)"
     )
     @commands.has_permissions(administrator=True)
     async def schedule_ava(self, ctx: commands.Context, 
@@ -260,33 +3541,42 @@ class AdminCommands(commands.Cog):
                          max_ground: int = 3,
                          max_air: int = 2,
                          max_support: int = 2,
-                         max_navy: int = 0):
+                         max_navy: int = 0,
+                         timezone: Optional[str] = None):
         """Schedule a new AvA game with all details"""
+        db = await self.db_for(ctx.guild.id)
+        if timezone is not None and not check_timezone(timezone):
+            await self.send(ctx, self.UNKNOWN_TIMEZONE.format(timezone))
+            return
+        timezone = timezone or await db.get_user_timezone(str(ctx.author.id))
+            
         try:
             # Validate times
-            start_dt = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
-            war_dt = datetime.datetime.strptime(war_time, "%Y-%m-%d %H:%M")
+            start_ts = to_epoch(start_time, timezone)
+            war_ts = to_epoch(war_time, timezone)
             
-            if start_dt < datetime.datetime.now():
-                await ctx.send("Start time must be in the future!")
+            if start_ts < time.time():
+                await self.send(ctx, "Start time must be in the future!")
                 return
                 
-            if war_dt < start_dt:
-                await ctx.send("War time must be after start time!")
+            if war_ts < start_ts:
+                await self.send(ctx, "War time must be after start time!")
                 return
                 
             # Create the game
-            game_id = self.db.add_ava_game(
+            game_id = await db.add_ava_game(
+                guild_id=guild_key(ctx.guild.id),
                 creator_id=str(ctx.author.id),
                 map_name=map_name,
                 game_speed=game_speed,
                 start_time=start_time,
                 war_time=war_time,
-                notes=notes
+                notes=notes,
+                timezone=timezone
             )
             
             # Set role limits
-            self.db.set_role_limits(
+            await db.set_role_limits(
                 game_id=game_id,
                 game_type="ava",
                 ground=max_ground,
@@ -296,26 +3586,156 @@ class AdminCommands(commands.Cog):
             )
             
             # Get the full game data
-            game_data = self.db.get_game(game_id, "ava")
+            game_data = await db.get_game(game_id, "ava")
             
             # Create and send the embed
-            embed = self.create_ava_embed(game_data)
-            view = self.create_ava_view(game_id)
+            embed = self.create_embed("ava", game_data)
+            view = self.create_view("ava", game_data)
             
-            message = await ctx.send(embed=embed, view=view)
+            message = await self.send(ctx, embed=embed, view=view)
             
             # Store message info in database
-            self.db.update_game(
+            await db.update_game(
                 game_id=game_id,
                 game_type="ava",
                 channel_id=str(ctx.channel.id),
                 message_id=str(message.id)
             )
+            self.bot.reminders.schedule_game("ava", await db.get_game(game_id, "ava"))
+            
+            await self.send(ctx, f"AvA game #{game_id} scheduled successfully!")
+            
+        except ValueError as e:
+            await self.send(ctx, f"Invalid time format! Use YYYY-MM-DD HH:MM. Error: {e}")
+    
+    @commands.hybrid_command(name='schedule_pub', description='Schedule a new pub game (admin only)')
+    @app_commands.describe(
+        description="What the game is, e.g. 'World War 3, 4x, beginners welcome'",
+        start_time="Start time (YYYY-MM-DD HH:MM)",
+        map_name="The map name for the game",
+        notes="Additional notes about the game",
+        max_players="Maximum players",
+        timezone="Time zone the start time is in, e.g. America/New_York (defaults to your /timezone, then UTC)"
+    )
+    @commands.has_permissions(administrator=True)
+    async def schedule_pub(self, ctx: commands.Context,
+                           description: str,
+                           start_time: str,
+                           map_name: str = "",
+                           notes: str = "",
+                           max_players: int = 10,
+                           timezone: Optional[str] = None):
+        """Schedule a new pub game with a single player roster"""
+        db = await self.db_for(ctx.guild.id)
+        if timezone is not None and not check_timezone(timezone):
+            await self.send(ctx, self.UNKNOWN_TIMEZONE.format(timezone))
+            return
+        timezone = timezone or await db.get_user_timezone(str(ctx.author.id))
+            
+        try:
+            if to_epoch(start_time, timezone) < time.time():
+                await self.send(ctx, "Start time must be in the future!")
+                return
+                
+            game_id = await db.add_pub_game(
+                guild_id=guild_key(ctx.guild.id),
+                creator_id=str(ctx.author.id),
+                description=description,
+                start_time=start_time,
+                map_name=map_name,
+                notes=notes,
+                timezone=timezone
+            )
+            await db.set_role_limits(game_id=game_id, game_type="pub", player=max_players)
+            game_data = await db.get_game(game_id, "pub")
+            
+            embed = self.create_embed("pub", game_data)
+            view = self.create_view("pub", game_data)
+            
+            message = await self.send(ctx, embed=embed, view=view)
+            
+            await db.update_game(
+                game_id=game_id,
+                game_type="pub",
+                channel_id=str(ctx.channel.id),
+                message_id=str(message.id)
+            )
+            self.bot.reminders.schedule_game("pub", await db.get_game(game_id, "pub"))
             
-            await ctx.send(f"AvA game #{game_id} scheduled successfully!")
+            await self.send(ctx, f"Pub game #{game_id} scheduled successfully!")
             
         except ValueError as e:
-            await ctx.send(f"Invalid time format! Use YYYY-MM-DD HH:MM. Error: {e}")
+            await self.send(ctx, f"Invalid time format! Use YYYY-MM-DD HH:MM. Error: {e}")
+    
+    @commands.hybrid_command(name='import_games', description='Schedule many AvA games from a CSV or JSON file (admin only)')
+    @app_commands.describe(
+        schedule="CSV or JSON with map_name, game_speed, start_time, war_time, notes and max_<role> columns",
+        timezone="Time zone the file's times are in (defaults to your /timezone, then UTC)"
+    )
+    @commands.has_permissions(administrator=True)
+    async def import_games(self, ctx: commands.Context, schedule: discord.Attachment,
+                           timezone: Optional[str] = None):
+        """Bulk-schedule a season of AvA games from an attached file"""
+        if schedule.size > IMPORT_MAX_BYTES:
+            await self.send(ctx, "That file is too large to import.")
+            return
+            
+        db = await self.db_for(ctx.guild.id)
+        if timezone is not None and not check_timezone(timezone):
+            await self.send(ctx, self.UNKNOWN_TIMEZONE.format(timezone))
+            return
+        timezone = timezone or await db.get_user_timezone(str(ctx.author.id))
+            
+        try:
+            games, errors = parse_schedule_file(await schedule.read(), schedule.filename, timezone)
+        except (UnicodeDecodeError, ValueError, csv.Error) as e:
+            await self.send(ctx, f"Couldn't read that file: {e}")
+            return
+            
+        created = await db.add_ava_games_bulk(str(ctx.author.id), games, guild_key(ctx.guild.id), timezone)
+        report = f"Imported {len(created)} game(s)"
+        if created:
+            report += f" (#{created[0]['id']}–#{created[-1]['id']}), posting signup messages now"
+        if errors:
+            report += f". {len(errors)} row(s) rejected:\n" + "\n".join(errors)
+        if len(report) > 1900:
+            await self.send(
+                ctx,
+                report.split("\n", 1)[0],
+                file=discord.File(io.BytesIO(report.encode()), filename="import_report.txt")
+            )
+        else:
+            await self.send(ctx, report)
+            
+        if created:
+            await self.post_imported_games(db, ctx.channel, created)
+            await self.send(ctx, f"Posted signup messages for {len(created)} imported game(s).")
+    
+    async def post_imported_games(self, db: StorageBackend, channel: discord.abc.Messageable, games: List[GameRow]):
+        """Send each game's signup message through the paced queue, then store them in one batch."""
+        async def post(game: GameRow):
+            message = await self.bot.outbound.submit(
+                channel.id,
+                functools.partial(channel.send, embed=self.create_embed("ava", game),
+                                  view=self.create_view("ava", game))
+            )
+            return game['id'], str(channel.id), str(message.id)
+        
+        results = await asyncio.gather(*(post(game) for game in games), return_exceptions=True)
+        posted = [result for result in results if not isinstance(result, BaseException)]
+        for result in results:
+            if isinstance(result, BaseException):
+                log.warning("Failed to post an imported game: %s", result)
+        await db.set_game_messages("ava", posted)
+        for game in await asyncio.gather(*(db.get_game(game_id, "ava") for game_id, _, _ in posted)):
+            if game:
+                self.bot.reminders.schedule_game("ava", game)
+    
+    # Fields /edit_game may change, per game type
+    EDITABLE_FIELDS = {
+        'ava': ('map_name', 'game_speed', 'start_time', 'war_time', 'notes'),
+        'pub': ('description', 'start_time', 'map_name', 'notes'),
+    }
     
     @commands.hybrid_command(name='set_roles', description='Set role limits for a game (admin only)')
     @app_commands.describe(
@@ -323,67 +3743,130 @@ class AdminCommands(commands.Cog):
         max_ground="Maximum ground players",
         max_air="Maximum air players",
         max_support="Maximum support players",
-        max_navy="Maximum navy players"
+        max_navy="Maximum navy players",
+        game_type="Type of game (ava or pub)",
+        max_players="Maximum players, for pub games"
     )
     @commands.has_permissions(administrator=True)
     async def set_roles(self, ctx: commands.Context, 
                        game_id: int,
-                       max_ground: int,
-                       max_air: int,
-                       max_support: int,
-                       max_navy: int = 0):
-        """Update role limits for an existing game"""
-        if not self.db.set_role_limits(
+                       max_ground: Optional[int] = None,
+                       max_air: Optional[int] = None,
+                       max_support: Optional[int] = None,
+                       max_navy: Optional[int] = None,
+                       game_type: str = "ava",
+                       max_players: Optional[int] = None):
+        """Update role limits for an existing game; roles left out keep their limits"""
+        if game_type not in self.EDITABLE_FIELDS:
+            await self.send(ctx, "Game type must be ava or pub.")
+            return
+        if game_type == "pub":
+            limits = {'player': max_players}
+        else:
+            limits = {'ground': max_ground, 'air': max_air, 'support': max_support, 'navy': max_navy}
+        limits = {role: limit for role, limit in limits.items() if limit is not None}
+        if not limits:
+            await self.send(ctx, "Give at least one limit to change.")
+            return
+            
+        db = await self.db_for(ctx.guild.id)
+        if not await self.get_guild_game(ctx.guild.id, game_id, game_type) or not await db.set_role_limits(
             game_id=game_id,
-            game_type="ava",
-            ground=max_ground,
-            air=max_air,
-            support=max_support,
-            navy=max_navy
+            game_type=game_type,
+            **limits
         ):
-            await ctx.send("Failed to update role limits. Check the game ID.")
+            await self.send(ctx, "Failed to update role limits. Check the game ID.")
             return
             
+        # Raised limits go to the waitlists first
+        game_data, promoted = await db.promote_waitlist(game_id, game_type)
+        if promoted:
+            await self.notify_promoted(game_data, promoted)
+            
         # Refresh the game message
-        await self.refresh_game_message(game_id, "ava", ctx.channel)
-        await ctx.send(f"Role limits updated for game #{game_id}")
+        await self.refresh_game_message(db, game_id, game_type, ctx.channel)
+        await self.send(ctx, f"Role limits updated for game #{game_id}")
     
     @commands.hybrid_command(name='edit_game', description='Edit a game (admin only)')
     @app_commands.describe(
         game_id="The game ID to edit",
-        field="Field to edit (map_name, game_speed, start_time, war_time, notes)",
-        value="New value for the field"
+        field="Field to edit (AvA: map_name, game_speed, start_time, war_time, notes; "
+              "pub: description, start_time, map_name, notes)",
+        value="New value for the field",
+        game_type="Type of game (ava or pub)"
     )
     @commands.has_permissions(administrator=True)
     async def edit_game(self, ctx: commands.Context, 
                       game_id: int,
                       field: str,
-                      value: str):
+                      value: str,
+                      game_type: str = "ava"):
         """Edit a game's details"""
-        valid_fields = ['map_name', 'game_speed', 'start_time', 'war_time', 'notes']
+        if game_type not in self.EDITABLE_FIELDS:
+            await self.send(ctx, "Game type must be ava or pub.")
+            return
+        valid_fields = self.EDITABLE_FIELDS[game_type]
         if field not in valid_fields:
-            await ctx.send(f"Invalid field! Choose from: {', '.join(valid_fields)}")
+            await self.send(ctx, f"Invalid field! Choose from: {', '.join(valid_fields)}")
+            return
+            
+        db = await self.db_for(ctx.guild.id)
+        game_data = await self.get_guild_game(ctx.guild.id, game_id, game_type)
+        if not game_data:
+            await self.send(ctx, "Failed to update game. Check the game ID.")
             return
             
-        # For time fields, validate the format
+        # Read in the game's zone, then checked as epochs like a new game's
         if field in ['start_time', 'war_time']:
             try:
-                datetime.datetime.strptime(value, "%Y-%m-%d %H:%M")
+                epoch = to_epoch(value, game_data.get('timezone'))
             except ValueError:
-                await ctx.send("Invalid time format! Use YYYY-MM-DD HH:MM")
+                await self.send(ctx, "Invalid time format! Use YYYY-MM-DD HH:MM")
+                return
+            if epoch < time.time():
+                await self.send(ctx, "Time must be in the future!")
+                return
+            start_ts = epoch if field == 'start_time' else game_data['start_ts']
+            war_ts = epoch if field == 'war_time' else game_data.get('war_ts')
+            if war_ts is not None and war_ts < start_ts:
+                await self.send(ctx, "War time must be after start time!")
                 return
                 
-        if not self.db.update_game(
+        if not await db.update_game(
             game_id=game_id,
-            game_type="ava",
+            game_type=game_type,
             **{field: value}
         ):
-            await ctx.send("Failed to update game. Check the game ID.")
+            await self.send(ctx, "Failed to update game. Check the game ID.")
             return
             
         # Refresh the game message
-        await self.refresh_game_message(game_id, "ava", ctx.channel)
-        await ctx.send(f"Game #{game_id} updated successfully!")
+        await self.refresh_game_message(db, game_id, game_type, ctx.channel)
+        if field in ['start_time', 'war_time']:
+            self.bot.reminders.schedule_game(game_type, await db.get_game(game_id, game_type))
+            await self.send(ctx, f"Game #{game_id} updated successfully! "
+                                 f"Times for this game are in {game_data.get('timezone') or 'UTC'}.")
+        else:
+            await self.send(ctx, f"Game #{game_id} updated successfully!")
+    
+    UNKNOWN_TIMEZONE = "Unknown time zone `{}`. Use a name like Europe/Berlin or America/New_York."
+    
+    @commands.hybrid_command(name='timezone', description='Set the time zone your scheduled times are read in')
+    @app_commands.describe(zone="An IANA zone such as Europe/Berlin; 'UTC' to go back to the default")
+    async def set_timezone(self, ctx: commands.Context, zone: Optional[str] = None):
+        """Show or set the zone /schedule_ava, /schedule_pub and /import_games read your times in"""
+        db = await self.db_for(ctx.guild.id if ctx.guild else None)
+        user_id = str(ctx.author.id)
+        if zone is None:
+            current = await db.get_user_timezone(user_id)
+            await self.send(ctx, f"Your times are read as {current or 'UTC'}.")
+            return
+            
+        if not check_timezone(zone):
+            await self.send(ctx, self.UNKNOWN_TIMEZONE.format(zone))
+            return
+        await db.set_user_timezone(user_id, None if zone == 'UTC' else zone)
+        await self.send(ctx, f"Times you schedule are now read as {zone}.")
     
     @commands.hybrid_command(name='list_games', description='List all scheduled games')
     @app_commands.describe(
@@ -391,86 +3874,220 @@ class AdminCommands(commands.Cog):
     )
     async def list_games(self, ctx: commands.Context, game_type: str = "ava"):
         """List all scheduled games of the specified type"""
-        games = self.db.get_upcoming_games(game_type)
+        guild_id = ctx.guild.id if ctx.guild else None
+        db = await self.db_for(guild_id)
+        games = await db.get_upcoming_games(game_type, guild_key(guild_id))
         
         if not games:
-            await ctx.send(f"No upcoming {game_type} games scheduled.")
+            await self.send(ctx, f"No upcoming {game_type} games scheduled.")
             return
             
-        embed = discord.Embed(
-            title=f"Upcoming {game_type.upper()} Games",
-            color=discord.Color.blue()
+        pages = self.render_game_pages(game_type, games)
+        if len(pages) == 1:
+            await self.send(ctx, embed=pages[0])
+        else:
+            await self.send(ctx, embed=pages[0], view=GamePages(pages, ctx.author.id))
+    
+    def render_list_field(self, game_type: str, game: GameRow) -> Tuple[str, str]:
+        key = ("field", game_type, game.get('guild_id'), game['id'])
+        field = self.render_cache.get(key, game['version'])
+        if field is not None:
+            return field
+            
+        slots = " ".join(
+            f"{slot.role[0].upper()}({slot.taken}/{slot.max_slots})"
+            for slot in game['roles'] if slot.max_slots > 0
         )
+        if game_type == "ava":
+            value = (
+                f"**Map:** {game['map_name']}\n"
+                f"**Speed:** {game['game_speed']}\n"
+                f"**Start:** {game_time(game, 'start')}\n"
+                f"**War:** {game_time(game, 'war')}\n"
+                f"**Slots:** {slots}\n"
+                f"**Notes:** {game['notes'] or 'None'}"
+            )
+        else:
+            value = (
+                f"**Description:** {game['description']}\n"
+                f"**Start:** {game_time(game, 'start')}\n"
+                f"**Map:** {game['map_name'] or 'Not specified'}\n"
+                f"**Slots:** {slots or 'None'}\n"
+                f"**Notes:** {game['notes'] or 'None'}"
+            )
+        if len(value) > EMBED_FIELD_MAX_CHARS:
+            value = value[:EMBED_FIELD_MAX_CHARS - 1] + "…"
+            
+        field = (f"Game #{game['id']}", value)
+        self.render_cache.put(key, game['version'], field)
+        return field
+    
+    def render_game_pages(self, game_type: str, games: List[GameRow]) -> List[discord.Embed]:
+        """Split the list into embeds within Discord's limits, reusing unchanged pages."""
+        title = f"Upcoming {game_type.upper()} Games"
+        # Room for the title and a "Page x/y" footer
+        budget = EMBED_MAX_CHARS - len(title) - 32
         
+        chunks = []
+        chunk, size = [], 0
         for game in games:
-            if game_type == "ava":
-                value = (
-                    f"**Map:** {game['map_name']}\n"
-                    f"**Speed:** {game['game_speed']}\n"
-                    f"**Start:** {game['start_time']}\n"
-                    f"**War:** {game['war_time']}\n"
-                    f"**Slots:** G({game['current_ground']}/{game['max_ground']}) "
-                    f"A({game['current_air']}/{game['max_air']}) "
-                    f"S({game['current_support']}/{game['max_support']})"
-                    f"{f' N({game['current_navy']}/{game['max_navy']})' if game['max_navy'] > 0 else ''}\n"
-                    f"**Notes:** {game['notes'] or 'None'}"
-                )
-            else:
-                value = (
-                    f"**Description:** {game['description']}\n"
-                    f"**Start:** {game['start_time']}\n"
-                    f"**Map:** {game['map_name'] or 'Not specified'}\n"
-                    f"**Notes:** {game['notes'] or 'None'}"
-                )
+            name, value = self.render_list_field(game_type, game)
+            cost = len(name) + len(value)
+            if chunk and (len(chunk) == EMBED_MAX_FIELDS or size + cost > budget):
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(game)
+            size += cost
+        chunks.append(chunk)
+        
+        pages = []
+        for number, chunk in enumerate(chunks, start=1):
+            key = ("page", game_type, chunk[0].get('guild_id'), number, len(chunks))
+            version = tuple((game['id'], game['version']) for game in chunk)
+            embed = self.render_cache.get(key, version)
+            if embed is None:
+                embed = discord.Embed(title=title, color=discord.Color.blue())
+                for game in chunk:
+                    name, value = self.render_list_field(game_type, game)
+                    embed.add_field(name=name, value=value, inline=False)
+                if len(chunks) > 1:
+                    embed.set_footer(text=f"Page {number}/{len(chunks)}")
+                self.render_cache.put(key, version, embed)
+            pages.append(embed)
+        return pages
+    
+    @commands.hybrid_command(name='metrics', description='Show latency metrics (admin only)')
+    @commands.has_permissions(administrator=True)
+    async def metrics(self, ctx: commands.Context):
+        """Show p50/p95/p99 latencies for commands, interactions, queries and API calls"""
+        summary = self.bot.metrics.summary() or "No samples yet."
+        if len(summary) > 1900:
+            await self.send(ctx, file=discord.File(io.BytesIO(summary.encode()), filename="metrics.txt"))
+        else:
+            await self.send(ctx, f"```\n{summary}\n```")
+    
+    @commands.hybrid_command(name='db_stats', description='Show database table sizes (admin only)')
+    @app_commands.describe(archive="Archive finished games first and show sizes before and after")
+    @commands.has_permissions(administrator=True)
+    async def db_stats(self, ctx: commands.Context, archive: bool = False):
+        """Show row counts and sizes for the live and archive tables"""
+        db = await self.db_for(ctx.guild.id)
+        before = await db.table_stats()
+        if not archive:
+            await self.send(ctx, f"```\n{format_table_stats(before)}\n```")
+            return
             
-            embed.add_field(
-                name=f"Game #{game['id']}",
-                value=value,
-                inline=False
+        moved = await db.run_retention()
+        after = await db.table_stats()
+        await self.send(
+            ctx,
+            f"Archived {moved['ava']} AvA and {moved['pub']} pub game(s), "
+            f"released {moved['vacuumed_pages']} page(s).\n"
+            f"```\nBefore\n{format_table_stats(before)}\n\nAfter\n{format_table_stats(after)}\n```"
+        )
+    
+    @commands.hybrid_command(name='db_check', description='Check the database for inconsistent rows (admin only)')
+    @app_commands.describe(repair="Fix what the check finds")
+    @commands.has_permissions(administrator=True)
+    async def db_check(self, ctx: commands.Context, repair: bool = False):
+        """Report rows that contradict each other, and optionally repair them"""
+        db = await self.db_for(ctx.guild.id)
+        problems, repaired = await db.check_consistency(repair)
+        for game_type, game_data, promoted in repaired:
+            await self.refresh_game_message(db, game_data['id'], game_type, ctx.channel)
+            if promoted:
+                await self.notify_promoted(game_data, promoted)
+        report = "\n".join(f"{name:<28}{count:>8}" for name, count in problems.items())
+        if not any(problems.values()):
+            summary = "No problems found."
+        elif repair:
+            summary = "Repaired:" if not problems.get('integrity') else (
+                "Repaired what could be; the file itself is damaged, restore it from a backup:"
             )
-        
-        await ctx.send(embed=embed)
+        else:
+            summary = "Problems found, run with repair to fix them:"
+        await self.send(ctx, f"{summary}\n```\n{report}\n```")
     
-    def create_ava_embed(self, game_data: Dict) -> discord.Embed:
+    @commands.hybrid_command(name='player_stats', description="Show a player's signup history")
+    @app_commands.describe(member="Player to look up (defaults to you)")
+    async def player_stats(self, ctx: commands.Context, member: Optional[discord.Member] = None):
+        """Show a player's signups per role, no-show rate and upcoming games"""
+        member = member or ctx.author
+        guild_id = ctx.guild.id if ctx.guild else None
+        db = await self.db_for(guild_id)
+        stats = await db.get_player_stats(guild_key(guild_id), str(member.id))
+        name = discord.utils.escape_markdown(member.display_name)
+        if not stats['roles'] and not stats['signups']:
+            await self.send(ctx, f"No games recorded for {name}.")
+            return
+        report = f"**{name}**\n```\n{format_player_stats(stats)}\n```"
+        if stats['signups']:
+            report += "\n" + format_upcoming_signups(stats)
+        await self.send(ctx, report)
+    
+    @commands.hybrid_command(name='map_stats', description='Show how full games on each map were')
+    async def map_stats(self, ctx: commands.Context):
+        """Show games played and the share of slots filled per map"""
+        guild_id = ctx.guild.id if ctx.guild else None
+        db = await self.db_for(guild_id)
+        rows = await db.get_map_stats(guild_key(guild_id))
+        if not rows:
+            await self.send(ctx, "No finished games yet.")
+            return
+        report = format_map_stats(rows)
+        if len(report) > 1900:
+            await self.send(ctx, file=discord.File(io.BytesIO(report.encode()), filename="map_stats.txt"))
+        else:
+            await self.send(ctx, f"```\n{report}\n```")
+    
+    @commands.hybrid_command(name='no_show', description="Record that a signed-up player didn't turn up (admin only)")
+    @app_commands.describe(
+        game_id="The game ID",
+        member="The player who didn't turn up",
+        game_type="Type of game (ava or pub)"
+    )
+    @commands.has_permissions(administrator=True)
+    async def no_show(self, ctx: commands.Context, game_id: int, member: discord.Member, game_type: str = "ava"):
+        """Count a no-show against a player signed up to a game"""
+        name = discord.utils.escape_markdown(member.display_name)
+        if not await self.get_guild_game(ctx.guild.id, game_id, game_type):
+            await self.send(ctx, "Game not found. Check the game ID.")
+            return
+        db = await self.db_for(ctx.guild.id)
+        if not await db.mark_no_show(game_id, game_type, str(member.id)):
+            await self.send(ctx, f"{name} isn't signed up to game #{game_id} or is already marked.")
+            return
+        await self.send(ctx, f"Marked {name} as a no-show for game #{game_id}.")
+    
+    def create_embed(self, game_type: str, game_data: GameRow) -> discord.Embed:
+        key = ("embed", game_type, game_data.get('guild_id'), game_data['id'])
+        embed = self.render_cache.get(key, game_data['version'])
+        if embed is None:
+            embed = self.build_ava_embed(game_data) if game_type == "ava" else self.build_pub_embed(game_data)
+            self.render_cache.put(key, game_data['version'], embed)
+        return embed
+    
+    def build_ava_embed(self, game_data: GameRow) -> discord.Embed:
         embed = discord.Embed(
             title=f"New AvA Game: {game_data['map_name']} ({game_data['game_speed']})",
             description=game_data['notes'],
             color=discord.Color.orange(),
-            timestamp=datetime.datetime.strptime(game_data['start_time'], "%Y-%m-%d %H:%M")
+            timestamp=start_datetime(game_data)
         )
         
-        # Add game times
+        # Add game times; Discord shows them in each viewer's own zone
         embed.add_field(
             name="Start Time",
-            value=game_data['start_time'],
+            value=game_time(game_data, 'start'),
             inline=True
         )
         embed.add_field(
             name="War Time",
-            value=game_data['war_time'],
+            value=game_time(game_data, 'war'),
             inline=True
         )
         
-        # Add role availability
-        roles = [
-            ('Ground', 'ground'),
-            ('Air', 'air'),
-            ('Support', 'support')
-        ]
-        
-        if game_data['max_navy'] > 0:
-            roles.append(('Navy', 'navy'))
-        
-        for name, role in roles:
-            current = game_data[f'current_{role}']
-            max_ = game_data[f'max_{role}']
-            status = "FULL" if current >= max_ else f"{current}/{max_}"
-            
-            embed.add_field(
-                name=name,
-                value=status,
-                inline=True
-            )
+        self.add_role_fields(embed, game_data)
         
         # Set appropriate image
         image_url = game_data.get('image_url', ANTARCTICA)
@@ -480,158 +4097,443 @@ class AdminCommands(commands.Cog):
         
         return embed
     
-    def create_ava_view(self, game_id: int) -> discord.ui.View:
-        view = discord.ui.View()
+    def build_pub_embed(self, game_data: GameRow) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"New Pub Game: {game_data['description']}"[:256],
+            description=game_data['notes'],
+            color=discord.Color.green(),
+            timestamp=start_datetime(game_data)
+        )
         
-        # Add role buttons if slots are available
-        view.add_item(discord.ui.Button(
-            style=discord.ButtonStyle.primary,
-            label="Ground",
-            custom_id=f"role_{game_id}_ground"
-        ))
-        view.add_item(discord.ui.Button(
-            style=discord.ButtonStyle.primary,
-            label="Air",
-            custom_id=f"role_{game_id}_air"
-        ))
-        view.add_item(discord.ui.Button(
-            style=discord.ButtonStyle.primary,
-            label="Support",
-            custom_id=f"role_{game_id}_support"
-        ))
+        embed.add_field(
+            name="Start Time",
+            value=game_time(game_data, 'start'),
+            inline=True
+        )
+        if game_data['map_name']:
+            embed.add_field(
+                name="Map",
+                value=game_data['map_name'],
+                inline=True
+            )
+            
+        self.add_role_fields(embed, game_data)
         
-        # Navy button only if max_navy > 0
-        game_data = self.db.get_game(game_id, "ava")
-        if game_data and game_data['max_navy'] > 0:
-            view.add_item(discord.ui.Button(
-                style=discord.ButtonStyle.primary,
-                label="Navy",
-                custom_id=f"role_{game_id}_navy"
-            ))
+        embed.set_image(url=game_data.get('image_url') or CON)
+        embed.set_footer(text=f"Game ID: {game_data['id']}")
+        
+        return embed
+    
+    def add_role_fields(self, embed: discord.Embed, game_data: GameRow):
+        """Add each role's availability and roster; roles without any slots are hidden."""
+        slots = [slot for slot in game_data['roles'] if slot.max_slots > 0]
+        # Room for the footer, which is set after the fields
+        budget = EMBED_MAX_CHARS - len(embed) - 32
+        for remaining, slot in zip(range(len(slots), 0, -1), slots):
+            name = slot.role.capitalize()
+            value = "FULL" if slot.full else f"{slot.taken}/{slot.max_slots}"
+            if slot.waiting:
+                value += f" (+{slot.waiting} waiting)"
+            if slot.players:
+                value += "\n" + "\n".join(discord.utils.escape_markdown(player) for player in slot.players)
+                
+            room = min(EMBED_FIELD_MAX_CHARS, budget // remaining - len(name))
+            if len(value) > room:
+                value = value[:max(room - 1, 0)] + "…"
+            embed.add_field(name=name, value=value, inline=True)
+            budget -= len(name) + len(value)
+    
+    def create_view(self, game_type: str, game_data: GameRow) -> discord.ui.View:
+        game_id = game_data['id']
+        # Dynamic items never time out and survive restarts
+        view = discord.ui.View(timeout=None)
+        
+        # One button per role that has any slots
+        for slot in game_data['roles']:
+            if slot.max_slots > 0:
+                view.add_item(RoleButton(game_id, slot.role, game_type))
         
         # Add management buttons
-        view.add_item(discord.ui.Button(
-            style=discord.ButtonStyle.danger,
-            label="Leave Game",
-            custom_id=f"leave_{game_id}"
-        ))
+        view.add_item(LeaveButton(game_id, game_type))
         
         return view
     
-    async def refresh_game_message(self, game_id: int, game_type: str, channel: discord.TextChannel):
-        game_data = self.db.get_game(game_id, game_type)
+    async def handle_signup(self, interaction: discord.Interaction, game_id: int, role: str,
+                            game_type: str = "ava"):
+        with self.bot.metrics.timer("interaction", "signup"):
+            # Capacity check and signup happen atomically in the database
+            db = await self.db_for(interaction.guild_id)
+            result, game_data = await db.signup_user(
+                game_id=game_id,
+                game_type=game_type,
+                user_id=str(interaction.user.id),
+                username=interaction.user.display_name,
+                role=role
+            )
+            
+            if result is SignupResult.NOT_FOUND:
+                await self.respond(interaction, "Game not found!")
+                return
+                
+            if result is SignupResult.ALREADY_SIGNED_UP:
+                await self.respond(interaction, "You're already signed up for this game!")
+                return
+                
+            if result is SignupResult.UNKNOWN_ROLE:
+                await self.respond(interaction, "That role isn't available for this game!")
+                return
+                
+            if result is SignupResult.ALREADY_WAITLISTED:
+                await self.respond(
+                    interaction, "You're already on the waitlist for this game. You'll get a DM if a slot opens."
+                )
+                return
+                
+            # Update the message; a new waiter changes the waiting count too
+            self.schedule_render(db, game_id, game_type, interaction.message)
+            if result is SignupResult.WAITLISTED:
+                slot = find_role(game_data, role)
+                await self.respond(
+                    interaction,
+                    f"This role is full, so you're #{slot.waiting} on the {role} waitlist. "
+                    "You'll get a DM when a slot opens."
+                )
+                return
+            await self.respond(interaction, f"You've been signed up as {role}!")
+    
+    async def handle_leave(self, interaction: discord.Interaction, game_id: int, game_type: str = "ava"):
+        with self.bot.metrics.timer("interaction", "leave"):
+            db = await self.db_for(interaction.guild_id)
+            game_data, promoted = await db.remove_signup(
+                game_id=game_id,
+                game_type=game_type,
+                user_id=str(interaction.user.id)
+            )
+            if not game_data:
+                await self.respond(interaction, "You weren't signed up for this game!")
+                return
+                
+            # One coalesced render covers the leave and any promotion
+            self.schedule_render(db, game_id, game_type, interaction.message)
+            await self.respond(interaction, "You've been removed from the game.")
+            if promoted:
+                await self.notify_promoted(game_data, promoted)
+    
+    async def notify_promoted(self, game_data: GameRow, promoted: List[Tuple[str, str]]):
+        """DM everyone who was just moved off a waitlist into a slot."""
+        async def notify(user_id: str, role: str):
+            user = self.bot.get_user(int(user_id)) or await self.bot.fetch_user(int(user_id))
+            await self.bot.outbound.submit(("dm", user_id), functools.partial(
+                user.send,
+                f"A {role} slot opened up in game #{game_data['id']} ({game_title(game_data)}) "
+                "and you've been moved off the waitlist and signed up!"
+            ))
+            
+        results = await asyncio.gather(*(notify(user_id, role) for user_id, role in promoted),
+                                       return_exceptions=True)
+        for (user_id, _), result in zip(promoted, results):
+            # Closed DMs are common; the roster still shows the promotion
+            if isinstance(result, Exception):
+                log.info("Could not DM promoted user %s: %s", user_id, result)
+    
+    async def send_reminder(self, guild_id: Optional[str], game_type: str, game_id: int, kind: str):
+        await self.bot.wait_until_ready()
+        db = await self.bot.databases.for_guild(guild_id)
+        game_data = await db.get_game(game_id, game_type)
+        if not game_data or not game_data.get('channel_id'):
+            return
+        channel = self.bot.get_channel(int(game_data['channel_id']))
+        if channel is None:
+            return
+            
+        signups = await db.get_signups(game_id, game_type)
+        mentions = " ".join(f"<@{user_id}>" for user_id, _, _ in signups)
+        event = "War opens" if kind == 'war' else "Game starts"
+        when = game_time(game_data, kind)
+        await self.bot.outbound.submit(channel.id, functools.partial(
+            channel.send,
+            f"⏰ {event} for game #{game_id} at {when}! {mentions}".rstrip(),
+            allowed_mentions=discord.AllowedMentions(users=True)
+        ))
+    
+    async def refresh_game_message(self, db: StorageBackend, game_id: int, game_type: str,
+                                   channel: discord.TextChannel):
+        game_data = await db.get_game(game_id, game_type)
         if not game_data or not game_data.get('message_id'):
             return
             
+        if game_data.get('channel_id'):
+            channel = self.bot.get_channel(int(game_data['channel_id'])) or channel
+        message = channel.get_partial_message(int(game_data['message_id']))
+        self.schedule_render(db, game_id, game_type, message)
+    
+    def schedule_render(self, db: StorageBackend, game_id: int, game_type: str, message: discord.PartialMessage):
+        """Queue a re-render of a game's signup message without waiting for it."""
+        task = asyncio.create_task(self.render_game_message(db, game_id, game_type, message))
+        self.renders.add(task)
+        task.add_done_callback(self.renders.discard)
+    
+    async def render_game_message(self, db: StorageBackend, game_id: int, game_type: str,
+                                  message: discord.PartialMessage):
+        async def edit():
+            # Read when the edit goes out, so merged updates show the latest state
+            game_data = await db.get_game(game_id, game_type)
+            if game_data:
+                await message.edit(embed=self.create_embed(game_type, game_data),
+                                   view=self.create_view(game_type, game_data))
+                
         try:
-            message = await channel.fetch_message(int(game_data['message_id']))
-            embed = self.create_ava_embed(game_data) if game_type == "ava" else self.create_pub_embed(game_data)
-            view = self.create_ava_view(game_id) if game_type == "ava" else self.create_pub_view(game_id)
-            
-            await message.edit(embed=embed, view=view)
+            # A newer render of the same message still queued replaces this one
+            await self.bot.outbound.submit(
+                (message.channel.id, "edit"), edit, Priority.REFRESH, key=("edit", message.id)
+            )
         except discord.NotFound:
             pass
+        except Exception:
+            log.exception("Failed to re-render message %s", message.id)
 
-class DiscordBot(commands.Bot):
+class DiscordBot(commands.AutoShardedBot):
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
-        super().__init__(command_prefix="!", intents=intents)
-        self.db = GameDatabase()
+        # Discord's recommended shard count unless SHARD_COUNT is set; SHARD_IDS splits processes
+        shard_count = os.getenv("SHARD_COUNT")
+        shard_ids = os.getenv("SHARD_IDS")
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            shard_count=int(shard_count) if shard_count else None,
+            shard_ids=[int(shard) for shard in shard_ids.split(",")] if shard_ids else None,
+        )
+        self.metrics = Metrics()
+        # The database handles for the whole process; the cog borrows them
+        self.databases = DatabaseRouter(DatabaseConfig.from_env(), self.metrics)
+        self.outbound = OutboundQueue(metrics=self.metrics)
+        self.throttle = ClickThrottle(
+            rate=float(os.getenv("CLICK_RATE_PER_SECOND", "0.5")), burst=int(os.getenv("CLICK_BURST", "3"))
+        )
+        self.interactions = InteractionQueue(
+            workers=int(os.getenv("INTERACTION_WORKERS", "8")),
+            maxsize=int(os.getenv("INTERACTION_QUEUE_SIZE", "256")),
+            metrics=self.metrics,
+        )
+        self.reminders = ReminderScheduler(
+            self.databases, self.fire_reminder, lead=int(os.getenv("REMINDER_LEAD_MINUTES", "15")) * 60,
+            owns=self.owns_guild,
+        )
+        self.metrics.register_gauges("game_cache", self.databases.cache_stats)
+        self.metrics.register_gauges("shard_latency", self.shard_latencies)
+        self.metrics.register_gauges("outbound", self.outbound.stats)
+        self.metrics.register_gauges("interaction_queue", self.interactions.stats)
+        self.metrics.register_gauges("click_throttle", self.throttle.stats)
+        self.metrics.register_gauges("reminders", self.reminders.stats)
+        # Seconds since process start at each startup milestone
+        self.startup: Dict[str, float] = {}
+        self.metrics.register_gauges("startup", self.startup.copy)
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))
+        self.metrics_runner: Optional["web.AppRunner"] = None
+        self.rate_limit_log = RateLimitLog(self.metrics)
+        self._instrument_http()
+        
+    def _instrument_http(self):
+        """Time every REST call by route, including discord.py's rate-limit sleeps, and count its 429s."""
+        logging.getLogger("discord.http").addFilter(self.rate_limit_log)
+        request = self.http.request
+        
+        async def timed_request(route, **kwargs):
+            with self.metrics.timer("discord_api", f"{route.method} {route.path}"):
+                return await request(route, **kwargs)
+            
+        self.http.request = timed_request
         
     async def setup_hook(self):
+        await self.databases.connect()
+        # Before the gateway connects, so the first clicks are served from memory
+        self.startup["preloaded_games"] = await self.databases.preload()
         await self.add_cog(AdminCommands(self))
+        self.interactions.start()
+        self.reminders.start()
+        # Route clicks by custom_id template, including on messages from before a restart
+        self.add_dynamic_items(RoleButton, LeaveButton)
+        self.sample_loop_lag.start()
+        self.log_metrics.start()
+        self.run_retention.start()
+        self.run_backups.start()
+        self.sync_caches.start()
+        if self.metrics_port:
+            await self.start_metrics_server()
+        self.startup["setup_seconds"] = round(time.perf_counter() - STARTED, 3)
+            
+    async def start_metrics_server(self):
+        """Serve Prometheus text on ``/metrics`` at METRICS_PORT."""
+        # Only deployments that scrape metrics load the web server
+        from aiohttp import web
         
-    async def on_ready(self):
-        print(f'Logged in as {self.user}')
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(text=self.metrics.render_prometheus(), content_type="text/plain")
         
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
-            await super().on_interaction(interaction)
-            return
-            
-        custom_id = interaction.data.get('custom_id', '')
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self.metrics_runner = web.AppRunner(app)
+        await self.metrics_runner.setup()
+        await web.TCPSite(self.metrics_runner, port=self.metrics_port).start()
         
-        # Handle role selection
-        if custom_id.startswith('role_'):
-            parts = custom_id.split('_')
-            if len(parts) != 3:
-                return
-                
-            game_id = int(parts[1])
-            role = parts[2]
-            
-            game_data = self.db.get_game(game_id, "ava")
-            if not game_data:
-                await interaction.response.send_message("Game not found!", ephemeral=True)
-                return
-                
-            # Check if role is available
-            current = game_data[f'current_{role}']
-            max_ = game_data[f'max_{role}']
-            
-            if current >= max_:
-                await interaction.response.send_message(
-                    f"This role is already full! {current}/{max_} slots taken.",
-                    ephemeral=True
-                )
-                return
-                
-            # Sign up the user
-            if not self.db.signup_user(
-                game_id=game_id,
-                game_type="ava",
-                user_id=str(interaction.user.id),
-                username=interaction.user.display_name,
-                role=role
-            ):
-                await interaction.response.send_message(
-                    "You're already signed up for this game!",
-                    ephemeral=True
-                )
-                return
-                
-            # Update the message
-            game_data = self.db.get_game(game_id, "ava")
-            embed = AdminCommands(self).create_ava_embed(game_data)
-            view = AdminCommands(self).create_ava_view(game_id)
-            
-            await interaction.message.edit(embed=embed, view=view)
-            await interaction.response.send_message(
-                f"You've been signed up as {role}!",
-                ephemeral=True
-            )
+    @tasks.loop(seconds=1)
+    async def sample_loop_lag(self):
+        # How late a short sleep wakes up is how long everything else waits
+        loop = asyncio.get_running_loop()
+        expected = loop.time() + 0.1
+        await asyncio.sleep(0.1)
+        self.metrics.observe("loop_lag", "event_loop", max(0.0, loop.time() - expected))
         
-        # Handle leaving game
-        elif custom_id.startswith('leave_'):
-            game_id = int(custom_id.split('_')[1])
-            
-            if not self.db.remove_signup(
-                game_id=game_id,
-                game_type="ava",
-                user_id=str(interaction.user.id)
-            ):
-                await interaction.response.send_message(
-                    "You weren't signed up for this game!",
-                    ephemeral=True
-                )
-                return
+    @tasks.loop(minutes=int(os.getenv("METRICS_LOG_MINUTES", "15")))
+    async def log_metrics(self):
+        summary = self.metrics.summary()
+        if summary:
+            log.info("Latency summary:\n%s", summary)
+        
+    @tasks.loop(seconds=1)
+    async def sync_caches(self):
+        # Other shard processes may have written since the last tick
+        for db in self.databases.all():
+            try:
+                await db.check_external_writes()
+            except Exception:
+                log.exception("Cache sync failed for %s", db.config.url or db.config.path)
                 
-            # Update the message
-            game_data = self.db.get_game(game_id, "ava")
-            embed = AdminCommands(self).create_ava_embed(game_data)
-            view = AdminCommands(self).create_ava_view(game_id)
+    @tasks.loop(minutes=int(os.getenv("ARCHIVE_INTERVAL_MINUTES", "60")))
+    async def run_retention(self):
+        moved = {'ava': 0, 'pub': 0, 'vacuumed_pages': 0}
+        for db in self.databases.all():
+            try:
+                for name, count in (await db.run_retention()).items():
+                    moved[name] += count
+            except Exception:
+                log.exception("Retention pass failed for %s", db.config.path)
+        if moved['ava'] or moved['pub']:
+            log.info("Archived %d AvA and %d pub game(s), released %d page(s)",
+                     moved['ava'], moved['pub'], moved['vacuumed_pages'])
+        
+    @tasks.loop(minutes=int(os.getenv("BACKUP_INTERVAL_MINUTES", "60")))
+    async def run_backups(self):
+        for db in self.databases.all():
+            try:
+                path = await db.snapshot()
+            except Exception:
+                log.exception("Backup failed for %s", db.config.path)
+            else:
+                if path:
+                    log.info("Backed up %s to %s", db.config.path, path)
+        
+    def shard_latencies(self) -> Dict[str, float]:
+        # NaN until a shard's first heartbeat
+        return {str(shard_id): latency for shard_id, latency in self.latencies if latency == latency}
+        
+    async def on_ready(self):
+        print(f'Logged in as {self.user} on {self.shard_count} shard(s)')
+        # on_ready repeats after reconnects; only the first one is startup
+        if "ready_seconds" not in self.startup:
+            self.startup["ready_seconds"] = round(time.perf_counter() - STARTED, 3)
+            log.info("Ready %.1fs after start (setup_hook done at %.1fs, %d games preloaded)",
+                     self.startup["ready_seconds"], self.startup["setup_seconds"], self.startup["preloaded_games"])
+        await self.assign_legacy_guilds()
+        
+    async def assign_legacy_guilds(self):
+        """Give games created before guild partitioning the guild of the channel they were posted in."""
+        db = self.databases.default
+        channel_guilds = []
+        for channel_id in await db.get_unassigned_channels():
+            channel = self.get_channel(int(channel_id))
+            if channel is not None and getattr(channel, 'guild', None) is not None:
+                channel_guilds.append((channel_id, guild_key(channel.guild.id)))
+        if channel_guilds and await db.assign_guilds(channel_guilds):
+            # Reminder keys include the guild, so reload them
+            self.reminders.reload()
+        
+    def owns_guild(self, guild_id: Optional[str]) -> bool:
+        """Whether one of this process's shards serves the guild; games without a guild belong to shard 0."""
+        if self.shard_ids is None:
+            return True
+        shard = (int(guild_id) >> 22) % self.shard_count if guild_id else 0
+        return shard in self.shard_ids
+    
+    async def fire_reminder(self, guild_id: Optional[str], game_type: str, game_id: int, kind: str):
+        await self.get_cog("AdminCommands").send_reminder(guild_id, game_type, game_id, kind)
+        
+    async def close(self):
+        self.interactions.stop()
+        self.reminders.stop()
+        self.sample_loop_lag.cancel()
+        self.log_metrics.cancel()
+        self.run_retention.cancel()
+        self.run_backups.cancel()
+        self.sync_caches.cancel()
+        logging.getLogger("discord.http").removeFilter(self.rate_limit_log)
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        await super().close()
+        await self.databases.close()
+
+async def maintain(args: argparse.Namespace) -> int:
+    """Run one database maintenance command from the command line; returns the exit status."""
+    config = DatabaseConfig.from_env()
+    if args.db:
+        config = dataclasses.replace(config, path=args.db, url='')
+        
+    if args.command == 'restore':
+        if config.url:
+            print("Restore a PostgreSQL server with its own tools.")
+            return 1
+        used = restore_database(config.path, config.backup_dir, args.source)
+        print(f"Restored {config.path} from {used}")
+        args.command, args.repair = 'check', True
+        
+    if not config.url:
+        damaged = check_integrity(config.path)
+        if damaged:
+            print(f"{config.path} is damaged; run 'restore' to replace it with the newest healthy backup:")
+            print("\n".join(damaged[:20]))
+            return 1
             
-            await interaction.message.edit(embed=embed, view=view)
-            await interaction.response.send_message(
-                "You've been removed from the game.",
-                ephemeral=True
-            )
+    db = PostgresGameDatabase(config) if config.url else GameDatabase(config)
+    try:
+        await db.connect()
+        if args.command == 'backup':
+            path = await db.snapshot()
+            if not path:
+                print("Set GAMES_DB_BACKUP_DIR to back up a SQLite file.")
+                return 1
+            print(f"Backed up {config.path} to {path}")
+            return 0
+        problems, repaired = await db.check_consistency(args.repair)
+        for name, count in problems.items():
+            print(f"{name:<28}{count:>8}")
+        # No gateway here to DM from; the messages catch up on their next render
+        for game_type, game_data, promoted in repaired:
+            for user_id, role in promoted:
+                print(f"Promoted {user_id} to {role} in {game_type} game #{game_data['id']}")
+        return 0 if args.repair or not any(problems.values()) else 1
+    finally:
+        await db.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot, or maintain its database.")
+    parser.add_argument("--db", help="SQLite file to maintain instead of GAMES_DB_PATH")
+    commands_parser = parser.add_subparsers(dest="command")
+    check_parser = commands_parser.add_parser("check", help="Find rows that contradict each other")
+    check_parser.add_argument("--repair", action="store_true", help="Fix what the check finds")
+    commands_parser.add_parser("backup", help="Snapshot the database into GAMES_DB_BACKUP_DIR")
+    restore_parser = commands_parser.add_parser(
+        "restore", help="Replace a damaged file with the newest healthy backup (stop the bot first)"
+    )
+    restore_parser.add_argument("--from", dest="source", help="Backup file to restore instead of the newest")
+    args = parser.parse_args()
+    if args.command:
+        raise SystemExit(asyncio.run(maintain(args)))
+        
     token = os.getenv("BOT_TOKEN")
     if not token:
         raise ValueError("Bot token is missing! Set the BOT_TOKEN environment variable.")
         
     bot = DiscordBot()
-    bot.run(token)
+    bot.run(token, root_logger=True)